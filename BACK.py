@@ -1,99 +1,152 @@
-from flask import Flask, request, jsonify, render_template, redirect, url_for, flash, session
-from flask_sqlalchemy import SQLAlchemy
+from flask import Flask, request, jsonify, render_template, redirect, url_for, flash, session, Response, stream_with_context, g
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
-import jwt
 import datetime
+import json
+import functools
 from functools import wraps
-import requests 
-import yfinance as yf 
-import wikipedia 
-from google import genai 
 from dotenv import load_dotenv 
 import os
 import secrets
+import atexit
 import authenticator
-from alert_system.scheduler import start_scheduler, alerts
+import notifier
+from alert_system import Alert, LeaderLease, run_as_leader, start_scheduler
+from extensions import db
+from market_data import (get_price_history, price_cache, ohlcv_store, symbol_index,
+                         market_data_provider, fallback_provider)
+from market_data.symbols import normalize_name
+from persistent_cache import PersistentTTLCache, purge_all_expired
+from llm import LLMService, make_llm_client
+from resilience import CircuitOpenError, breaker_stats, circuit_breaker
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, registry
+from rate_limit import (BATCH, INTERACTIVE, current_priority, limiter_stats, rate_limiter, run_at_priority,
+                        submit_in_context, upstream_deadline)
+from competitor_graph import GraphRefresher
+from response_cache import response_cache
+from wire_format import COMPRESS_MIN_BYTES, compress, encode_analysis, pick_encoding
 from flask_session import Session
 from flask_cors import CORS
 import traceback
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, as_completed, FIRST_COMPLETED, TimeoutError as FuturesTimeoutError
 
 # Load environment variables from .env file
 load_dotenv()
-print("API Keys loaded:")
-print(f"Alpha Vantage API Key: {os.getenv('ALPHA_VANTAGE_API_KEY')}")
-print(f"Gemini API Key: {os.getenv('GEMINI_API_KEY')}")
-print(f"Email Address: {os.getenv('EMAIL_ADDRESS')}")
+# Report which keys are configured without writing the secrets themselves to the logs
+print("API keys configured: " + ", ".join(
+    f"{name}={'yes' if os.getenv(name) else 'no'}" for name in ("ALPHA_VANTAGE_API_KEY", "GEMINI_API_KEY", "EMAIL_ADDRESS")))
 
 # Load API keys from environment variables
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "abc")  # Fallback to "abc" if not found
 ALPHA_VANTAGE_API_KEY = os.getenv("ALPHA_VANTAGE_API_KEY", "xyz")  # Fallback to "xyz" if not found
+# Point at a local stand-in (see benchmarks/) to run without the real API
+ALPHA_VANTAGE_URL = os.getenv("ALPHA_VANTAGE_URL", "https://www.alphavantage.co/query")
 
-# Cache for company tickers to avoid repeated API calls
-TICKER_CACHE = {
-    "apple": "AAPL",
-    "microsoft": "MSFT",
-    "google": "GOOGL",
-    "alphabet": "GOOGL",
-    "amazon": "AMZN",
-    "tesla": "TSLA",
-    "facebook": "META",
-    "meta": "META",
-    "netflix": "NFLX",
-    "nvidia": "NVDA",
-    "intel": "INTC",
-    "amd": "AMD",
-    "ibm": "IBM",
-    "oracle": "ORCL",
-    "salesforce": "CRM",
-    "adobe": "ADBE",
-    "walmart": "WMT",
-    "target": "TGT",
-    "coca cola": "KO",
-    "pepsi": "PEP",
-    "pepsico": "PEP",
-    "mcdonalds": "MCD",
-    "starbucks": "SBUX",
-    "nike": "NKE",
-    "disney": "DIS",
-    "boeing": "BA",
-    "ford": "F",
-    "general motors": "GM",
-    "exxon": "XOM",
-    "chevron": "CVX",
-    "jpmorgan": "JPM",
-    "bank of america": "BAC",
-    "goldman sachs": "GS",
-    "visa": "V",
-    "mastercard": "MA",
-    "paypal": "PYPL",
-    "johnson & johnson": "JNJ",
-    "pfizer": "PFE",
-    "merck": "MRK",
-    "verizon": "VZ",
-    "at&t": "T"
-}
+# Bounded pool for the network-bound stages of /analyze_company
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", 8))
+analysis_executor = ThreadPoolExecutor(max_workers=ANALYSIS_WORKERS, thread_name_prefix="analysis")
+# Upper bound (seconds) on competitor enrichment so one slow symbol can't stall a response
+COMPETITOR_DEADLINE = float(os.getenv("COMPETITOR_DEADLINE", 8))
+
+# Resolved company -> (Wikipedia title, summary), kept across requests and restarts
+WIKIPEDIA_CACHE_TTL = float(os.getenv("WIKIPEDIA_CACHE_TTL", 7 * 24 * 3600))
+WIKIPEDIA_NEGATIVE_TTL = float(os.getenv("WIKIPEDIA_NEGATIVE_TTL", 24 * 3600))
+wiki_cache = PersistentTTLCache("wikipedia", ttl=WIKIPEDIA_CACHE_TTL, negative_ttl=WIKIPEDIA_NEGATIVE_TTL)
+# Look up all candidate page titles at once instead of one after another
+WIKIPEDIA_CONCURRENT_LOOKUP = os.getenv("WIKIPEDIA_CONCURRENT_LOOKUP", "1") == "1"
+WIKIPEDIA_LOOKUP_DEADLINE = float(os.getenv("WIKIPEDIA_LOOKUP_DEADLINE", 6))
+wiki_executor = ThreadPoolExecutor(max_workers=6, thread_name_prefix="wikipedia")
+
+# Per-upstream circuit breakers with latency-based timeouts (see resilience.py)
+ALPHA_VANTAGE_TIMEOUT = float(os.getenv("ALPHA_VANTAGE_TIMEOUT", 3))
+WIKIPEDIA_TIMEOUT = float(os.getenv("WIKIPEDIA_TIMEOUT", 4))
+alpha_vantage_breaker = circuit_breaker("alpha_vantage", default_timeout=ALPHA_VANTAGE_TIMEOUT,
+                                        min_timeout=0.5, max_timeout=ALPHA_VANTAGE_TIMEOUT)
+wikipedia_breaker = circuit_breaker("wikipedia", default_timeout=WIKIPEDIA_TIMEOUT, min_timeout=0.5,
+                                    max_timeout=2 * WIKIPEDIA_TIMEOUT, max_concurrency=12)
+# Shared token bucket for SYMBOL_SEARCH; the free tier allows 5 calls a minute
+ALPHA_VANTAGE_CALLS_PER_MINUTE = float(os.getenv("ALPHA_VANTAGE_CALLS_PER_MINUTE", 5))
+ALPHA_VANTAGE_BURST = int(os.getenv("ALPHA_VANTAGE_BURST", 5))
+alpha_vantage_limiter = rate_limiter("alpha_vantage", rate=ALPHA_VANTAGE_CALLS_PER_MINUTE / 60,
+                                     capacity=ALPHA_VANTAGE_BURST)
+# SYMBOL_SEARCH answers below this "9. matchScore" are used once but not learned into the symbol index
+SYMBOL_LEARN_MIN_SCORE = float(os.getenv("SYMBOL_LEARN_MIN_SCORE", 0.8))
+
+# Batch analysis gets its own pool so a 200-company watchlist can't starve interactive requests
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", 8))
+BATCH_MAX_COMPANIES = int(os.getenv("BATCH_MAX_COMPANIES", 200))
+batch_executor = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix="batch")
+# Fan-out of batch and background callers (e.g. graph refreshes), kept out of analysis_executor's slots
+BACKGROUND_WORKERS = int(os.getenv("BACKGROUND_WORKERS", 4))
+background_executor = ThreadPoolExecutor(max_workers=BACKGROUND_WORKERS, thread_name_prefix="background")
+
+def fanout_executor():
+    """Pool for the calling request's concurrent lookups: interactive callers never queue behind others."""
+    return analysis_executor if current_priority() == INTERACTIVE else background_executor
 
 # Initialize Flask app
 app = Flask(__name__, static_folder="static", template_folder="templates")
 CORS(app)  # Enable CORS for all routes
 
 # Configuration
-app.config['SECRET_KEY'] = secrets.token_hex(32)  # Change this in production!
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///stockmind.db'
+# Every worker must sign sessions and tokens with the same keys; random keys only suit a single dev process
+app.config['SECRET_KEY'] = os.getenv('SECRET_KEY') or secrets.token_hex(32)
+app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///stockmind.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['JWT_SECRET_KEY'] = secrets.token_hex(32)  # For API tokens
+app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY') or secrets.token_hex(32)  # For API tokens
+if not os.getenv('SECRET_KEY') or not os.getenv('JWT_SECRET_KEY'):
+    print("SECRET_KEY/JWT_SECRET_KEY not set; using per-process random keys (sessions won't survive restarts or span workers)")
 app.config['SESSION_TYPE'] = 'filesystem' #using server side session cookies - filesystem
 
 # Initialize Flask extensions
-db = SQLAlchemy(app)
+db.init_app(app)
 Session(app)
 
-# Initialize Gemini client
+# Request metrics, served in Prometheus text format on /metrics
+http_requests = registry.counter("stockmind_http_requests_total", "HTTP requests by route, method and status.",
+                                 ("route", "method", "status"))
+http_latency = registry.histogram("stockmind_http_request_duration_seconds",
+                                  "Time to build each response (time to first byte for streams).", ("route", "method"))
+stage_latency = registry.histogram("stockmind_analysis_stage_duration_seconds",
+                                   "Duration of /analyze_company pipeline stages.", ("stage",))
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def note_response_metrics(response):
+    started = g.get("request_started")
+    if started is not None:
+        # Taken here so streamed responses report time to first byte, not time to the last chunk
+        g.response_status = response.status_code
+        g.response_elapsed = time.perf_counter() - started
+    return response
+
+@app.teardown_request
+def record_request_metrics(exc=None):
+    # Teardown runs even when a view raises, so unhandled errors are counted as 500s
+    started = g.pop("request_started", None)
+    if started is None:
+        return
+    status = g.pop("response_status", None)
+    elapsed = g.pop("response_elapsed", None)
+    if exc is not None or status is None:
+        status = 500
+    if elapsed is None:
+        elapsed = time.perf_counter() - started
+    # Route templates, not raw paths, so the label set stays bounded
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    http_requests.inc(route=route, method=request.method, status=str(status))
+    http_latency.observe(elapsed, route=route, method=request.method)
+
+# Initialize Gemini client behind the cache / concurrency-cap / deadline layer
 try:
-    client = genai.Client(api_key=GEMINI_API_KEY)
-    print("Gemini client initialized successfully")
+    llm_service = LLMService(make_llm_client(GEMINI_API_KEY))
+    print("Gemini client configured (connects on first use)")
 except Exception as e:
+    llm_service = None
     print(f"Error initializing Gemini client: {e}")
     # We'll handle this in the query_gemini_llm function
 
@@ -132,6 +185,8 @@ def token_required(f):
             return jsonify({'message': 'Token is missing!'}), 401
             
         try:
+            import jwt
+
             data = jwt.decode(token, app.config['JWT_SECRET_KEY'], algorithms=["HS256"])
             current_user = User.query.filter_by(id=data['user_id']).first()
         except:
@@ -141,143 +196,247 @@ def token_required(f):
         
     return decorated
 
-def fetch_wikipedia_summary(company_name): 
-    try: 
-        print(f"Fetching Wikipedia summary for: {company_name}")
-        
-        # Clean up the company name
-        # Remove common suffixes like "Inc", "Corp", etc.
-        clean_name = company_name.replace(" Inc", "").replace(" Corp", "").replace(" Corporation", "")
-        clean_name = clean_name.replace(" Ltd", "").replace(" LLC", "").replace(" Co", "")
-        clean_name = clean_name.strip()
-        
-        # Create company-specific search terms
-        company_terms = []
-        
-        # First try with company or Inc suffix to ensure we get the company, not generic terms
-        company_terms.append(f"{clean_name} (company)")
-        company_terms.append(f"{clean_name} Inc.")
-        company_terms.append(f"{clean_name} Corporation")
-        company_terms.append(f"{clean_name} company")
-        
-        # For common company names that might be confused with generic terms
-        if clean_name.lower() in ["apple", "amazon", "target", "shell", "visa", "oracle"]:
-            company_terms = [f"{clean_name} Inc.", f"{clean_name} (company)"] + company_terms
-            
-        # Add the original name at the end
-        company_terms.append(clean_name)
-        
-        print(f"Trying search terms: {company_terms}")
+_wikipedia = None
+
+def wikipedia_module():
+    """The wikipedia library, imported on first lookup and routed through the shared keep-alive session."""
+    global _wikipedia
+    if _wikipedia is None:
+        import wikipedia
+        from http_session import install_wikipedia_session
+
+        install_wikipedia_session()
+        _wikipedia = wikipedia
+    return _wikipedia
+
+def wikipedia_answers():
+    """"Not found" style answers from a healthy Wikipedia."""
+    wikipedia = wikipedia_module()
+    return (wikipedia.exceptions.PageError, wikipedia.exceptions.DisambiguationError)
+
+def wikipedia_summary_for_term(term):
+    """Summary for one Wikipedia search term as (title, summary), resolving disambiguation pages; None if no page."""
+    wikipedia = wikipedia_module()
+    try:
+        print(f"Trying term: {term}")
+        summary = wikipedia_breaker.call(wikipedia.summary, term, sentences=2, ignore=wikipedia_answers())
+        print(f"Found Wikipedia page for: {term}")
+        return term, summary
+    except wikipedia.exceptions.PageError:
+        print(f"No exact match found for {term}")
+        return None
+    except wikipedia.exceptions.DisambiguationError as e:
+        # Look for company-related options in disambiguation
+        print(f"Disambiguation options for {term}: {e.options}")
+        company_options = [opt for opt in e.options if any(
+            company_indicator in opt.lower() 
+            for company_indicator in ["inc", "company", "corporation", "technologies", "tech"]
+        )]
         
-        # Try each company-specific term
-        for term in company_terms:
+        if company_options:
             try:
-                print(f"Trying term: {term}")
-                summary = wikipedia.summary(term, sentences=2)
-                print(f"Found Wikipedia page for: {term}")
-                return term, summary
-            except wikipedia.exceptions.PageError:
-                print(f"No exact match found for {term}")
+                company_option = company_options[0]
+                print(f"Using company-related disambiguation option: {company_option}")
+                summary = wikipedia_breaker.call(wikipedia.summary, company_option, sentences=2,
+                                                 ignore=wikipedia_answers())
+                return company_option, summary
+            except:
+                print(f"Failed to get summary for company disambiguation option")
+                return None
+        elif e.options:
+            # If no company-specific options, try the first option
+            try:
+                first_option = e.options[0]
+                summary = wikipedia_breaker.call(wikipedia.summary, first_option, sentences=2,
+                                                 ignore=wikipedia_answers())
+                print(f"Using first disambiguation option: {first_option}")
+                return first_option, summary
+            except:
+                print(f"Failed to get summary for first disambiguation option")
+                return None
+        return None
+
+def first_company_summary(company_name, terms):
+    """Look up all candidate terms concurrently and take the first company-like summary.
+
+    If no summary looks like a company, the highest-priority summary found is
+    returned instead, matching the sequential lookup order.
+    """
+    futures = {wiki_executor.submit(wikipedia_summary_for_term, term): rank for rank, term in enumerate(terms)}
+    found = {}
+    try:
+        for future in as_completed(futures, timeout=WIKIPEDIA_LOOKUP_DEADLINE):
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"Wikipedia lookup failed: {e}")
                 continue
-            except wikipedia.exceptions.DisambiguationError as e:
-                # Look for company-related options in disambiguation
-                print(f"Disambiguation options for {term}: {e.options}")
-                company_options = [opt for opt in e.options if any(
-                    company_indicator in opt.lower() 
-                    for company_indicator in ["inc", "company", "corporation", "technologies", "tech"]
-                )]
-                
-                if company_options:
-                    try:
-                        company_option = company_options[0]
-                        print(f"Using company-related disambiguation option: {company_option}")
-                        summary = wikipedia.summary(company_option, sentences=2)
-                        return company_option, summary
-                    except:
-                        print(f"Failed to get summary for company disambiguation option")
-                        continue
-                elif e.options:
-                    # If no company-specific options, try the first option
-                    try:
-                        first_option = e.options[0]
-                        summary = wikipedia.summary(first_option, sentences=2)
-                        print(f"Using first disambiguation option: {first_option}")
-                        return first_option, summary
-                    except:
-                        print(f"Failed to get summary for first disambiguation option")
-                        continue
-        
-        # If none of the specific terms worked, perform a general search
-        search_results = wikipedia.search(clean_name + " company") 
-        print(f"Search results for '{clean_name} company': {search_results}")
-        
-        if search_results: 
-            # Filter for results that look like companies
-            company_results = [result for result in search_results if any(
-                indicator in result.lower() 
-                for indicator in ["inc", "company", "corporation", "technologies", "tech"]
-            )]
-            
-            # Use company results if available, otherwise use regular results
-            results_to_try = company_results if company_results else search_results
-            
-            for result in results_to_try[:2]:  # Try top 2 results
-                try:
-                    print(f"Trying search result: {result}")
-                    summary = wikipedia.summary(result, sentences=2)
-                    return result, summary
-                except:
-                    continue
+            if result is None:
+                continue
+            if is_company_summary(company_name, result[1]):
+                return result
+            found[futures[future]] = result
+    except FuturesTimeoutError:
+        print(f"Wikipedia lookups for {company_name} hit the {WIKIPEDIA_LOOKUP_DEADLINE}s deadline")
+    finally:
+        # Lookups that haven't started yet are no longer needed; free the pool for other requests
+        for future in futures:
+            future.cancel()
+    return found[min(found)] if found else None
+
+def wikipedia_search_terms(company_name):
+    """(clean name, candidate page titles in priority order) for a company's Wikipedia lookup."""
+    # Clean up the company name
+    # Remove common suffixes like "Inc", "Corp", etc.
+    clean_name = company_name.replace(" Inc", "").replace(" Corp", "").replace(" Corporation", "")
+    clean_name = clean_name.replace(" Ltd", "").replace(" LLC", "").replace(" Co", "")
+    clean_name = clean_name.strip()
+    
+    # Create company-specific search terms
+    company_terms = []
+    
+    # First try with company or Inc suffix to ensure we get the company, not generic terms
+    company_terms.append(f"{clean_name} (company)")
+    company_terms.append(f"{clean_name} Inc.")
+    company_terms.append(f"{clean_name} Corporation")
+    company_terms.append(f"{clean_name} company")
+    
+    # For common company names that might be confused with generic terms
+    if clean_name.lower() in ["apple", "amazon", "target", "shell", "visa", "oracle"]:
+        company_terms = [f"{clean_name} Inc.", f"{clean_name} (company)"] + company_terms
         
-        # Last resort - use stock ticker to search
-        ticker = get_ticker_from_alpha_vantage(company_name)
-        if ticker:
+    # Add the original name at the end
+    company_terms.append(clean_name)
+    company_terms = list(dict.fromkeys(company_terms))  # drop repeats, keep priority order
+    return clean_name, company_terms
+
+def lookup_wikipedia_page(company_name):
+    """Uncached Wikipedia lookup returning (title, summary), or None when nothing suitable exists."""
+    wikipedia = wikipedia_module()
+    clean_name, company_terms = wikipedia_search_terms(company_name)
+    print(f"Trying search terms: {company_terms}")
+    
+    if WIKIPEDIA_CONCURRENT_LOOKUP:
+        result = first_company_summary(company_name, company_terms)
+        if result:
+            return result
+    else:
+        # Try each company-specific term
+        for term in company_terms:
+            result = wikipedia_summary_for_term(term)
+            if result:
+                return result
+    
+    # If none of the specific terms worked, perform a general search
+    search_results = wikipedia_breaker.call(wikipedia.search, clean_name + " company") 
+    print(f"Search results for '{clean_name} company': {search_results}")
+    
+    if search_results: 
+        for result in prefer_company_titles(search_results)[:2]:  # Try top 2 results
             try:
-                search_with_ticker = f"{clean_name} {ticker}"
-                print(f"Trying search with ticker: {search_with_ticker}")
-                search_results = wikipedia.search(search_with_ticker)
-                if search_results:
-                    result = search_results[0]
-                    summary = wikipedia.summary(result, sentences=2)
-                    return result, summary
+                print(f"Trying search result: {result}")
+                summary = wikipedia_breaker.call(wikipedia.summary, result, sentences=2, ignore=wikipedia_answers())
+                return result, summary
             except:
-                pass
-        
-        # If all else fails, construct a generic description
-        print(f"No Wikipedia info found, using generic description")
-        generic_summary = f"{company_name} is a publicly traded company known for its products and services in the market."
-        return company_name, generic_summary
-            
+                continue
+    
+    # Last resort - use stock ticker to search
+    ticker = get_ticker_from_alpha_vantage(company_name)
+    if ticker:
+        try:
+            search_with_ticker = f"{clean_name} {ticker}"
+            print(f"Trying search with ticker: {search_with_ticker}")
+            search_results = wikipedia_breaker.call(wikipedia.search, search_with_ticker)
+            if search_results:
+                result = search_results[0]
+                summary = wikipedia_breaker.call(wikipedia.summary, result, sentences=2, ignore=wikipedia_answers())
+                return result, summary
+        except:
+            pass
+    return None
+
+def prefer_company_titles(search_results):
+    """Search results that look like companies, or all of them if none do."""
+    company_results = [result for result in search_results if any(
+        indicator in result.lower() 
+        for indicator in ["inc", "company", "corporation", "technologies", "tech"]
+    )]
+    return company_results if company_results else search_results
+
+def begin_wikipedia_lookup(company_name):
+    """Cache and circuit decision shared by the sync and async (asgi.py) Wikipedia lookups.
+
+    Returns ``(result, pending)``. ``pending`` is None when ``result`` is final
+    (cached, or skipped while the circuit is open); otherwise look the page up
+    and pass the answer to ``finish_wikipedia_lookup(pending, result)``.
+    """
+    cache_key = normalize_name(company_name)
+    found, cached = wiki_cache.get(cache_key)
+    if found:
+        print(f"Using cached Wikipedia lookup for {company_name}")
+        return (tuple(cached) if cached else None), None
+    if wikipedia_breaker.is_open():
+        # Fail fast while Wikipedia is down; the cache above still serves known companies
+        print(f"Wikipedia circuit open, skipping lookup for {company_name}")
+        return None, None
+    return None, (cache_key, wikipedia_breaker.failures + wikipedia_breaker.busy)
+
+def finish_wikipedia_lookup(pending, result):
+    """Cache a fresh lookup's ``result`` and return it."""
+    cache_key, failures_before = pending
+    # Misses are cached too (for a shorter TTL) so unknown names don't repeat every lookup,
+    # but not when the miss may just be Wikipedia failing or too busy to ask
+    if result or wikipedia_breaker.failures + wikipedia_breaker.busy == failures_before:
+        wiki_cache.put(cache_key, list(result) if result else None)
+    return result
+
+def wikipedia_summary_or_generic(company_name, result, failed=False):
+    """``result`` if Wikipedia had one, else a generic (title, description) for the company."""
+    if result:
+        return result
+    if failed:
+        return company_name, f"{company_name} is a publicly traded company with operations in various industry sectors."
+    print(f"No Wikipedia info found, using generic description")
+    return company_name, f"{company_name} is a publicly traded company known for its products and services in the market."
+
+def fetch_wikipedia_summary(company_name): 
+    try: 
+        print(f"Fetching Wikipedia summary for: {company_name}")
+        result, pending = begin_wikipedia_lookup(company_name)
+        if pending is not None:
+            result = finish_wikipedia_lookup(pending, lookup_wikipedia_page(company_name))
+        return wikipedia_summary_or_generic(company_name, result)
     except Exception as e: 
         print(f"Error fetching Wikipedia summary: {str(e)}")
         # Return a generic description instead of an error
-        generic_summary = f"{company_name} is a publicly traded company with operations in various industry sectors."
-        return company_name, generic_summary
+        return wikipedia_summary_or_generic(company_name, None, failed=True)
+
+def is_company_summary(company_name, summary):
+    """Heuristic check that a Wikipedia summary describes the company rather than e.g. the fruit."""
+    company_indicators = ["company", "corporation", "founded", "headquartered", "technology", 
+                        "products", "services", "business", "industry", "market"]
+    
+    is_company = any(indicator in summary.lower() for indicator in company_indicators)
+    
+    # For specific companies known to be confused with other things
+    if company_name.lower() == "apple" and "fruit" in summary.lower() and "tree" in summary.lower():
+        is_company = False
+    
+    if company_name.lower() == "amazon" and "river" in summary.lower() and "rainforest" in summary.lower():
+        is_company = False
+        
+    if company_name.lower() == "shell" and "sea" in summary.lower() and not "oil" in summary.lower():
+        is_company = False
+    return is_company
     
 def get_company_description(company_name, ticker):
     """Get a company description from Wikipedia or generate a fallback description."""
     try:
         # First try Wikipedia
         _, summary = fetch_wikipedia_summary(company_name)
-        
-        # Check if the summary looks like it's about a company
-        company_indicators = ["company", "corporation", "founded", "headquartered", "technology", 
-                            "products", "services", "business", "industry", "market"]
-        
-        is_company_summary = any(indicator in summary.lower() for indicator in company_indicators)
-        
-        # For specific companies known to be confused with other things
-        if company_name.lower() == "apple" and "fruit" in summary.lower() and "tree" in summary.lower():
-            is_company_summary = False
-        
-        if company_name.lower() == "amazon" and "river" in summary.lower() and "rainforest" in summary.lower():
-            is_company_summary = False
-            
-        if company_name.lower() == "shell" and "sea" in summary.lower() and not "oil" in summary.lower():
-            is_company_summary = False
             
         # If the summary doesn't look like it's about a company, use a fallback
-        if not is_company_summary:
+        if not is_company_summary(company_name, summary):
             print(f"Wikipedia summary for {company_name} doesn't look like a company description")
             return generate_company_description(company_name, ticker)
             
@@ -309,100 +468,122 @@ def generate_company_description(company_name, ticker):
         
     return f"{company_name} (ticker: {ticker}) is a publicly traded company operating in the {industry} industry. It is known for its products and services in the market and competes with other major players in the sector."    
 
+def closes_to_series(history):
+    """(stock_prices, time_labels) from a daily history frame, prices rounded to cents."""
+    time_labels = history.index.strftime('%Y-%m-%d').tolist()
+    stock_prices = [round(price, 2) for price in history['Close'].tolist()]
+    return stock_prices, time_labels
+
+def degraded_price_series(ticker):
+    """3-month series from the fallback (synthetic by default) provider; ([], []) if disabled.
+
+    Responses built on it are marked ``degraded`` and only cached briefly.
+    """
+    if fallback_provider is None:
+        return [], []
+    print(f"Using {fallback_provider.name} fallback price data for {ticker}")
+    return closes_to_series(fallback_provider.history(ticker, period="3mo"))
+
+def fallback_source():
+    """Name of the provider behind degraded data, or None when the fallback is disabled."""
+    return fallback_provider.name if fallback_provider is not None else None
+
 def fetch_stock_price(ticker): 
+    """(stock_prices, time_labels, source); ``source`` names the provider, or the fallback's when degraded."""
     try: 
         print(f"Fetching stock price for ticker: {ticker}")
-        # Set a timeout for the request
-        stock = yf.Ticker(ticker)
         # Use a longer period (3mo instead of 1mo) for more detailed response
-        history = stock.history(period="3mo")
+        history = get_price_history(ticker, period="3mo")
         
         if history.empty:
             print(f"No stock price data found for {ticker}")
-            # Generate mock data for testing
-            import datetime
-            import random
-            today = datetime.datetime.now()
-            time_labels = [(today - datetime.timedelta(days=i)).strftime('%Y-%m-%d') for i in range(90, 0, -1)]
-            base_price = 100.0
-            stock_prices = [round(base_price + random.uniform(-10, 10), 2) for _ in range(90)]
-            return stock_prices, time_labels
+            return (*degraded_price_series(ticker), fallback_source())
             
-        time_labels = history.index.strftime('%Y-%m-%d').tolist() 
-        stock_prices = [round(price, 2) for price in history['Close'].tolist()]  # Round prices to 2 decimal places
+        stock_prices, time_labels = closes_to_series(history)
         print(f"Stock price data retrieved successfully. Latest price: ${stock_prices[-1]}")
-        return stock_prices, time_labels 
+        return stock_prices, time_labels, market_data_provider.name
     except Exception as e: 
         print(f"Error fetching stock price for {ticker}: {e}")
         traceback.print_exc()
-        # Generate mock data for testing
-        import datetime
-        import random
-        today = datetime.datetime.now()
-        time_labels = [(today - datetime.timedelta(days=i)).strftime('%Y-%m-%d') for i in range(90, 0, -1)]
-        base_price = 100.0
-        stock_prices = [round(base_price + random.uniform(-10, 10), 2) for _ in range(90)]
-        return stock_prices, time_labels
+        return (*degraded_price_series(ticker), fallback_source())
+
+def is_degraded(price_source, top_competitors):
+    """Whether an analysis shows fallback data: its own prices or any top competitor's."""
+    return price_source != market_data_provider.name or any(comp.get("source") for comp in top_competitors)
 
 def get_ticker_from_alpha_vantage(company_name): 
-    # Check if company is in our cache first
-    company_lower = company_name.lower()
-    for key, ticker in TICKER_CACHE.items():
-        if key in company_lower:
-            print(f"Using cached ticker {ticker} for {company_name}")
-            return ticker
-    
-    # If not in cache, try API with a short timeout
+    """Ticker for ``company_name`` from the symbol index or Alpha Vantage; None when unresolved."""
+    from http_session import upstream_session
+
     try: 
+        # Check the local symbol index (bundled listings + previously learned names) first
+        ticker = symbol_index.resolve(company_name)
+        if ticker:
+            print(f"Using indexed ticker {ticker} for {company_name}")
+            return ticker
+
+        # The free tier allows only a few calls a minute; queue for a token instead of burning one on a throttled
+        # reply, and don't take one while the open circuit would refuse the call anyway
+        alpha_vantage_breaker.check()
+        if not alpha_vantage_limiter.acquire():
+            print(f"Alpha Vantage rate limit reached, no ticker for {company_name}")
+            return None
         print(f"Fetching ticker for {company_name} from Alpha Vantage")
-        url = "https://www.alphavantage.co/query" 
+        url = ALPHA_VANTAGE_URL
         params = { 
             "function": "SYMBOL_SEARCH", 
             "keywords": company_name, 
             "apikey": ALPHA_VANTAGE_API_KEY, 
         }
         
-        print(f"API request params: {params}")
-        response = requests.get(url, params=params, timeout=3)  # 3 second timeout
+        # The breaker fails fast while Alpha Vantage is down and adapts the timeout to its latency
+        response = alpha_vantage_breaker.call(upstream_session().get, url, params=params,
+                                              timeout=alpha_vantage_breaker.timeout())
         print(f"API response status code: {response.status_code}")
         
-        data = response.json()
-        print(f"API response data: {data}")
-        
-        # Check if we got an error message about invalid API key
-        if "Error Message" in data:
-            print(f"Alpha Vantage API error: {data['Error Message']}")
-            # Fallback: Try to guess the ticker from the company name
-            fallback_ticker = company_name.split()[0].upper()
-            print(f"Using fallback ticker: {fallback_ticker}")
-            return fallback_ticker
-            
-        if "bestMatches" in data: 
-            for match in data["bestMatches"]: 
-                if match["4. region"] == "United States": 
-                    # Add to cache for future use
-                    ticker = match["1. symbol"]
-                    TICKER_CACHE[company_lower] = ticker
-                    print(f"Found ticker from API: {ticker}")
-                    return ticker
-            
-        # If no matches found, try to guess the ticker
-        fallback_ticker = company_name.split()[0].upper()
-        print(f"No matches found, using fallback ticker: {fallback_ticker}")
-        return fallback_ticker
+        return ticker_from_symbol_search(company_name, response.json())
     except Exception as e: 
         print(f"DETAILED Error in get_ticker_from_alpha_vantage: {str(e)}")
         traceback.print_exc()
-        # Fallback: Try to guess the ticker from the company name
-        fallback_ticker = company_name.split()[0].upper()
-        print(f"Error occurred, using fallback ticker: {fallback_ticker}")
-        return fallback_ticker
+        return None
+
+def ticker_from_symbol_search(company_name, data):
+    """US ticker from an Alpha Vantage SYMBOL_SEARCH reply (learned for next time if a close match), or None."""
+    # Check if we got an error message about invalid API key
+    if "Error Message" in data:
+        print(f"Alpha Vantage API error: {data['Error Message']}")
+        return None
+    # Throttled: the reply carries a "Note"/"Information" notice instead of matches
+    if "bestMatches" not in data and ("Note" in data or "Information" in data):
+        print(f"Alpha Vantage throttled the lookup for {company_name}: {data.get('Note') or data.get('Information')}")
+        alpha_vantage_limiter.penalize()
+        return None
+        
+    for match in data.get("bestMatches", []): 
+        if match["4. region"] == "United States": 
+            ticker = match["1. symbol"]
+            try:
+                score = float(match.get("9. matchScore", 0))
+            except ValueError:
+                score = 0.0
+            # Remember confident answers (and Alpha Vantage's own name for them) for future lookups;
+            # a loose one would otherwise resolve locally forever
+            if score >= SYMBOL_LEARN_MIN_SCORE:
+                symbol_index.learn(company_name, ticker)
+                if match.get("2. name"):
+                    symbol_index.learn(match["2. name"], ticker)
+            else:
+                print(f"Not learning {company_name} -> {ticker}: match score {score:.2f}")
+            print(f"Found ticker from API: {ticker}")
+            return ticker
+        
+    print(f"No US listing found for {company_name}")
+    return None
  
 def fetch_market_cap(ticker): 
     try: 
         print(f"Fetching market cap for: {ticker}")
-        stock = yf.Ticker(ticker) 
-        market_cap = stock.info.get('marketCap', None)
+        market_cap = market_data_provider.market_cap(ticker)
         if market_cap:
             print(f"Market cap for {ticker}: {market_cap}")
         else:
@@ -416,88 +597,165 @@ def fetch_market_cap(ticker):
 def get_stock_price_for_competitor(ticker): 
     try: 
         print(f"Fetching stock price for competitor: {ticker}")
-        stock = yf.Ticker(ticker) 
         # Use a longer period (3mo instead of 1mo) for more detailed response
-        history = stock.history(period="3mo") 
+        history = get_price_history(ticker, period="3mo")
         
         if history.empty:
             print(f"No stock price data found for competitor {ticker}")
-            # Generate mock data for testing
-            import datetime
-            import random
-            today = datetime.datetime.now()
-            time_labels = [(today - datetime.timedelta(days=i)).strftime('%Y-%m-%d') for i in range(90, 0, -1)]
-            base_price = 100.0
-            stock_prices = [round(base_price + random.uniform(-10, 10), 2) for _ in range(90)]
-            return stock_prices, time_labels
+            return degraded_price_series(ticker)
             
-        time_labels = history.index.strftime('%Y-%m-%d').tolist() 
-        stock_prices = [round(price, 2) for price in history['Close'].tolist()]  # Round prices to 2 decimal places
+        stock_prices, time_labels = closes_to_series(history)
         print(f"Stock data for competitor {ticker} retrieved successfully")
         return stock_prices, time_labels 
     except Exception as e: 
         print(f"Error fetching stock price for competitor {ticker}: {e}")
         traceback.print_exc()
-        # Generate mock data for testing
-        import datetime
-        import random
-        today = datetime.datetime.now()
-        time_labels = [(today - datetime.timedelta(days=i)).strftime('%Y-%m-%d') for i in range(90, 0, -1)]
-        base_price = 100.0
-        stock_prices = [round(base_price + random.uniform(-10, 10), 2) for _ in range(90)]
-        return stock_prices, time_labels
+        return degraded_price_series(ticker)
  
+def fetch_competitor_histories(tickers):
+    """Fetch 3-month closes for several tickers in one ``market_data_provider.download`` call.
+
+    Tickers already in the shared price cache are served from it; the rest are
+    downloaded together and written back to the cache.
+    Returns a dict of ticker -> (stock_prices, time_labels); tickers with no data are omitted.
+    """
+    histories = {}
+    frames = {}
+    missing = []
+    for ticker in tickers:
+        cached = price_cache.get((ticker.upper(), "3mo", "1d"))
+        if cached is None:
+            missing.append(ticker)
+        else:
+            frames[ticker] = cached
+    if missing:
+        try:
+            print(f"Batch fetching stock prices for competitors: {missing}")
+            for ticker, frame in market_data_provider.download(missing, period="3mo").items():
+                price_cache.put((ticker.upper(), "3mo", "1d"), frame)
+                frames[ticker] = frame
+        except Exception as e:
+            print(f"Error batch fetching competitor stock prices: {e}")
+            traceback.print_exc()
+    for ticker, frame in frames.items():
+        if "Close" not in frame or frame["Close"].empty:
+            print(f"No stock price data found for competitor {ticker}")
+            continue
+        histories[ticker] = closes_to_series(frame)
+    return histories
+
+def enrich_competitors(competitors, deadline=None):
+    """Batched competitor enrichment bounded by a shared deadline (seconds).
+
+    Tickers are resolved concurrently, market caps are fetched concurrently and
+    all price histories come from a single download. Competitors whose lookups
+    have not finished when the deadline expires are dropped (and cancelled if
+    not started); rate-limit waits inside them are capped at the deadline too.
+    """
+    deadline, ticker_budget, expires = competitor_deadlines(deadline)
+    executor = fanout_executor()
+
+    with upstream_deadline(ticker_budget):
+        ticker_futures = {submit_in_context(executor, get_ticker_from_alpha_vantage, name): name
+                          for name in competitors}
+    done, _ = wait(ticker_futures, timeout=ticker_budget)
+    names_by_ticker = resolved_competitor_tickers(ticker_futures, done, ticker_budget)
+    if not names_by_ticker:
+        return []
+
+    remaining = max(0.0, expires - time.monotonic())
+    with upstream_deadline(remaining):
+        cap_futures = {submit_in_context(executor, fetch_market_cap, ticker): ticker for ticker in names_by_ticker}
+        histories_future = submit_in_context(executor, fetch_competitor_histories, list(names_by_ticker))
+    done, _ = wait(list(cap_futures) + [histories_future], timeout=remaining)
+    return finished_competitor_entries(names_by_ticker, cap_futures, histories_future, done, deadline)
+
+# The helpers below take concurrent.futures and asyncio futures alike, so asgi.py shares them
+
+def competitor_deadlines(deadline=None):
+    """(deadline, ticker-stage budget, monotonic expiry) for one competitor enrichment."""
+    deadline = COMPETITOR_DEADLINE if deadline is None else deadline
+    # Ticker resolution gets half the budget so the price download always has time left
+    return deadline, deadline / 2, time.monotonic() + deadline
+
+def resolved_competitor_tickers(ticker_futures, done, budget):
+    """Ticker -> competitor name from the lookups in ``done`` (first name wins); the rest are cancelled."""
+    names_by_ticker = {}
+    for future, name in ticker_futures.items():
+        if future not in done:
+            future.cancel()
+            print(f"Ticker lookup for {name} missed the {budget}s deadline")
+            continue
+        try:
+            ticker = future.result()
+        except Exception as e:
+            print(f"Error resolving ticker for {name}: {e}")
+            continue
+        if ticker and ticker not in names_by_ticker:
+            names_by_ticker[ticker] = name
+    return names_by_ticker
+
+def finished_competitor_entries(names_by_ticker, cap_futures, histories_future, done, deadline):
+    """Competitor dicts from the market cap and history lookups in ``done``; the rest are cancelled."""
+    for future in [*cap_futures, histories_future]:
+        if future not in done:
+            future.cancel()
+    if histories_future not in done:
+        print(f"Competitor price download missed the {deadline}s deadline")
+        return []
+    market_caps = {}
+    for future, ticker in cap_futures.items():
+        if future not in done:
+            print(f"Market cap lookup for {ticker} missed the {deadline}s deadline")
+            continue
+        market_caps[ticker] = future.result()
+    return competitor_entries(names_by_ticker, market_caps, histories_future.result())
+
+def competitor_entries(names_by_ticker, market_caps, histories):
+    """Competitor dicts for the tickers that have both a market cap and a price history."""
+    competitor_data = []
+    for ticker, market_cap in market_caps.items():
+        stock_prices, time_labels = histories.get(ticker, (None, None))
+        if market_cap and stock_prices and time_labels:
+            competitor_data.append({
+                "name": names_by_ticker[ticker],
+                "ticker": ticker,
+                "market_cap": market_cap,
+                "stock_prices": stock_prices,
+                "time_labels": time_labels,
+                "stock_price": stock_prices[-1],
+            })
+    return competitor_data
+
+# If we don't have any competitors or encounter issues, use these fallback companies
+FALLBACK_COMPETITORS = {"Microsoft": "MSFT", "Apple": "AAPL", "Amazon": "AMZN"}
+
+def competitor_names(competitors):
+    """The provided competitors (deduplicated), or the fallback companies if empty."""
+    return set(competitors) if competitors else list(FALLBACK_COMPETITORS)
+
 def get_top_competitors(competitors): 
     print(f"Getting top competitors for: {competitors}")
-    competitor_data = [] 
-    processed_tickers = set()  # To track processed tickers and avoid duplicates 
-    
-    # If we don't have any competitors or encounter issues, use these fallback companies
-    fallback_competitors = ["Microsoft", "Apple", "Amazon"]
-    
-    # Use the provided competitors or fallback if empty
-    competitors_to_process = set(competitors) if competitors else fallback_competitors
+    competitors_to_process = competitor_names(competitors)
     print(f"Processing competitors: {competitors_to_process}")
  
-    for competitor in competitors_to_process:  # Remove duplicate names 
-        ticker = get_ticker_from_alpha_vantage(competitor) 
-        if ticker and ticker not in processed_tickers: 
-            market_cap = fetch_market_cap(ticker) 
-            stock_prices, time_labels = get_stock_price_for_competitor(ticker) 
-            if market_cap and stock_prices and time_labels: 
-                competitor_data.append({ 
-                    "name": competitor, 
-                    "ticker": ticker, 
-                    "market_cap": market_cap, 
-                    "stock_prices": stock_prices, 
-                    "time_labels": time_labels, 
-                    "stock_price": stock_prices[-1], 
-                }) 
-                processed_tickers.add(ticker)  # Add ticker to the processed set 
-    
-    # If we couldn't get any valid competitor data, use fallback data
-    if not competitor_data:
-        print("No valid competitor data found, using fallback data")
-        # Create some fallback data with mock values
-        import random
-        for i, comp in enumerate(fallback_competitors):
-            ticker = comp[0:3].upper()  # Just use first 3 letters as ticker
-            mock_market_cap = 1000000000 * (3-i)  # Decreasing market caps
-            # Add random walk for mock prices to avoid straight lines
-            mock_prices = []
-            price = 100 + i*10
-            for j in range(30):
-                price += random.uniform(-2, 2)
-                mock_prices.append(round(price, 2))
-            mock_dates = [f"2025-04-{j+1:02d}" for j in range(30)]  # Mock dates
-            
+    return rank_competitors(enrich_competitors(competitors_to_process))
+
+def rank_competitors(competitor_data):
+    """Top 3 enriched competitors by market cap, or the fallback trio from the degraded-mode provider."""
+    # If we couldn't get any valid competitor data, use the degraded-mode provider
+    if not competitor_data and fallback_provider is not None:
+        print(f"No valid competitor data found, using {fallback_provider.name} fallback data")
+        for comp, ticker in FALLBACK_COMPETITORS.items():
+            stock_prices, time_labels = degraded_price_series(ticker)
             competitor_data.append({
                 "name": comp,
                 "ticker": ticker,
-                "market_cap": mock_market_cap,
-                "stock_prices": mock_prices,
-                "time_labels": mock_dates,
-                "stock_price": mock_prices[-1],
+                "market_cap": fallback_provider.market_cap(ticker),
+                "stock_prices": stock_prices,
+                "time_labels": time_labels,
+                "stock_price": stock_prices[-1],
+                "source": fallback_provider.name,
             })
  
     # Sort competitors by market cap and return the top 3 
@@ -505,23 +763,37 @@ def get_top_competitors(competitors):
     print(f"Top competitors identified: {[comp['name'] for comp in top_competitors]}")
     return top_competitors 
  
+def fallback_sectors():
+    return [
+        {
+            "name": "Technology Sector:",
+            "competitors": ["Microsoft", "Apple", "IBM", "Oracle"]
+        },
+        {
+            "name": "Financial Sector:",
+            "competitors": ["JPMorgan Chase", "Bank of America", "Wells Fargo", "Citigroup"]
+        }
+    ]
+
+def parse_sectors(content):
+    """Parse the "Sector :\n  Competitor\n..." blocks of a Gemini answer."""
+    sectors = [] 
+    for line in content.split("\n\n"): 
+        lines = line.strip().split("\n") 
+        if len(lines) > 1: 
+            sector_name = lines[0].strip() 
+            competitors = [l.strip() for l in lines[1:]] 
+            sectors.append({"name": sector_name, "competitors": competitors}) 
+    return sectors
+
 def query_gemini_llm(description): 
     try: 
         print(f"Querying Gemini LLM with description: {description[:100]}...")
         # Check if client is defined (it might not be if API key is invalid)
-        if 'client' not in globals():
+        if llm_service is None:
             print("Gemini client not initialized, using fallback data")
             # Return fallback data
-            return [
-                {
-                    "name": "Technology Sector:",
-                    "competitors": ["Microsoft", "Apple", "IBM", "Oracle"]
-                },
-                {
-                    "name": "Financial Sector:",
-                    "competitors": ["JPMorgan Chase", "Bank of America", "Wells Fargo", "Citigroup"]
-                }
-            ]
+            return fallback_sectors()
             
         prompt = f""" 
         Provide a structured list of sectors and their competitors for the following company description: 
@@ -537,33 +809,13 @@ def query_gemini_llm(description):
         
         try:
             print("Sending request to Gemini API...")
-            response = client.models.generate_content( 
-                model="gemini-1.5-flash", contents=prompt 
-            ) 
-            content = response.candidates[0].content.parts[0].text
-            print(f"Received response from Gemini: {content[:100]}...")
+            # Identical prompts are answered from the LLM cache without calling Gemini
+            sectors = llm_service.query(prompt, parse_sectors)
         except Exception as api_error:
             print(f"Error calling Gemini API: {api_error}")
             traceback.print_exc()
             # Return fallback data
-            return [
-                {
-                    "name": "Technology Sector:",
-                    "competitors": ["Microsoft", "Apple", "IBM", "Oracle"]
-                },
-                {
-                    "name": "Financial Sector:",
-                    "competitors": ["JPMorgan Chase", "Bank of America", "Wells Fargo", "Citigroup"]
-                }
-            ]
-            
-        sectors = [] 
-        for line in content.split("\n\n"): 
-            lines = line.strip().split("\n") 
-            if len(lines) > 1: 
-                sector_name = lines[0].strip() 
-                competitors = [l.strip() for l in lines[1:]] 
-                sectors.append({"name": sector_name, "competitors": competitors}) 
+            return fallback_sectors()
         
         print(f"Processed {len(sectors)} sectors from Gemini response")
         return sectors 
@@ -571,19 +823,87 @@ def query_gemini_llm(description):
         print(f"Error in query_gemini_llm: {e}")
         traceback.print_exc()
         # Return fallback data
-        return [
-            {
-                "name": "Technology Sector:",
-                "competitors": ["Microsoft", "Apple", "IBM", "Oracle"]
-            },
-            {
-                "name": "Financial Sector:",
-                "competitors": ["JPMorgan Chase", "Bank of America", "Wells Fargo", "Citigroup"]
-            }
-        ]
-
-# Start the scheduler for alerts
-start_scheduler()
+        return fallback_sectors()
+
+def compute_company_profile(company_name):
+    """Run the full Wikipedia -> Gemini -> Alpha Vantage -> yfinance chain for the competitor graph.
+
+    Returns None when Gemini fell back to canned sectors, so placeholders are never stored.
+    """
+    ticker = get_ticker_from_alpha_vantage(company_name)
+    if not ticker:
+        return None
+    description = get_company_description(company_name, ticker)
+    sectors = query_gemini_llm(description)
+    if not sectors or sectors == fallback_sectors():
+        return None
+    relevant_competitors = sectors[0].get("competitors") or []
+    enriched = enrich_competitors(set(relevant_competitors)) if relevant_competitors else []
+    top_competitors = sorted(enriched, key=lambda x: x["market_cap"], reverse=True)[:3]
+    return analysis_profile(ticker, description, sectors, top_competitors)
+
+def analysis_profile(ticker, description, sectors, top_competitors):
+    """Competitor-graph profile for an analysis that was just computed, or None if it holds placeholders.
+
+    Placeholder sectors and degraded competitors (the fallback trio, which carries a ``source``)
+    are never stored; the next refresh retries the upstreams instead.
+    """
+    if not sectors or sectors == fallback_sectors() or sectors[0].get("name") == "No Sectors":
+        return None
+    if any(comp.get("source") for comp in top_competitors):
+        return None
+    relevant = set(sectors[0].get("competitors") or [])
+    return {
+        "ticker": ticker,
+        "description": description,
+        "sectors": sectors,
+        "top_competitors": [{"name": comp["name"], "ticker": comp["ticker"], "market_cap": comp["market_cap"]}
+                            for comp in top_competitors if comp["name"] in relevant],
+    }
+
+def stored_top_competitors(profile):
+    """Top competitors from a stored profile, with fresh price history for each."""
+    stored = [comp for comp in profile["top_competitors"] if comp["ticker"]]
+    histories = fetch_competitor_histories([comp["ticker"] for comp in stored])
+    top_competitors = []
+    for comp in stored:
+        stock_prices, time_labels = histories.get(comp["ticker"], (None, None))
+        if stock_prices and time_labels:
+            top_competitors.append(dict(comp, stock_prices=stock_prices, time_labels=time_labels,
+                                        stock_price=stock_prices[-1]))
+    return top_competitors
+
+# Company -> sectors -> competitors, served from the database and refreshed in the background
+graph_refresher = GraphRefresher(app, compute_company_profile)
+COMPETITOR_GRAPH_REFRESH_MINUTES = int(os.getenv("COMPETITOR_GRAPH_REFRESH_MINUTES", 60))
+# Expired rows are otherwise only skipped on read, never deleted from the cache database
+CACHE_PURGE_MINUTES = int(os.getenv("CACHE_PURGE_MINUTES", 30))
+
+# Set RUN_SCHEDULER=0 on web workers when a separate scheduler_worker.py process runs the jobs
+RUN_SCHEDULER = os.getenv("RUN_SCHEDULER", "1") == "1"
+scheduler = None
+
+def create_app(run_scheduler=None):
+    """Application factory for WSGI servers (see wsgi.py); safe to call once per worker process.
+
+    Creates the database tables and, if ``run_scheduler`` (default RUN_SCHEDULER),
+    starts the background scheduler. Its jobs only run in the process holding
+    the scheduler lease, so alerts are checked once however many workers start one.
+    """
+    global scheduler
+    run_scheduler = RUN_SCHEDULER if run_scheduler is None else run_scheduler
+    # Initialize database (before the scheduler, whose warm-up job runs immediately)
+    with app.app_context():
+        db.create_all()
+    if run_scheduler and scheduler is None:
+        lease = LeaderLease(app)
+        scheduler = start_scheduler(app, lease)
+        # Warm the competitor graph for popular and frequently requested companies
+        scheduler.add_job(run_as_leader, 'interval', minutes=COMPETITOR_GRAPH_REFRESH_MINUTES,
+                          args=[lease, graph_refresher.warm_up], next_run_time=datetime.datetime.now())
+        scheduler.add_job(run_as_leader, 'interval', minutes=CACHE_PURGE_MINUTES, args=[lease, purge_all_expired])
+        atexit.register(lease.release)
+    return app
 
 # Test routes for debugging
 @app.route("/test_auth")
@@ -601,6 +921,46 @@ def test_alpha_vantage():
     except Exception as e:
         return jsonify({"success": False, "error": str(e)})
 
+@app.route("/cache_stats")
+def cache_stats():
+    return jsonify(price_cache=price_cache.stats(),
+                   ohlcv_store=ohlcv_store.stats() if ohlcv_store else None,
+                   wikipedia=wiki_cache.stats(),
+                   llm=llm_service.stats() if llm_service else None,
+                   competitor_graph=graph_refresher.stats(),
+                   analyze_responses=response_cache.stats())
+
+@app.route("/metrics/upstreams")
+def upstream_metrics():
+    """Circuit breaker state, latency percentiles, rate-limiter queues, connection reuse and the email queue."""
+    from http_session import pool_stats
+
+    return jsonify(breakers=breaker_stats(), rate_limits=limiter_stats(), http_pools=pool_stats(),
+                   smtp=notifier.dispatcher.stats())
+
+def cache_hit_ratios():
+    ratios = [({"cache": "price_history"}, price_cache.stats()["hit_ratio"]),
+              ({"cache": "wikipedia"}, wiki_cache.stats()["hit_ratio"]),
+              ({"cache": "analyze_responses"}, response_cache.stats()["hit_ratio"])]
+    if llm_service:
+        llm = llm_service.stats()
+        lookups = llm["calls"] + llm["cache_hits"]
+        ratios.append(({"cache": "gemini"}, round(llm["cache_hits"] / lookups, 4) if lookups else 0.0))
+    return ratios
+
+def circuit_states():
+    return [({"upstream": name}, int(stats["state"] != "closed")) for name, stats in breaker_stats().items()]
+
+registry.gauge_collector("stockmind_cache_hit_ratio", "Hit ratio of each in-process cache since start.",
+                         cache_hit_ratios)
+registry.gauge_collector("stockmind_circuit_open", "1 while an upstream's circuit breaker is open or half-open.",
+                         circuit_states)
+
+@app.route("/metrics")
+def prometheus_metrics():
+    """Route, upstream, cache and scheduler metrics in the Prometheus text format."""
+    return Response(registry.render(), content_type=METRICS_CONTENT_TYPE)
+
 @app.route("/test_gemini")
 def test_gemini():
     try:
@@ -616,20 +976,46 @@ def alert_form():
 
 @app.route('/alerts')
 def view_alerts():
-    return render_template('alert_form.html', alerts=alerts)
+    active_alerts = Alert.query.filter_by(active=True).order_by(Alert.ticker).all()
+    return render_template('alert_form.html', alerts=[alert.to_dict() for alert in active_alerts])
+
+ALERT_TYPES = ("price", "rsi")
+ALERT_DIRECTIONS = ("above", "below")
 
 @app.route('/create_alert', methods=['POST'])
 def create_alert():
     data = request.form
-    alerts.append({
-        'type': data.get('type'),             # "price" or "rsi"
-        'ticker': data.get('ticker'),
-        'target': float(data.get('target', 0)),
-        'threshold': float(data.get('threshold', 30)),
-        'direction': data.get('direction'),
-        'email': data.get('email')
-    })
-    flash(f"Alert created for {data.get('ticker')}", "success")
+    alert_type = data.get('type')
+    ticker = (data.get('ticker') or '').strip().upper()
+    direction = data.get('direction')
+    if alert_type not in ALERT_TYPES:
+        flash("Choose a price or RSI alert", "error")
+        return redirect('/')
+    if not ticker or len(ticker) > 16:
+        flash("Enter a valid ticker", "error")
+        return redirect('/')
+    if direction not in ALERT_DIRECTIONS:
+        flash("Choose whether the alert fires above or below its level", "error")
+        return redirect('/')
+    try:
+        target = float(data.get('target') or 0)
+        threshold = float(data.get('threshold') or 30)
+    except ValueError:
+        flash("Target and threshold must be numbers", "error")
+        return redirect('/')
+    if (alert_type == "price" and not target > 0) or (alert_type == "rsi" and not 0 <= threshold <= 100):
+        flash("Price targets must be positive and RSI thresholds between 0 and 100", "error")
+        return redirect('/')
+    db.session.add(Alert(
+        type=alert_type,
+        ticker=ticker,
+        target=target,
+        threshold=threshold,
+        direction=direction,
+        email=data.get('email'),
+    ))
+    db.session.commit()
+    flash(f"Alert created for {ticker}", "success")
     return redirect('/')
 
 # Main route
@@ -724,6 +1110,53 @@ def logout():
     session.pop("username", None)
     return redirect(url_for('home'))
 
+def timed_stage(timings, stage, func, *args):
+    """Run one analysis stage and record its wall-clock duration (ms) under ``stage``."""
+    stage_start = time.perf_counter()
+    try:
+        return func(*args)
+    finally:
+        elapsed = time.perf_counter() - stage_start
+        timings[stage] = round(elapsed * 1000, 1)
+        stage_latency.observe(elapsed, stage=stage)
+
+def cached_json_response(entry, cache_status):
+    """Serve a cached /analyze_company body, or 304 if the client already holds this ETag.
+
+    Bodies above COMPRESS_MIN_BYTES are sent gzip/brotli-compressed when the client
+    accepts it; each coding gets its own ETag.
+    """
+    encoding = pick_encoding(request.accept_encodings) if len(entry.body) >= COMPRESS_MIN_BYTES else None
+    etag = f"{entry.etag}-{encoding}" if encoding else entry.etag
+    not_modified = etag in request.if_none_match
+    if not_modified:
+        response = app.response_class(status=304)
+        response_cache.record(entry, True, 0)
+    else:
+        body = entry.encoded(encoding, compress) if encoding else entry.body
+        response = app.response_class(body, mimetype="application/json")
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+        response_cache.record(entry, False, len(body))
+    response.set_etag(etag)
+    response.vary.add("Accept-Encoding")
+    response.cache_control.public = True
+    response.cache_control.max_age = entry.max_age()
+    response.headers["X-Cache"] = cache_status
+    return response
+
+def analysis_variant(wire, price_encoding):
+    """Response cache variant for the format/price_encoding query arguments, or None if unsupported."""
+    if wire not in ("json", "compact") or price_encoding not in ("delta", "f32"):
+        return None
+    return wire if wire == "json" else f"compact-{price_encoding}"
+
+def analysis_body(payload, wire, price_encoding):
+    """Serialized /analyze_company body (needs an app context for jsonify)."""
+    if wire == "compact":
+        payload = encode_analysis(payload, price_encoding)
+    return jsonify(payload).get_data()
+
 # API route for analyzing companies
 @app.route("/analyze_company", methods=["GET"]) 
 def analyze_company(): 
@@ -740,48 +1173,86 @@ def analyze_company():
         
         if not company_name: 
             return jsonify(success=False, error="No company name provided.") 
+
+        # format=compact shares one date axis across all series (see wire_format.py);
+        # price_encoding=f32 sends base64 float32 arrays instead of integer cent deltas
+        wire = request.args.get("format", "json")
+        price_encoding = request.args.get("price_encoding", "delta")
+        variant = analysis_variant(wire, price_encoding)
+        if variant is None:
+            return jsonify(success=False, error="Unsupported format or price_encoding.")
+
+        cached = response_cache.get(company_name, variant)
+        if cached is not None:
+            print(f"Serving cached analysis for {company_name}")
+            return cached_json_response(cached, "HIT")
      
-        # First get the ticker - we'll need this for better company descriptions
-        ticker = get_ticker_from_alpha_vantage(company_name) 
-        if not ticker: 
-            ticker = company_name.split()[0].upper()
-            print(f"Using fallback ticker {ticker} for {company_name}")
-        
-        # Get a company-specific description
-        summary = get_company_description(company_name, ticker)
-        print(f"Company description: {summary[:100]}...")
-     
-        stock_prices, time_labels = fetch_stock_price(ticker) 
-        if not stock_prices or not time_labels: 
-            print(f"Using mock stock data for {ticker}")
-            stock_prices = [100 + i for i in range(30)]
-            time_labels = [f"2025-04-{i+1:02d}" for i in range(30)]
-     
-        competitors = query_gemini_llm(summary) 
-        if not competitors: 
-            competitors = [{"name": "No Sectors", "competitors": ["No competitors found."]}] 
-     
-        # Use only the first sector's competitors for top competitors
-        if competitors and competitors[0].get("competitors"):
-            relevant_competitors = competitors[0]["competitors"]
+        # Stage graph: ticker -> (prices || description -> sectors -> competitors)
+        timings = {}
+        started = time.perf_counter()
+
+        # A stored profile turns the whole chain into one indexed read (refreshed in the background if stale)
+        profile = timed_stage(timings, "graph", graph_refresher.get, company_name)
+        if profile is not None:
+            ticker = profile["ticker"]
+            prices_future = analysis_executor.submit(timed_stage, timings, "stock_prices", fetch_stock_price, ticker)
+            summary = profile["description"]
+            competitors = profile["sectors"]
+            relevant_competitors = competitors[0]["competitors"] if competitors else []
+            top_competitors = timed_stage(timings, "top_competitors", stored_top_competitors, profile)
+            if not top_competitors:
+                top_competitors = timed_stage(timings, "top_competitors", get_top_competitors, relevant_competitors)
+            print(f"Served {company_name} from the competitor graph (age {profile['age']:.0f}s)")
         else:
-            relevant_competitors = []
-        print(f"Relevant competitors for {company_name}: {relevant_competitors}")
-        top_competitors = get_top_competitors(relevant_competitors)
+            ticker = timed_stage(timings, "ticker", get_ticker_from_alpha_vantage, company_name)
+            if not ticker: 
+                return jsonify(success=False, error=f"Could not find a stock ticker for {company_name}.")
+            
+            # Price history only needs the ticker, so it runs alongside the description chain
+            prices_future = analysis_executor.submit(timed_stage, timings, "stock_prices", fetch_stock_price, ticker)
+
+            # Get a company-specific description
+            summary = timed_stage(timings, "description", get_company_description, company_name, ticker)
+            print(f"Company description: {summary[:100]}...")
+         
+            competitors = timed_stage(timings, "sectors", query_gemini_llm, summary)
+            if not competitors: 
+                competitors = [{"name": "No Sectors", "competitors": ["No competitors found."]}] 
+         
+            # Use only the first sector's competitors for top competitors
+            if competitors and competitors[0].get("competitors"):
+                relevant_competitors = competitors[0]["competitors"]
+            else:
+                relevant_competitors = []
+            print(f"Relevant competitors for {company_name}: {relevant_competitors}")
+            top_competitors = timed_stage(timings, "top_competitors", get_top_competitors, relevant_competitors)
+            # Store what was just computed for next time
+            graph_refresher.save_async(company_name, analysis_profile(ticker, summary, competitors, top_competitors))
         print(f"Top competitors data for {company_name}:")
         for comp in top_competitors:
             print(f"  {comp['name']} | Ticker: {comp['ticker']} | Market Cap: {comp['market_cap']} | Last Price: {comp['stock_price']}")
+
+        stock_prices, time_labels, price_source = prices_future.result()
+        timings["total"] = round((time.perf_counter() - started) * 1000, 1)
+        print(f"Stage timings for {company_name} (ms): {timings}")
+        degraded = is_degraded(price_source, top_competitors)
      
         print("Successfully analyzed company, returning data")
-        return jsonify( 
+        payload = dict( 
             success=True, 
             description=summary, 
             ticker=ticker, 
             stock_prices=stock_prices, 
             time_labels=time_labels, 
+            price_source=price_source,
+            degraded=degraded,
             competitors=competitors, 
             top_competitors=top_competitors, 
+            timings=timings,
         )
+        # Only successful analyses are cached (degraded ones briefly); errors are retried on the next request
+        body = analysis_body(payload, wire, price_encoding)
+        return cached_json_response(response_cache.put(company_name, body, variant, degraded=degraded), "MISS")
     except Exception as e:
         print(f"Error in analyze_company: {e}")
         traceback.print_exc()
@@ -790,13 +1261,308 @@ def analyze_company():
             error=f"An error occurred while analyzing the company: {str(e)}"
         )
 
-# Initialize database
-with app.app_context():
-    db.create_all()
+def enrich_competitor(name):
+    """Ticker, market cap and 3-month history for a single competitor, or None if any is missing."""
+    ticker = get_ticker_from_alpha_vantage(name)
+    if not ticker:
+        return None
+    market_cap = fetch_market_cap(ticker)
+    stock_prices, time_labels = fetch_competitor_histories([ticker]).get(ticker, (None, None))
+    if not (market_cap and stock_prices and time_labels):
+        return None
+    return {
+        "name": name,
+        "ticker": ticker,
+        "market_cap": market_cap,
+        "stock_prices": stock_prices,
+        "time_labels": time_labels,
+        "stock_price": stock_prices[-1],
+    }
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+# Streaming variant of /analyze_company
+@app.route("/analyze_company/stream", methods=["GET"])
+def analyze_company_stream():
+    """Server-Sent Events version of /analyze_company that sends each stage as soon as it is ready.
+
+    Events: ticker, prices, description, sectors, one competitor per enriched
+    competitor (the client keeps the top 3 by market cap), then done, or
+    analysis_error if the analysis fails. Every event carries ``t``, the ms
+    elapsed since the request started.
+    """
+    company_name = request.args.get("company_name")
+    if not company_name:
+        return jsonify(success=False, error="No company name provided.")
+
+    def generate():
+        started = time.perf_counter()
+        timings = {}
+
+        def event(name, data):
+            timings[name] = round((time.perf_counter() - started) * 1000, 1)
+            return sse_event(name, dict(data, t=timings[name]))
+
+        try:
+            profile = graph_refresher.get(company_name)
+            ticker = profile["ticker"] if profile else get_ticker_from_alpha_vantage(company_name)
+            if not ticker:
+                yield event("analysis_error", {"error": f"Could not find a stock ticker for {company_name}."})
+                return
+            yield event("ticker", {"ticker": ticker})
+
+            pending = {analysis_executor.submit(fetch_stock_price, ticker): "prices"}
+            if profile is not None:
+                yield event("description", {"description": profile["description"]})
+                yield event("sectors", {"competitors": profile["sectors"]})
+                pending[analysis_executor.submit(stored_top_competitors, profile)] = "stored_competitors"
+            else:
+                pending[analysis_executor.submit(get_company_description, company_name, ticker)] = "description"
+
+            seen_tickers = set()
+            streamed = []
+            competitors_expire = None
+            while pending:
+                timeout = None if competitors_expire is None else max(0.0, competitors_expire - time.monotonic())
+                done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                if not done:
+                    late = [future for future, stage in pending.items() if stage == "competitor"]
+                    print(f"Dropping {len(late)} competitors that missed the {COMPETITOR_DEADLINE}s deadline")
+                    for future in late:
+                        del pending[future]
+                    competitors_expire = None
+                    continue
+                for future in done:
+                    stage = pending.pop(future)
+                    if stage == "prices":
+                        stock_prices, time_labels, price_source = future.result()
+                        yield event("prices", {"stock_prices": stock_prices, "time_labels": time_labels,
+                                               "source": price_source})
+                    elif stage == "description":
+                        summary = future.result()
+                        yield event("description", {"description": summary})
+                        pending[analysis_executor.submit(query_gemini_llm, summary)] = "sectors"
+                    elif stage == "sectors":
+                        competitors = future.result() or [{"name": "No Sectors", "competitors": ["No competitors found."]}]
+                        yield event("sectors", {"competitors": competitors})
+                        relevant_competitors = competitors[0].get("competitors") or []
+                        for name in dict.fromkeys(relevant_competitors):
+                            pending[analysis_executor.submit(enrich_competitor, name)] = "competitor"
+                        competitors_expire = time.monotonic() + COMPETITOR_DEADLINE
+                    else:
+                        try:
+                            results = future.result() if stage == "stored_competitors" else [future.result()]
+                        except Exception as e:
+                            print(f"Error enriching competitor: {e}")
+                            continue
+                        for comp in results:
+                            if comp and comp["ticker"] not in seen_tickers:
+                                seen_tickers.add(comp["ticker"])
+                                streamed.append(comp)
+                                yield event("competitor", comp)
+
+            if profile is None:
+                top_competitors = sorted(streamed, key=lambda comp: comp["market_cap"], reverse=True)[:3]
+                graph_refresher.save_async(company_name, analysis_profile(ticker, summary, competitors, top_competitors))
+            print(f"Stream timings for {company_name} (ms): {timings}")
+            yield event("done", {"timings": dict(timings), "degraded": is_degraded(price_source, streamed)})
+        except Exception as e:
+            print(f"Error in analyze_company_stream: {e}")
+            traceback.print_exc()
+            yield sse_event("analysis_error", {"error": f"An error occurred while analyzing the company: {str(e)}"})
+
+    return Response(stream_with_context(generate()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def describe_and_classify(company_name, ticker):
+    """Description and Gemini sectors for one company (the per-company part of a batch)."""
+    summary = get_company_description(company_name, ticker)
+    return summary, query_gemini_llm(summary)
+
+def analyze_batch(company_names):
+    """Analyze many companies with shared work, yielding one result dict per company as it completes.
+
+    Names are deduplicated by normalized name, competitor tickers by name and
+    market caps by ticker across the whole batch. Companies whose profile and
+    competitor market caps are ready are grouped into waves; each wave fetches
+    the price history of every company and top competitor in it with a single
+    multi-ticker download, so a warm batch needs one download in total.
+    Results have the /analyze_company shape plus ``company_name``.
+    """
+    jobs = {}
+    for name in company_names:
+        jobs.setdefault(normalize_name(name), {"name": name})
+    pending = {}  # future -> (stage, key)
+    comp_tickers = {}  # competitor name -> ticker (None if unresolved)
+    caps = {}  # ticker -> market cap
+    waiting = []  # jobs ready for the next download wave
+    download = None
+    # Description/Gemini chains are slow; capping them keeps pool workers free for the quick lookups
+    to_describe = []
+    describing = 0
+    # Batch upstream calls queue behind interactive requests for rate-limited APIs
+    submit = functools.partial(batch_executor.submit, run_at_priority, BATCH)
+
+    for key, job in jobs.items():
+        cached = response_cache.get(job["name"])
+        if cached is not None:
+            yield dict(json.loads(cached.body), company_name=job["name"])
+            continue
+        profile = graph_refresher.get(job["name"])
+        if profile is not None:
+            job.update(from_graph=True, ticker=profile["ticker"], description=profile["description"], sectors=profile["sectors"],
+                       top=[(comp["name"], comp["ticker"], comp["market_cap"]) for comp in profile["top_competitors"]
+                            if comp["ticker"]])
+            waiting.append(key)
+        else:
+            pending[submit(get_ticker_from_alpha_vantage, job["name"])] = ("ticker", key)
+
+    def sectors_in(key, sectors):
+        job = jobs[key]
+        job["sectors"] = sectors or [{"name": "No Sectors", "competitors": ["No competitors found."]}]
+        job["relevant"] = list(dict.fromkeys(job["sectors"][0].get("competitors") or []))
+        job["expires"] = time.monotonic() + COMPETITOR_DEADLINE
+        for name in job["relevant"]:
+            if name not in comp_tickers:
+                comp_tickers[name] = None
+                pending[submit(get_ticker_from_alpha_vantage, name)] = ("comp_ticker", name)
+
+    def ready(job, now, resolving):
+        # All competitor tickers and their market caps are in (or the deadline passed)
+        if "relevant" not in job or "top" in job:
+            return False
+        outstanding = [name for name in job["relevant"]
+                       if name in resolving or comp_tickers.get(name) in resolving]
+        return not outstanding or now >= job["expires"]
+
+    def result_for(job, histories):
+        stock_prices, time_labels = histories.get(job["ticker"], (None, None))
+        price_source = market_data_provider.name
+        if not stock_prices or not time_labels:
+            stock_prices, time_labels = degraded_price_series(job["ticker"])
+            price_source = fallback_source()
+        top_competitors = []
+        for name, ticker, market_cap in job["top"]:
+            comp_prices, comp_labels = histories.get(ticker, (None, None))
+            if comp_prices and comp_labels:
+                top_competitors.append({"name": name, "ticker": ticker, "market_cap": market_cap,
+                                        "stock_prices": comp_prices, "time_labels": comp_labels,
+                                        "stock_price": comp_prices[-1]})
+        return dict(success=True, description=job["description"], ticker=job["ticker"],
+                    stock_prices=stock_prices, time_labels=time_labels, price_source=price_source,
+                    degraded=is_degraded(price_source, top_competitors), competitors=job["sectors"],
+                    top_competitors=top_competitors)
+
+    while pending or waiting or to_describe or download is not None:
+        now = time.monotonic()
+        resolving = {key for stage, key in pending.values() if stage in ("comp_ticker", "cap")}
+        for key, job in jobs.items():
+            if ready(job, now, resolving):
+                seen = set()
+                top = []
+                for name in job["relevant"]:
+                    ticker = comp_tickers.get(name)
+                    if ticker and caps.get(ticker) and ticker not in seen:
+                        seen.add(ticker)
+                        top.append((name, ticker, caps[ticker]))
+                job["top"] = sorted(top, key=lambda comp: comp[2], reverse=True)[:3]
+                waiting.append(key)
+
+        while to_describe and describing < max(1, BATCH_WORKERS // 2):
+            key = to_describe.pop(0)
+            describing += 1
+            pending[submit(describe_and_classify, jobs[key]["name"], jobs[key]["ticker"])] = ("sectors", key)
+
+        if download is None and waiting:
+            wave = waiting
+            waiting = []
+            tickers = list(dict.fromkeys(
+                [jobs[key]["ticker"] for key in wave] + [comp[1] for key in wave for comp in jobs[key]["top"]]))
+            print(f"Batch wave: {len(wave)} companies, {len(tickers)} tickers in one download")
+            download = submit(fetch_competitor_histories, tickers)
+            pending[download] = ("download", wave)
+
+        if not pending:
+            continue
+        deadlines = [job["expires"] for job in jobs.values() if "expires" in job and "top" not in job]
+        timeout = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+        done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            stage, key = pending.pop(future)
+            try:
+                value = future.result()
+            except Exception as e:
+                print(f"Batch {stage} failed for {key}: {e}")
+                value = None
+            if stage == "ticker":
+                job = jobs[key]
+                if not value:
+                    yield dict(success=False, error=f"Could not find a stock ticker for {job['name']}.",
+                               company_name=job["name"])
+                    continue
+                job["ticker"] = value
+                to_describe.append(key)
+            elif stage == "sectors":
+                describing -= 1
+                jobs[key]["description"], sectors = value or ("", None)
+                sectors_in(key, sectors)
+            elif stage == "comp_ticker":
+                comp_tickers[key] = value
+                if value and value not in caps:
+                    caps[value] = None
+                    pending[submit(fetch_market_cap, value)] = ("cap", value)
+            elif stage == "cap":
+                caps[key] = value
+            elif stage == "download":
+                download = None
+                for job_key in key:
+                    job = jobs[job_key]
+                    result = result_for(job, value or {})
+                    response_cache.put(job["name"], jsonify(result).get_data(), degraded=result["degraded"])
+                    if not job.get("from_graph"):
+                        graph_refresher.save_async(job["name"], analysis_profile(
+                            job["ticker"], job["description"], job["sectors"],
+                            [{"name": name, "ticker": ticker, "market_cap": market_cap}
+                             for name, ticker, market_cap in job["top"]]))
+                    yield dict(result, company_name=job["name"])
+
+# API route for analyzing a watchlist in one request
+@app.route("/analyze_companies", methods=["POST"])
+def analyze_companies():
+    """Batch version of /analyze_company.
+
+    Takes ``{"companies": [...]}`` and streams newline-delimited JSON: one
+    line per unique company as soon as it is ready, then a summary line.
+    """
+    companies = (request.get_json(silent=True) or {}).get("companies")
+    if not isinstance(companies, list) or not companies:
+        return jsonify(success=False, error="Provide a non-empty 'companies' list.")
+    companies = [str(name).strip() for name in companies if str(name).strip()]
+    if len(companies) > BATCH_MAX_COMPANIES:
+        return jsonify(success=False, error=f"At most {BATCH_MAX_COMPANIES} companies per batch.")
+
+    def generate():
+        started = time.perf_counter()
+        count = 0
+        try:
+            for result in analyze_batch(companies):
+                count += 1
+                yield json.dumps(result) + "\n"
+        except Exception as e:
+            print(f"Error in analyze_companies: {e}")
+            traceback.print_exc()
+            yield json.dumps({"success": False, "error": f"An error occurred during batch analysis: {str(e)}"}) + "\n"
+        elapsed = round((time.perf_counter() - started) * 1000, 1)
+        print(f"Batch of {len(companies)} names ({count} companies) finished in {elapsed}ms")
+        yield json.dumps({"summary": {"requested": len(companies), "analyzed": count, "total_ms": elapsed}}) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
 
 if __name__ == "__main__": 
     # Get port and host from environment variables
     port = int(os.getenv("PORT", 12001))
     host = os.getenv("HOST", "0.0.0.0")
     print(f"Starting server on {host}:{port}")
-    app.run(host=host, port=port, debug=True)
+    # Development server only; use a WSGI server with wsgi.py in production
+    create_app().run(host=host, port=port, debug=os.getenv("FLASK_DEBUG", "0") == "1")
@@ -1,2 +1,6 @@
 from .alert_manager import check_price_alert, check_rsi_alert
-from .scheduler import start_scheduler, alerts
+from .engine import evaluate_alerts
+from .indicators import IndicatorBook, RSIState, SMAState, EMAState, MACDState
+from .models import Alert, AlertTrigger
+from .leader import LeaderLease, SchedulerLease, run_as_leader
+from .scheduler import start_scheduler
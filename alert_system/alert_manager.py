@@ -1,8 +1,7 @@
-import yfinance as yf
-import ta 
+from market_data import get_price_history
 
 def check_price_alert(ticker, target_price, direction="above"):
-    data = yf.Ticker(ticker).history(period="1d")
+    data = get_price_history(ticker, period="1d")
     current_price = data["Close"].iloc[-1]
     if direction == "above" and current_price >= target_price:
         return True
@@ -11,7 +10,9 @@ def check_price_alert(ticker, target_price, direction="above"):
     return False
 
 def check_rsi_alert(ticker, threshold=30, direction="below"):
-    df = yf.download(ticker, period="21d")
+    import ta
+
+    df = get_price_history(ticker, period="1mo")
     rsi = ta.momentum.RSIIndicator(df["Close"]).rsi().iloc[-1]
     if direction == "below":
         return rsi < threshold
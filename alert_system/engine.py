@@ -0,0 +1,123 @@
+import numpy as np
+
+from market_data import market_data_provider, price_cache
+from .indicators import IndicatorBook, RSIState
+
+RSI_WINDOW = 14
+# Daily history used to seed a ticker's indicators; ~21 trading days covers the RSI warm-up
+ALERT_HISTORY_PERIOD = "1mo"
+# Once seeded, only the most recent bars are fetched and fed into the streaming state
+ALERT_TAIL_PERIOD = "5d"
+
+indicator_book = IndicatorBook({"rsi": lambda: RSIState(RSI_WINDOW)})
+
+
+def load_closes(tickers, period=ALERT_HISTORY_PERIOD):
+    """Daily closes for ``tickers`` as one DataFrame (dates x tickers).
+
+    Tickers already in the shared price cache are reused; all others are
+    fetched with a single ``market_data_provider.download`` call.
+    """
+    import pandas as pd
+
+    frames = {}
+    missing = []
+    for ticker in tickers:
+        cached = price_cache.get((ticker.upper(), period, "1d"))
+        if cached is None:
+            missing.append(ticker)
+        else:
+            frames[ticker] = cached
+
+    if missing:
+        print(f"Downloading {period} history for {len(missing)} alert ticker(s)")
+        for ticker, frame in market_data_provider.download(missing, period=period).items():
+            price_cache.put((ticker.upper(), period, "1d"), frame)
+            frames[ticker] = frame
+
+    closes = {}
+    for ticker, frame in frames.items():
+        if "Close" not in frame:
+            continue
+        series = frame["Close"]
+        if getattr(series.index, "tz", None) is not None:
+            series = series.tz_localize(None)  # store and download frames must share one index type
+        closes[ticker] = series
+    if not closes:
+        return pd.DataFrame(columns=list(tickers), dtype="f8")
+    return pd.DataFrame(closes).sort_index().reindex(columns=list(tickers))
+
+
+def latest_values(tickers):
+    """Latest close and RSI for each ticker, as two arrays aligned with ``tickers``.
+
+    Seeded tickers only download ALERT_TAIL_PERIOD and push the new bars into
+    their streaming indicators; new tickers (or ones with a gap since the last
+    tick) are seeded from ALERT_HISTORY_PERIOD of history.
+    """
+    indicator_book.retain(tickers)
+    last_close = {}
+
+    seeded = [ticker for ticker in tickers if ticker in indicator_book]
+    reseed = []
+    if seeded:
+        tail = load_closes(seeded, period=ALERT_TAIL_PERIOD)
+        for ticker in seeded:
+            closes = tail[ticker].dropna()
+            if not indicator_book.extend(ticker, closes):
+                reseed.append(ticker)
+            elif not closes.empty:
+                last_close[ticker] = closes.iloc[-1]
+
+    fresh = [ticker for ticker in tickers if ticker not in indicator_book] + reseed
+    if fresh:
+        history = load_closes(fresh)
+        for ticker in fresh:
+            closes = history[ticker].dropna()
+            if not closes.empty:
+                indicator_book.seed(ticker, closes)
+                last_close[ticker] = closes.iloc[-1]
+
+    prices = np.array([last_close.get(ticker, np.nan) for ticker in tickers], dtype="f8")
+    rsi = np.array([indicator_book.value(ticker, "rsi") for ticker in tickers], dtype="f8")
+    return prices, rsi
+
+
+def evaluate_alerts(alerts, with_values=False):
+    """Return a boolean array, aligned with ``alerts``, of the alerts that are triggered.
+
+    With ``with_values=True`` the per-alert price and RSI arrays are returned too.
+
+    Each ticker's price and RSI are looked up once, no matter how many alerts
+    reference it; the thresholds are then checked as array
+    comparisons with the same semantics as check_price_alert/check_rsi_alert.
+    """
+    if not alerts:
+        empty = np.zeros(0, dtype=bool)
+        return (empty, np.zeros(0), np.zeros(0)) if with_values else empty
+
+    alert_tickers = np.array([str(alert.get("ticker") or "").upper() for alert in alerts])
+    kinds = np.array([alert.get("type") for alert in alerts], dtype=object)
+    directions = np.array([alert.get("direction") for alert in alerts], dtype=object)
+    targets = np.array([alert.get("target", 0) for alert in alerts], dtype="f8")
+    thresholds = np.array([alert.get("threshold", 30) for alert in alerts], dtype="f8")
+
+    import pandas as pd
+
+    tickers = sorted(set(alert_tickers) - {""})
+    latest_price, latest_rsi = latest_values(tickers)
+
+    # Unknown tickers get position -1, which picks the trailing NaN; NaN never compares true
+    position = pd.Index(tickers).get_indexer(alert_tickers)
+    price = np.append(latest_price, np.nan)[position]
+    rsi = np.append(latest_rsi, np.nan)[position]
+
+    is_price = kinds == "price"
+    is_rsi = kinds == "rsi"
+    below = directions == "below"
+    above = directions == "above"
+    with np.errstate(invalid="ignore"):
+        price_hit = (above & (price >= targets)) | (below & (price <= targets))
+        rsi_hit = np.where(below, rsi < thresholds, rsi > thresholds)
+    triggered = (is_price & price_hit) | (is_rsi & rsi_hit)
+    return (triggered, price, rsi) if with_values else triggered
@@ -0,0 +1,219 @@
+"""Streaming technical indicators with O(1) updates per bar.
+
+Every indicator accepts bars one at a time through ``update(close, timestamp)``.
+Passing the timestamp of the most recent bar again revises that bar instead
+of appending a new one, so a still-forming daily bar can be re-evaluated on
+every scheduler tick without recomputing any history.
+"""
+import threading
+from collections import deque
+
+
+class StreamingIndicator:
+    """Base class: subclasses implement ``_apply`` (new bar), ``_revise`` (replace last bar) and ``value``."""
+
+    def __init__(self):
+        self.last_timestamp = None
+
+    def update(self, close, timestamp=None):
+        """Feed one bar and return the indicator value (None while warming up)."""
+        close = float(close)
+        if timestamp is not None and timestamp == self.last_timestamp:
+            self._revise(close)
+        else:
+            self.last_timestamp = timestamp
+            self._apply(close)
+        return self.value
+
+    def seed(self, closes):
+        """Feed a pandas Series of closes (indexed by timestamp) in order."""
+        for timestamp, close in closes.items():
+            self.update(close, timestamp)
+        return self.value
+
+    def _apply(self, close):
+        raise NotImplementedError
+
+    def _revise(self, close):
+        raise NotImplementedError
+
+    @property
+    def value(self):
+        raise NotImplementedError
+
+
+class SMAState(StreamingIndicator):
+    def __init__(self, window):
+        super().__init__()
+        self.window = window
+        self.closes = deque(maxlen=window)
+        self.total = 0.0
+
+    def _apply(self, close):
+        if len(self.closes) == self.window:
+            self.total -= self.closes[0]
+        self.closes.append(close)
+        self.total += close
+
+    def _revise(self, close):
+        self.total += close - self.closes[-1]
+        self.closes[-1] = close
+
+    @property
+    def value(self):
+        return self.total / self.window if len(self.closes) == self.window else None
+
+
+class EMAState(StreamingIndicator):
+    """Exponential moving average seeded with the first close (pandas ``ewm(adjust=False)``)."""
+
+    def __init__(self, span=None, alpha=None, min_periods=None):
+        super().__init__()
+        self.alpha = alpha if alpha is not None else 2 / (span + 1)
+        self.min_periods = min_periods if min_periods is not None else (span or 1)
+        self.average = None
+        self.prev_average = None
+        self.count = 0
+
+    def _step(self, base, close):
+        return close if base is None else base + self.alpha * (close - base)
+
+    def _apply(self, close):
+        self.prev_average = self.average
+        self.average = self._step(self.average, close)
+        self.count += 1
+
+    def _revise(self, close):
+        self.average = self._step(self.prev_average, close)
+
+    @property
+    def value(self):
+        return self.average if self.count >= self.min_periods else None
+
+
+class RSIState(StreamingIndicator):
+    """Wilder RSI keeping only the smoothed average gain/loss and the last two closes.
+
+    Gains and losses are smoothed with an EMA of alpha ``1 / window`` (the
+    formula ``ta.momentum.RSIIndicator`` uses); a value is reported from the
+    ``window``-th bar on.
+    """
+
+    def __init__(self, window=14):
+        super().__init__()
+        self.window = window
+        self.prev_close = None
+        self.close = None
+        self.avg_gain = EMAState(alpha=1 / window, min_periods=window)
+        self.avg_loss = EMAState(alpha=1 / window, min_periods=window)
+
+    def _change(self, close):
+        return 0.0 if self.prev_close is None else close - self.prev_close
+
+    def _apply(self, close):
+        self.prev_close, self.close = self.close, close
+        change = self._change(close)
+        self.avg_gain._apply(max(change, 0.0))
+        self.avg_loss._apply(max(-change, 0.0))
+
+    def _revise(self, close):
+        self.close = close
+        change = self._change(close)
+        self.avg_gain._revise(max(change, 0.0))
+        self.avg_loss._revise(max(-change, 0.0))
+
+    @property
+    def value(self):
+        gain, loss = self.avg_gain.value, self.avg_loss.value
+        if gain is None:
+            return None
+        if loss == 0:
+            return 100.0
+        return 100 - 100 / (1 + gain / loss)
+
+
+class MACDState(StreamingIndicator):
+    """MACD line, signal line and histogram from three EMAs."""
+
+    def __init__(self, fast=12, slow=26, signal=9):
+        super().__init__()
+        self.fast = EMAState(span=fast)
+        self.slow = EMAState(span=slow)
+        self.signal = EMAState(span=signal)
+
+    def _apply(self, close):
+        self.fast._apply(close)
+        self.slow._apply(close)
+        if self.slow.value is not None:
+            self.signal._apply(self.fast.average - self.slow.average)
+
+    def _revise(self, close):
+        self.fast._revise(close)
+        self.slow._revise(close)
+        if self.slow.value is not None:
+            self.signal._revise(self.fast.average - self.slow.average)
+
+    @property
+    def value(self):
+        if self.slow.value is None:
+            return None
+        macd = self.fast.average - self.slow.average
+        signal = self.signal.value
+        return {
+            "macd": macd,
+            "signal": signal,
+            "histogram": None if signal is None else macd - signal,
+        }
+
+
+class IndicatorBook:
+    """Per-ticker indicator state shared by scheduler ticks.
+
+    ``factories`` maps an indicator name to a zero-argument constructor, e.g.
+    ``{"rsi": lambda: RSIState(14), "sma20": lambda: SMAState(20)}``.
+    """
+
+    def __init__(self, factories):
+        self.factories = factories
+        self._books = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, ticker):
+        return ticker in self._books
+
+    def seed(self, ticker, closes):
+        indicators = {name: factory() for name, factory in self.factories.items()}
+        for indicator in indicators.values():
+            indicator.seed(closes)
+        with self._lock:
+            self._books[ticker] = indicators
+
+    def extend(self, ticker, closes):
+        """Apply new bars for an already-seeded ticker.
+
+        Returns False when ``closes`` does not overlap the last bar seen (a
+        gap, e.g. after downtime); the caller should re-seed from history.
+        """
+        with self._lock:
+            indicators = self._books.get(ticker)
+        if indicators is None or closes.empty:
+            return indicators is not None
+        last_timestamp = next(iter(indicators.values())).last_timestamp
+        if last_timestamp is not None and closes.index[0] > last_timestamp:
+            return False
+        new_bars = closes[closes.index >= last_timestamp] if last_timestamp is not None else closes
+        for indicator in indicators.values():
+            indicator.seed(new_bars)
+        return True
+
+    def value(self, ticker, name):
+        with self._lock:
+            indicators = self._books.get(ticker)
+        return indicators[name].value if indicators else None
+
+    def retain(self, tickers):
+        """Drop state for tickers no longer referenced by any alert."""
+        keep = set(tickers)
+        with self._lock:
+            for ticker in [t for t in self._books if t not in keep]:
+                del self._books[ticker]
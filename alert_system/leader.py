@@ -0,0 +1,88 @@
+import datetime
+import os
+import socket
+import uuid
+
+from sqlalchemy import or_, update
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+
+# A holder that stops renewing (crash, deploy) loses the lease after this many seconds
+SCHEDULER_LEASE_TTL = float(os.getenv("SCHEDULER_LEASE_TTL", 300))
+
+
+def _utcnow():
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+class SchedulerLease(db.Model):
+    __tablename__ = "scheduler_leases"
+
+    name = db.Column(db.String(64), primary_key=True)
+    holder = db.Column(db.String(128), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+
+class LeaderLease:
+    """Database lease that lets one process out of many (gunicorn workers, hosts) run scheduled jobs.
+
+    ``acquire`` takes the lease if it is free or expired and renews it if this
+    process already holds it, in a single conditional UPDATE (or INSERT for the
+    first holder), so two processes can never both succeed.
+    """
+
+    def __init__(self, app, name="scheduler", ttl=SCHEDULER_LEASE_TTL):
+        self.app = app
+        self.name = name
+        self.ttl = ttl
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+
+    def acquire(self):
+        """True if this process holds the lease (now renewed for another ``ttl`` seconds)."""
+        now = _utcnow()
+        expires_at = now + datetime.timedelta(seconds=self.ttl)
+        with self.app.app_context():
+            try:
+                result = db.session.execute(
+                    update(SchedulerLease)
+                    .where(SchedulerLease.name == self.name,
+                           or_(SchedulerLease.holder == self.holder, SchedulerLease.expires_at < now))
+                    .values(holder=self.holder, expires_at=expires_at)
+                )
+                if result.rowcount == 0:
+                    db.session.add(SchedulerLease(name=self.name, holder=self.holder, expires_at=expires_at))
+                db.session.commit()
+                leader = True
+            except IntegrityError:
+                # Someone else holds an unexpired lease
+                db.session.rollback()
+                leader = False
+            except Exception as e:
+                db.session.rollback()
+                print(f"Error renewing scheduler lease: {e}")
+                leader = False
+        if leader != self.is_leader:
+            print(f"Scheduler lease {self.name!r} {'acquired' if leader else 'lost'} by {self.holder}")
+        self.is_leader = leader
+        return leader
+
+    def release(self):
+        """Give the lease up (e.g. on shutdown) so another process takes over without waiting for expiry."""
+        if not self.is_leader:
+            return
+        with self.app.app_context():
+            try:
+                SchedulerLease.query.filter_by(name=self.name, holder=self.holder).delete()
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                print(f"Error releasing scheduler lease: {e}")
+        self.is_leader = False
+
+
+def run_as_leader(lease, func, *args):
+    """Scheduler job wrapper: run ``func(*args)`` only in the process holding ``lease``."""
+    if lease.acquire():
+        return func(*args)
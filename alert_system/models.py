@@ -0,0 +1,47 @@
+import datetime
+
+from extensions import db
+
+
+def _utcnow():
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+class Alert(db.Model):
+    __tablename__ = "alerts"
+
+    id = db.Column(db.Integer, primary_key=True)
+    type = db.Column(db.String(10), nullable=False, index=True)  # "price" or "rsi"
+    ticker = db.Column(db.String(16), nullable=False, index=True)
+    target = db.Column(db.Float, nullable=False, default=0)
+    threshold = db.Column(db.Float, nullable=False, default=30)
+    direction = db.Column(db.String(10))
+    email = db.Column(db.String(120))
+    active = db.Column(db.Boolean, nullable=False, default=True, index=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=_utcnow)
+
+    # The scheduler's only query: active alerts, grouped by ticker
+    __table_args__ = (db.Index("ix_alerts_active_ticker_type", "active", "ticker", "type"),)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "type": self.type,
+            "ticker": self.ticker,
+            "target": self.target,
+            "threshold": self.threshold,
+            "direction": self.direction,
+            "email": self.email,
+            "active": self.active,
+        }
+
+
+class AlertTrigger(db.Model):
+    __tablename__ = "alert_triggers"
+
+    id = db.Column(db.Integer, primary_key=True)
+    alert_id = db.Column(db.Integer, db.ForeignKey("alerts.id"), nullable=False, index=True)
+    ticker = db.Column(db.String(16), nullable=False, index=True)
+    price = db.Column(db.Float)
+    rsi = db.Column(db.Float)
+    triggered_at = db.Column(db.DateTime, nullable=False, default=_utcnow, index=True)
@@ -1,22 +1,81 @@
+import datetime
+
 from apscheduler.schedulers.background import BackgroundScheduler
-from .alert_manager import check_price_alert, check_rsi_alert
+from sqlalchemy import insert, update
+
+import notifier
+from extensions import db
+from metrics import registry
+from rate_limit import BACKGROUND, upstream_priority
+from .engine import evaluate_alerts
+from .leader import LeaderLease, run_as_leader
+from .models import Alert, AlertTrigger
+
+def load_active_alerts():
+    """Active alerts as plain dicts, ordered so each ticker's alerts are adjacent."""
+    rows = Alert.query.filter_by(active=True).order_by(Alert.ticker, Alert.type).all()
+    return [row.to_dict() for row in rows]
+
+def record_triggers(triggered):
+    """Write trigger history and deactivate the fired alerts with one bulk statement each."""
+    if not triggered:
+        return
+    now = datetime.datetime.now(datetime.timezone.utc)
+    db.session.execute(insert(AlertTrigger), [
+        {"alert_id": alert["id"], "ticker": alert["ticker"], "price": alert["price"],
+         "rsi": alert["rsi"], "triggered_at": now}
+        for alert in triggered
+    ])
+    db.session.execute(
+        update(Alert).where(Alert.id.in_([alert["id"] for alert in triggered])).values(active=False)
+    )
+    db.session.commit()
+
+check_duration = registry.histogram("stockmind_alert_check_duration_seconds",
+                                    "Duration of each alert-scheduler tick.")
+alerts_triggered = registry.counter("stockmind_alerts_triggered_total", "Alerts that fired.")
+
+def check_alerts(app):
+    with app.app_context(), upstream_priority(BACKGROUND), check_duration.time():
+        pending = load_active_alerts()
+        try:
+            hits, prices, rsis = evaluate_alerts(pending, with_values=True)
+        except Exception as e:
+            print(f"Error evaluating alerts: {e}")
+            return
 
-alerts = []  # This should be replaced with DB storage in production
+        triggered = []
+        for alert, hit, price, rsi in zip(pending, hits, prices, rsis):
+            if hit:
+                alert = dict(alert, price=_or_none(price), rsi=_or_none(rsi))
+                print(f"[ALERT TRIGGERED] {alert}")
+                triggered.append(alert)
+                alerts_triggered.inc()
+        try:
+            record_triggers(triggered)
+        except Exception as e:
+            db.session.rollback()
+            # The alerts stay active, so they fire (and notify) again on the next tick
+            print(f"Error recording triggered alerts: {e}")
+            return
+        # Only once the alerts are deactivated, so a failed commit can't send the same email every tick
+        for alert in triggered:
+            try:
+                notifier.send_alert_notification(alert)
+            except Exception as e:
+                print(f"Error queueing notification for alert {alert['id']}: {e}")
 
-def check_alerts():
-    for alert in alerts:
-        if alert['type'] == 'price':
-            triggered = check_price_alert(alert['ticker'], alert['target'], alert['direction'])
-        elif alert['type'] == 'rsi':
-            triggered = check_rsi_alert(alert['ticker'], alert['threshold'], alert['direction'])
-        else:
-            triggered = False
+def _or_none(value):
+    return None if value != value else float(value)  # NaN -> None
 
-        if triggered:
-            print(f"[ALERT TRIGGERED] {alert}")
-            # TODO: Send notification (email, SMS, etc.)
+def start_scheduler(app, lease=None):
+    """Start the background scheduler with the alert check job; returned so callers can add jobs.
 
-def start_scheduler():
+    Jobs only run in the process holding ``lease`` (see leader.py), so every
+    web worker may start a scheduler and alerts are still checked once.
+    """
+    lease = lease or LeaderLease(app)
     scheduler = BackgroundScheduler()
-    scheduler.add_job(check_alerts, 'interval', minutes=2)
+    scheduler.add_job(run_as_leader, 'interval', minutes=2, args=[lease, check_alerts, app])
     scheduler.start()
+    return scheduler
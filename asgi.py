@@ -0,0 +1,318 @@
+# ASGI entry point with an async /analyze_company, e.g.: uvicorn asgi:app --host 0.0.0.0 --port 12001
+# Alpha Vantage and Wikipedia are called through one pooled keep-alive httpx client, so an analysis waiting
+# on them holds no thread. Libraries without an async API (yfinance, Gemini, the database) run on a bounded
+# pool. Every other route (/login, /alerts, the stream and batch endpoints, ...) is the Flask app, mounted below.
+import asyncio
+import contextvars
+import os
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.middleware.wsgi import WSGIMiddleware
+from fastapi.responses import JSONResponse, Response
+from werkzeug.http import parse_accept_header, parse_etags, quote_etag
+
+from BACK import (ALPHA_VANTAGE_API_KEY, ALPHA_VANTAGE_TIMEOUT, ALPHA_VANTAGE_URL,
+                  WIKIPEDIA_LOOKUP_DEADLINE, WIKIPEDIA_TIMEOUT, alpha_vantage_breaker, alpha_vantage_limiter,
+                  analysis_body, analysis_profile, analysis_variant, begin_wikipedia_lookup, competitor_deadlines,
+                  competitor_names, create_app, fetch_competitor_histories, fetch_market_cap, fetch_stock_price,
+                  finish_wikipedia_lookup, finished_competitor_entries, generate_company_description,
+                  graph_refresher, http_latency, http_requests, is_company_summary, is_degraded,
+                  prefer_company_titles, query_gemini_llm, rank_competitors, resolved_competitor_tickers,
+                  stage_latency, stored_top_competitors, ticker_from_symbol_search, wikipedia_breaker,
+                  wikipedia_search_terms, wikipedia_summary_or_generic)
+from market_data import symbol_index
+from rate_limit import upstream_deadline
+from response_cache import response_cache
+from wire_format import COMPRESS_MIN_BYTES, compress, pick_encoding
+
+WIKIPEDIA_API_URL = os.getenv("WIKIPEDIA_API_URL", "https://en.wikipedia.org/w/api.php")
+# Keep-alive pool shared by all in-flight analyses
+HTTP_MAX_CONNECTIONS = int(os.getenv("ASYNC_HTTP_MAX_CONNECTIONS", 100))
+HTTP_MAX_KEEPALIVE = int(os.getenv("ASYNC_HTTP_MAX_KEEPALIVE", 20))
+# Threads for the blocking stages (yfinance, Gemini, database reads)
+BLOCKING_WORKERS = int(os.getenv("ASYNC_BLOCKING_WORKERS", 64))
+USER_AGENT = "StockMind (https://github.com/sharathchandra-patil/StockMind)"
+
+flask_app = create_app()
+blocking_executor = ThreadPoolExecutor(max_workers=BLOCKING_WORKERS, thread_name_prefix="asgi-blocking")
+_client = None
+
+
+def http_client():
+    """The process-wide httpx client, created on first use inside the event loop."""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_KEEPALIVE),
+            # Backstop only; the circuit breakers apply their own, tighter adaptive timeouts
+            timeout=max(ALPHA_VANTAGE_TIMEOUT, 2 * WIKIPEDIA_TIMEOUT),
+            headers={"User-Agent": USER_AGENT},
+        )
+    return _client
+
+
+async def run_blocking(func, *args):
+    """Run a blocking call on the blocking pool, keeping the caller's contextvars (upstream priority)."""
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(blocking_executor, context.run, func, *args)
+
+
+def in_app_context(func, *args):
+    with flask_app.app_context():
+        return func(*args)
+
+
+async def get_json(url, params):
+    response = await http_client().get(url, params=params)
+    # 5xx count against the breaker; the sync client only sees them as unparseable bodies
+    response.raise_for_status()
+    return response.json()
+
+
+async def get_ticker(company_name):
+    """Async ``get_ticker_from_alpha_vantage``: symbol index first, then SYMBOL_SEARCH; None when unresolved."""
+    try:
+        ticker = symbol_index.resolve(company_name)
+        if ticker:
+            print(f"Using indexed ticker {ticker} for {company_name}")
+            return ticker
+        # Waiting for a token can take seconds, so it waits on the pool rather than the loop
+        alpha_vantage_breaker.check()
+        if not await run_blocking(alpha_vantage_limiter.acquire):
+            print(f"Alpha Vantage rate limit reached, no ticker for {company_name}")
+            return None
+        print(f"Fetching ticker for {company_name} from Alpha Vantage")
+        params = {"function": "SYMBOL_SEARCH", "keywords": company_name, "apikey": ALPHA_VANTAGE_API_KEY}
+        data = await alpha_vantage_breaker.call_async(get_json, ALPHA_VANTAGE_URL, params)
+        return ticker_from_symbol_search(company_name, data)
+    except Exception as e:
+        print(f"Error in async Alpha Vantage lookup for {company_name}: {e}")
+        return None
+
+
+async def wikipedia_summary(title):
+    """(title, two-sentence intro) for a Wikipedia page, following redirects; None if missing or a disambiguation page."""
+    data = await wikipedia_breaker.call_async(get_json, WIKIPEDIA_API_URL, {
+        "action": "query", "format": "json", "redirects": 1, "titles": title,
+        "prop": "extracts|pageprops", "ppprop": "disambiguation", "exintro": 1, "explaintext": 1, "exsentences": 2,
+    })
+    for page in data.get("query", {}).get("pages", {}).values():
+        if "missing" in page or "invalid" in page or "disambiguation" in page.get("pageprops", {}):
+            return None
+        if page.get("extract"):
+            return page["title"], page["extract"]
+    return None
+
+
+async def wikipedia_search(query, limit=10):
+    data = await wikipedia_breaker.call_async(get_json, WIKIPEDIA_API_URL, {
+        "action": "query", "format": "json", "list": "search", "srsearch": query, "srlimit": limit, "srprop": "",
+    })
+    return [result["title"] for result in data.get("query", {}).get("search", [])]
+
+
+async def lookup_wikipedia_page(company_name):
+    """Async ``BACK.lookup_wikipedia_page``: same search terms and fallbacks, with all terms looked up at once.
+
+    Disambiguation pages count as misses here instead of being resolved to
+    their first option; the general search that follows covers those names.
+    """
+    clean_name, terms = wikipedia_search_terms(company_name)
+    print(f"Trying search terms: {terms}")
+    tasks = [asyncio.ensure_future(wikipedia_summary(term)) for term in terms]
+    done, pending = await asyncio.wait(tasks, timeout=WIKIPEDIA_LOOKUP_DEADLINE)
+    for task in pending:
+        task.cancel()
+    if pending:
+        print(f"Wikipedia lookups for {company_name} hit the {WIKIPEDIA_LOOKUP_DEADLINE}s deadline")
+    found = []
+    for task in tasks:  # priority order
+        if task in done and task.exception() is None and task.result():
+            found.append(task.result())
+    for result in found:
+        if is_company_summary(company_name, result[1]):
+            return result
+    if found:
+        return found[0]
+
+    # If none of the specific terms worked, perform a general search
+    for title in prefer_company_titles(await wikipedia_search(clean_name + " company"))[:2]:
+        result = await wikipedia_summary(title)
+        if result:
+            return result
+
+    # Last resort - use stock ticker to search
+    ticker = await get_ticker(company_name)
+    if ticker:
+        titles = await wikipedia_search(f"{clean_name} {ticker}")
+        if titles:
+            return await wikipedia_summary(titles[0])
+    return None
+
+
+async def fetch_wikipedia_summary(company_name):
+    """Async ``BACK.fetch_wikipedia_summary``, sharing its cache and circuit rules."""
+    try:
+        result, pending = begin_wikipedia_lookup(company_name)
+        if pending is not None:
+            result = finish_wikipedia_lookup(pending, await lookup_wikipedia_page(company_name))
+        return wikipedia_summary_or_generic(company_name, result)
+    except Exception as e:
+        print(f"Error fetching Wikipedia summary: {e}")
+        return wikipedia_summary_or_generic(company_name, None, failed=True)
+
+
+async def get_company_description(company_name, ticker):
+    _, summary = await fetch_wikipedia_summary(company_name)
+    if not is_company_summary(company_name, summary):
+        print(f"Wikipedia summary for {company_name} doesn't look like a company description")
+        return generate_company_description(company_name, ticker)
+    return summary
+
+
+async def enrich_competitors(competitors, deadline=None):
+    """Async ``BACK.enrich_competitors``: concurrent ticker and market cap lookups under one deadline."""
+    deadline, ticker_budget, expires = competitor_deadlines(deadline)
+
+    # Tasks copy the context, so rate-limit waits inside them end with the deadline
+    with upstream_deadline(ticker_budget):
+        ticker_tasks = {asyncio.ensure_future(get_ticker(name)): name for name in competitors}
+    done, _ = await asyncio.wait(ticker_tasks, timeout=ticker_budget)
+    names_by_ticker = resolved_competitor_tickers(ticker_tasks, done, ticker_budget)
+    if not names_by_ticker:
+        return []
+
+    remaining = max(0.0, expires - time.monotonic())
+    with upstream_deadline(remaining):
+        cap_tasks = {asyncio.ensure_future(run_blocking(fetch_market_cap, ticker)): ticker
+                     for ticker in names_by_ticker}
+        histories_task = asyncio.ensure_future(run_blocking(fetch_competitor_histories, list(names_by_ticker)))
+    done, _ = await asyncio.wait(list(cap_tasks) + [histories_task], timeout=remaining)
+    return finished_competitor_entries(names_by_ticker, cap_tasks, histories_task, done, deadline)
+
+
+async def get_top_competitors(competitors):
+    enriched = await enrich_competitors(competitor_names(competitors))
+    return await run_blocking(rank_competitors, enriched)
+
+
+async def timed_stage(timings, stage, awaitable):
+    started = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        elapsed = time.perf_counter() - started
+        timings[stage] = round(elapsed * 1000, 1)
+        stage_latency.observe(elapsed, stage=stage)
+
+
+def cached_json_response(request, entry, cache_status):
+    """``BACK.cached_json_response`` for Starlette requests: same ETags, codings and cache headers."""
+    accept_encodings = parse_accept_header(request.headers.get("accept-encoding"))
+    encoding = pick_encoding(accept_encodings) if len(entry.body) >= COMPRESS_MIN_BYTES else None
+    etag = f"{entry.etag}-{encoding}" if encoding else entry.etag
+    headers = {"ETag": quote_etag(etag), "Vary": "Accept-Encoding", "X-Cache": cache_status,
+               "Cache-Control": f"public, max-age={entry.max_age()}"}
+    if etag in parse_etags(request.headers.get("if-none-match")):
+        response_cache.record(entry, True, 0)
+        return Response(status_code=304, headers=headers)
+    body = entry.encoded(encoding, compress) if encoding else entry.body
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    response_cache.record(entry, False, len(body))
+    return Response(body, media_type="application/json", headers=headers)
+
+
+async def analyze(company_name, wire, price_encoding, variant):
+    cached = response_cache.get(company_name, variant)
+    if cached is not None:
+        print(f"Serving cached analysis for {company_name}")
+        return cached, "HIT"
+
+    timings = {}
+    started = time.perf_counter()
+    profile = await timed_stage(timings, "graph", run_blocking(in_app_context, graph_refresher.get, company_name))
+    if profile is not None:
+        ticker = profile["ticker"]
+        prices_task = asyncio.ensure_future(
+            timed_stage(timings, "stock_prices", run_blocking(fetch_stock_price, ticker)))
+        summary = profile["description"]
+        competitors = profile["sectors"]
+        relevant_competitors = competitors[0]["competitors"] if competitors else []
+        top_competitors = await timed_stage(timings, "top_competitors",
+                                            run_blocking(stored_top_competitors, profile))
+        if not top_competitors:
+            top_competitors = await timed_stage(timings, "top_competitors", get_top_competitors(relevant_competitors))
+    else:
+        ticker = await timed_stage(timings, "ticker", get_ticker(company_name))
+        if not ticker:
+            return None, f"Could not find a stock ticker for {company_name}."
+        prices_task = asyncio.ensure_future(
+            timed_stage(timings, "stock_prices", run_blocking(fetch_stock_price, ticker)))
+        summary = await timed_stage(timings, "description", get_company_description(company_name, ticker))
+        competitors = await timed_stage(timings, "sectors", run_blocking(query_gemini_llm, summary))
+        if not competitors:
+            competitors = [{"name": "No Sectors", "competitors": ["No competitors found."]}]
+        relevant_competitors = competitors[0].get("competitors") or []
+        top_competitors = await timed_stage(timings, "top_competitors", get_top_competitors(relevant_competitors))
+        graph_refresher.save_async(company_name, analysis_profile(ticker, summary, competitors, top_competitors))
+
+    stock_prices, time_labels, price_source = await prices_task
+    timings["total"] = round((time.perf_counter() - started) * 1000, 1)
+    print(f"Stage timings for {company_name} (ms): {timings}")
+    degraded = is_degraded(price_source, top_competitors)
+    payload = dict(success=True, description=summary, ticker=ticker, stock_prices=stock_prices,
+                   time_labels=time_labels, price_source=price_source, degraded=degraded, competitors=competitors,
+                   top_competitors=top_competitors, timings=timings)
+    with flask_app.app_context():
+        body = analysis_body(payload, wire, price_encoding)
+    return response_cache.put(company_name, body, variant, degraded=degraded), "MISS"
+
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    if _client is not None:
+        await _client.aclose()
+    blocking_executor.shutdown(wait=False)
+
+
+app = FastAPI(lifespan=lifespan, docs_url=None, redoc_url=None, openapi_url=None)
+
+
+@app.get("/analyze_company")
+async def analyze_company(request: Request):
+    started = time.perf_counter()
+    company_name = request.query_params.get("company_name")
+    wire = request.query_params.get("format", "json")
+    price_encoding = request.query_params.get("price_encoding", "delta")
+    variant = analysis_variant(wire, price_encoding)
+    try:
+        if not company_name:
+            response = JSONResponse({"success": False, "error": "No company name provided."})
+        elif variant is None:
+            response = JSONResponse({"success": False, "error": "Unsupported format or price_encoding."})
+        else:
+            print(f"Analyzing company: {company_name}")
+            entry, status = await analyze(company_name, wire, price_encoding, variant)
+            if entry is None:
+                response = JSONResponse({"success": False, "error": status})
+            else:
+                response = cached_json_response(request, entry, status)
+    except Exception as e:
+        print(f"Error in analyze_company: {e}")
+        traceback.print_exc()
+        response = JSONResponse({"success": False, "error": f"An error occurred while analyzing the company: {e}"})
+    # Same series as the Flask routes, which record their own
+    http_requests.inc(route="/analyze_company", method="GET", status=str(response.status_code))
+    http_latency.observe(time.perf_counter() - started, route="/analyze_company", method="GET")
+    return response
+
+
+# Everything else is served by the Flask app (sessions, templates, alerts, streaming and batch endpoints)
+app.mount("/", WSGIMiddleware(flask_app))
@@ -1,10 +1,7 @@
-import smtplib as smt
 import os
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
 import random
 from dotenv import load_dotenv
-import traceback
+import notifier
 
 # Load environment variables
 load_dotenv()
@@ -14,16 +11,14 @@ EMAIL_ADDRESS = os.getenv("EMAIL_ADDRESS")  # Your email address for sending OTP
 EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD")  # Your app password for Gmail
 
 def generateOTP(username, usermail):
-    if not EMAIL_ADDRESS or not EMAIL_PASSWORD:
+    # A password is only needed when the SMTP server requires a login (see notifier.SMTP_AUTH)
+    if not EMAIL_ADDRESS or (notifier.SMTP_AUTH and not EMAIL_PASSWORD):
         print("Email configuration missing. Check environment variables.")
         print(f"EMAIL_ADDRESS: {EMAIL_ADDRESS}")
         print(f"EMAIL_PASSWORD: {'**REDACTED**' if EMAIL_PASSWORD else 'Missing'}")
-        raise ValueError("Email configuration is missing. Please set EMAIL_ADDRESS and EMAIL_PASSWORD environment variables.")
+        raise ValueError("Email configuration is missing. Please set EMAIL_ADDRESS and EMAIL_PASSWORD "
+                         "environment variables (or SMTP_AUTH=0 for a server without login).")
         
-    smpt_server = 'smtp.gmail.com'
-    smtp_port = 587
-    
-    msg = MIMEMultipart()
     otp = random.randint(100000, 999999)
     btn = f"""
     <html>
@@ -85,33 +80,9 @@ def generateOTP(username, usermail):
     </html>
     """
 
-    msg['From'] = EMAIL_ADDRESS
-    msg['To'] = usermail
-    msg['Subject'] = "Your OTP for StockMind is here"
-    msg['Reply-To'] = EMAIL_ADDRESS
-    msg['X-Mailer'] = 'Python-Mail'
-    msg.attach(MIMEText(btn, 'html'))
-
-    # Debug email settings
-    print(f"SMTP Server: {smpt_server}")
-    print(f"SMTP Port: {smtp_port}")
-    print(f"From Email: {EMAIL_ADDRESS}")
-    print(f"To Email: {usermail}")
-
-    s = smt.SMTP(smpt_server, smtp_port)
-    try:
-        s.starttls()
-        print("SMTP TLS established")
-        s.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
-        print("SMTP Login successful")
-        s.sendmail(EMAIL_ADDRESS, usermail, msg.as_string())
-        print(f"Email sent successfully to {usermail}")
-    except Exception as e:
-        print(f"Error sending email: {e}")
-        traceback.print_exc()
-        raise
-    finally:    
-        s.quit()
+    # Queued for the background dispatcher so /api/auth doesn't wait on the mail server
+    notifier.send_email(usermail, "Your OTP for StockMind is here", btn)
+    print(f"OTP email queued for {usermail}")
     return otp
 
 def verifyOTP(otp, inp):
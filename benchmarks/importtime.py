@@ -0,0 +1,108 @@
+"""Cold-start profile of ``import BACK`` from ``python -X importtime``.
+
+Imports the app in a fresh interpreter (state in a throwaway directory,
+a dummy Gemini key so the LLM client path is exercised), keeps the fastest
+of ``--runs`` attempts and prints the total, the slowest top-level imports
+and any heavy dependency that was loaded eagerly, as JSON. Exits non-zero
+when a module listed in ``--lazy`` was imported or the total exceeds
+``--max-ms``, so it can gate CI:
+
+    python -m benchmarks.importtime --max-ms 1500
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.run import REPO_ROOT, git_revision
+
+# Only needed once a request reaches them; importing any of these at startup is a regression
+LAZY_MODULES = ("pandas", "yfinance", "google.genai", "wikipedia", "requests", "ta", "jwt")
+
+
+def parse_importtime(stderr):
+    """[(module, self_us, cumulative_us, depth)] in the order ``-X importtime`` reports them."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def profile_import(module, workdir):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [REPO_ROOT, os.getenv("PYTHONPATH")])),
+               GEMINI_API_KEY="benchmark", RUN_SCHEDULER="0",
+               CACHE_DB_PATH=os.path.join(workdir, "cache.sqlite3"),
+               RATE_LIMIT_DB_PATH=os.path.join(workdir, "rate_limits.sqlite3"),
+               OHLCV_STORE_DIR=os.path.join(workdir, "ohlcv"),
+               SYMBOL_INDEX_LEARNED=os.path.join(workdir, "symbols_learned.csv"),
+               DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'bench.db')}")
+    env.pop("LLM_CLIENT", None)
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=workdir, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        raise SystemExit(f"import {module} failed:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="BACK")
+    parser.add_argument("--runs", type=int, default=3, help="fresh interpreters to start; the fastest counts")
+    parser.add_argument("--top", type=int, default=15, help="slowest top-level imports to list")
+    parser.add_argument("--max-ms", type=float, help="fail when the import takes longer than this")
+    parser.add_argument("--lazy", default=",".join(LAZY_MODULES), help="modules that must not load at import time")
+    parser.add_argument("--output", help="also write the JSON results here")
+    args = parser.parse_args(argv)
+
+    # Warm the OS file cache so runs compare interpreter work, not disk reads
+    with tempfile.TemporaryDirectory(prefix="stockmind-import-") as workdir:
+        profile_import(args.module, workdir)
+        runs = []
+        for _ in range(max(1, args.runs)):
+            with tempfile.TemporaryDirectory(prefix="stockmind-import-") as run_dir:
+                runs.append(profile_import(args.module, run_dir))
+    totals = [next(cumulative for name, _, cumulative, _ in rows if name == args.module) for rows in runs]
+    rows = runs[totals.index(min(totals))]
+
+    loaded = {name for name, _, _, _ in rows}
+    lazy = [name.strip() for name in args.lazy.split(",") if name.strip()]
+    eager = [name for name in lazy if name in loaded]
+    # What the profiled module imports directly
+    slowest = sorted((row for row in rows if row[3] <= 1 and row[0] != args.module), key=lambda row: -row[2])
+    report = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "module": args.module,
+        "import_ms": round(min(totals) / 1000, 1),
+        "runs_ms": [round(total / 1000, 1) for total in totals],
+        "modules_loaded": len(loaded),
+        "eager_heavy_imports": eager,
+        "slowest": [{"module": name, "cumulative_ms": round(cumulative / 1000, 1), "self_ms": round(self_us / 1000, 1)}
+                    for name, self_us, cumulative, _ in slowest[:args.top]],
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    print(output)
+
+    failures = []
+    if eager:
+        failures.append(f"imported at startup: {', '.join(eager)}")
+    if args.max_ms is not None and report["import_ms"] > args.max_ms:
+        failures.append(f"import took {report['import_ms']}ms (budget {args.max_ms}ms)")
+    if failures:
+        print("; ".join(failures), file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
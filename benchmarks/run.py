@@ -0,0 +1,302 @@
+"""Offline load test for BACK.py.
+
+Runs the app on a local port with every upstream replaced by a stand-in
+(see upstreams.py), drives /analyze_company, /login and the alert scheduler
+at a fixed concurrency and prints latency percentiles and throughput as
+JSON. Diff the output of two commits to spot regressions:
+
+    python -m benchmarks.run --output before.json
+    python -m benchmarks.run --latency gemini=2 --error-rate wikipedia=0.1
+    python -m benchmarks.run --server asgi --concurrency 200   # async app (asgi.py, needs uvicorn)
+
+The app's own log lines go to stderr; stdout carries only the JSON report.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import string
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+UPSTREAMS = ("yahoo", "alpha_vantage", "wikipedia", "gemini")
+# Typical answer times (seconds) of the real services
+DEFAULT_LATENCY = {"yahoo": 0.15, "alpha_vantage": 0.2, "wikipedia": 0.25, "gemini": 0.8}
+SCENARIOS = ("analyze_company", "login", "alerts")
+# Resolved by the bundled symbol index; generated names (see unlisted_companies) go to Alpha Vantage
+LISTED_COMPANIES = ["Apple", "Microsoft", "Amazon", "Alphabet", "Tesla", "Nvidia", "Netflix", "Intel",
+                    "Walmart", "Coca-Cola"]
+
+
+def unlisted_companies(count, seed=0):
+    """Made-up names too unlike each other (and real listings) for the symbol index to fuzzy-match."""
+    rng = random.Random(f"{seed}:companies")
+    return ["".join(rng.choice(string.ascii_lowercase) for _ in range(9)).capitalize() + " Holdings"
+            for _ in range(count)]
+
+
+def per_upstream(values, option):
+    """Parse ``name=value`` pairs for --latency / --error-rate."""
+    parsed = {}
+    for item in values or []:
+        name, _, value = item.partition("=")
+        if name not in UPSTREAMS or not value:
+            raise SystemExit(f"{option} expects upstream=value with upstream in {', '.join(UPSTREAMS)}")
+        parsed[name] = float(value)
+    return parsed
+
+
+def summarize(latencies, errors, elapsed):
+    """Request count, error count, throughput and latency percentiles (ms) for one scenario."""
+    summary = {"requests": len(latencies), "errors": errors, "duration_s": round(elapsed, 3),
+               "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0}
+    if latencies:
+        values = np.array(latencies) * 1000
+        for percentile in (50, 95, 99):
+            summary[f"p{percentile}_ms"] = round(float(np.percentile(values, percentile)), 2)
+        summary["max_ms"] = round(float(values.max()), 2)
+    return summary
+
+
+def run_load(call, items, concurrency):
+    """Run ``call(item)`` for every item on ``concurrency`` threads; ``call`` returns True on success."""
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def timed(item):
+        nonlocal errors
+        started = time.perf_counter()
+        try:
+            ok = call(item)
+        except Exception:
+            ok = False
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            errors += not ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(timed, items))
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+def http_session():
+    import requests
+
+    local = threading.local()
+
+    def get():
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        return local.session
+    return get
+
+
+def bench_analyze(base_url, args):
+    """Cold pass over every company, then ``--requests`` warm requests spread over the same names."""
+    session = http_session()
+    companies = (LISTED_COMPANIES + unlisted_companies(args.companies, args.seed))[:args.companies]
+
+    def analyze(name):
+        response = session().get(f"{base_url}/analyze_company", params={"company_name": name}, timeout=60)
+        return response.status_code == 200 and response.json().get("success", False)
+
+    cold = run_load(analyze, companies, args.concurrency)
+    warm = run_load(analyze, [companies[i % len(companies)] for i in range(args.requests)], args.concurrency)
+    return {"analyze_company_cold": cold, "analyze_company_warm": warm}
+
+
+def bench_login(base_url, args, back):
+    """POST /login with valid credentials; password hashing dominates."""
+    users = [(f"bench{i}@example.com", f"password-{i}") for i in range(args.users)]
+    with back.app.app_context():
+        for email, password in users:
+            user = back.User(username=email.split("@")[0], email=email)
+            user.set_passsword(password)
+            back.db.session.add(user)
+        back.db.session.commit()
+    session = http_session()
+
+    def login(i):
+        email, password = users[i % len(users)]
+        response = session().post(f"{base_url}/login", data={"email": email, "password": password},
+                                  allow_redirects=False, timeout=30)
+        return response.status_code == 302
+
+    return {"login": run_load(login, range(args.requests), args.concurrency)}
+
+
+def bench_alerts(args, back):
+    """Scheduler ticks over ``--alerts`` active alerts that never fire (so every tick does the same work)."""
+    from alert_system import Alert
+    from alert_system.scheduler import check_alerts
+
+    tickers = ["AAPL", "MSFT", "AMZN", "GOOGL", "TSLA", "NVDA", "NFLX", "INTC", "WMT", "KO"]
+    with back.app.app_context():
+        for i in range(args.alerts):
+            ticker = tickers[i % len(tickers)]
+            if i % 2:
+                back.db.session.add(Alert(type="rsi", ticker=ticker, threshold=-1, direction="below"))
+            else:
+                back.db.session.add(Alert(type="price", ticker=ticker, target=1e12, direction="above"))
+        back.db.session.commit()
+
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(args.ticks):
+        tick_started = time.perf_counter()
+        check_alerts(back.app)
+        latencies.append(time.perf_counter() - tick_started)
+    return {"alert_tick": summarize(latencies, 0, time.perf_counter() - started)}
+
+
+def serve_flask(flask_app):
+    """Threaded werkzeug server on a free port; returns (base URL, stop)."""
+    from werkzeug.serving import make_server
+
+    server = make_server("127.0.0.1", 0, flask_app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="bench-server", daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", server.shutdown
+
+
+def serve_asgi():
+    """asgi.py under uvicorn on a free port; returns (base URL, stop)."""
+    import socket
+
+    import uvicorn
+
+    import asgi
+
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    server = uvicorn.Server(uvicorn.Config(asgi.app, log_level="warning", backlog=4096))
+    thread = threading.Thread(target=server.run, kwargs={"sockets": [sock]}, name="bench-server", daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+
+    def stop():
+        server.should_exit = True
+        thread.join()
+    return f"http://127.0.0.1:{sock.getsockname()[1]}", stop
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=REPO_ROOT).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated subset of " + ",".join(SCENARIOS))
+    parser.add_argument("--server", choices=("flask", "asgi"), default="flask",
+                        help="threaded Flask server, or asgi.py under uvicorn")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="requests per HTTP scenario (after the cold pass)")
+    parser.add_argument("--companies", type=int, default=40, help="distinct companies for /analyze_company")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--alerts", type=int, default=500)
+    parser.add_argument("--ticks", type=int, default=20)
+    parser.add_argument("--latency", action="append", metavar="UPSTREAM=SECONDS", help="override an upstream's latency")
+    parser.add_argument("--error-rate", action="append", metavar="UPSTREAM=FRACTION", help="fail a fraction of calls")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="also write the JSON results here")
+    args = parser.parse_args(argv)
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    latency = dict(DEFAULT_LATENCY, **per_upstream(args.latency, "--latency"))
+    error_rate = per_upstream(args.error_rate, "--error-rate")
+    output_path = os.path.abspath(args.output) if args.output else None
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+
+    # Everything the app persists goes to a throwaway directory so every run starts cold
+    workdir = tempfile.mkdtemp(prefix="stockmind-bench-")
+    os.environ.update({
+        "CACHE_DB_PATH": os.path.join(workdir, "cache.sqlite3"),
+        "OHLCV_STORE_DIR": os.path.join(workdir, "ohlcv"),
+        "SYMBOL_INDEX_LEARNED": os.path.join(workdir, "symbols_learned.csv"),
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        "MARKET_DATA_PROVIDER": "yfinance",
+        "LLM_CLIENT": "fake",
+        "POPULAR_COMPANIES": " ",
+        "RUN_SCHEDULER": "0",
+    })
+    # The stand-ins have no quota; raise the limits unless the caller is benchmarking them
+    os.environ.setdefault("ALPHA_VANTAGE_CALLS_PER_MINUTE", "60000")
+    os.environ.setdefault("ALPHA_VANTAGE_BURST", "100")
+    os.environ.setdefault("YAHOO_CALLS_PER_MINUTE", "60000")
+    os.environ.setdefault("YAHOO_BURST", "100")
+    os.chdir(workdir)
+    with contextlib.redirect_stdout(sys.stderr):
+        report = run(args, scenarios, latency, error_rate)
+    output = json.dumps(report, indent=2)
+    if output_path:
+        with open(output_path, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    print(output)
+    return report
+
+
+def run(args, scenarios, latency, error_rate):
+    from benchmarks.upstreams import Fault, FakeAlphaVantage, FakeGemini, FakeWikipedia, FakeYahoo
+
+    faults = {name: Fault(name, latency=latency[name], error_rate=error_rate.get(name, 0.0), seed=args.seed)
+              for name in UPSTREAMS}
+    alpha_vantage = FakeAlphaVantage(faults["alpha_vantage"])
+    os.environ["ALPHA_VANTAGE_URL"] = alpha_vantage.start()
+    FakeYahoo(faults["yahoo"], seed=args.seed).install()
+    wikipedia = FakeWikipedia(faults["wikipedia"])
+    wikipedia.install()
+    os.environ["WIKIPEDIA_API_URL"] = wikipedia.start()
+
+    import BACK
+
+    # Scheduler ticks are driven by bench_alerts, not by a background scheduler
+    BACK.create_app(run_scheduler=False)
+
+    if BACK.llm_service is not None:
+        BACK.llm_service.client = FakeGemini(faults["gemini"])
+    base_url, stop_server = serve_asgi() if args.server == "asgi" else serve_flask(BACK.app)
+
+    results = {}
+    try:
+        if "analyze_company" in scenarios:
+            results.update(bench_analyze(base_url, args))
+        if "login" in scenarios:
+            results.update(bench_login(base_url, args, BACK))
+        if "alerts" in scenarios:
+            results.update(bench_alerts(args, BACK))
+    finally:
+        stop_server()
+        alpha_vantage.stop()
+        wikipedia.stop()
+
+    return {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "config": {"server": args.server, "concurrency": args.concurrency, "requests": args.requests, "companies": args.companies,
+                   "users": args.users, "alerts": args.alerts, "ticks": args.ticks, "seed": args.seed},
+        "upstreams": {name: fault.stats() for name, fault in faults.items()},
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    main()
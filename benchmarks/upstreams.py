@@ -0,0 +1,211 @@
+"""Local stand-ins for Yahoo Finance, Alpha Vantage, Wikipedia and Gemini.
+
+Each one answers deterministically after an injected latency and fails a
+configurable fraction of calls, so benchmark runs need no network and are
+comparable between commits. Alpha Vantage is a real HTTP server (the app
+talks to it through ALPHA_VANTAGE_URL), as is Wikipedia for the async app
+(WIKIPEDIA_API_URL); the others replace the client library entry points
+the app calls.
+"""
+import json
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from llm import FakeLLMClient
+
+
+class UpstreamFault(Exception):
+    """Error injected by a stand-in."""
+
+
+class Fault:
+    """Latency (``latency`` seconds +/- ``jitter`` fraction) and error injection for one stand-in."""
+
+    def __init__(self, name, latency=0.0, jitter=0.5, error_rate=0.0, seed=0):
+        self.name = name
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self._random = random.Random(f"{seed}:{name}")
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+
+    def apply(self):
+        """Sleep for the injected latency; returns True when this call should fail."""
+        with self._lock:
+            self.calls += 1
+            delay = self.latency * (1 + self._random.uniform(-self.jitter, self.jitter))
+            failed = self._random.random() < self.error_rate
+            self.errors += failed
+        if delay > 0:
+            time.sleep(delay)
+        return failed
+
+    def raise_if_failed(self):
+        if self.apply():
+            raise UpstreamFault(f"injected {self.name} failure")
+
+    def stats(self):
+        return {"latency": self.latency, "error_rate": self.error_rate, "calls": self.calls,
+                "injected_errors": self.errors}
+
+
+def fake_symbol(name):
+    """Stable made-up ticker for a company name, e.g. "Benchmark Company 7" -> "BC7X"."""
+    letters = "".join(word[0] for word in name.split() if word[:1].isalpha()).upper()[:3] or "X"
+    return f"{letters}{zlib.crc32(name.encode('utf-8')) % 100}X"
+
+
+class JSONServer:
+    """Threaded HTTP server on 127.0.0.1 answering GETs with ``handle(query) -> (status, body)`` as JSON."""
+
+    def __init__(self, name):
+        self.name = name
+        self._server = None
+
+    def handle(self, query):
+        raise NotImplementedError
+
+    def start(self, path="/"):
+        """Start serving; returns the URL for ``path``."""
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like the real APIs
+
+            def do_GET(self):
+                query = {key: values[0] for key, values in parse_qs(urlparse(self.path).query).items()}
+                status, body = stand_in.handle(query)
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name=f"fake-{self.name}", daemon=True).start()
+        return f"http://127.0.0.1:{self._server.server_port}{path}"
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+
+class FakeAlphaVantage(JSONServer):
+    """SYMBOL_SEARCH over HTTP on 127.0.0.1; injected failures answer 503."""
+
+    def __init__(self, fault):
+        super().__init__("alpha-vantage")
+        self.fault = fault
+
+    def start(self, path="/query"):
+        return super().start(path)
+
+    def handle(self, query):
+        if self.fault.apply():
+            return 503, {"Error": "injected failure"}
+        keywords = query.get("keywords", "")
+        return 200, {"bestMatches": [{
+            "1. symbol": fake_symbol(keywords), "2. name": keywords, "3. type": "Equity",
+            "4. region": "United States", "8. currency": "USD", "9. matchScore": "1.0000",
+        }]}
+
+
+class FakeYahoo:
+    """Replaces ``yfinance.Ticker`` and ``yfinance.download`` with synthetic bars behind ``fault``."""
+
+    def __init__(self, fault, seed=0):
+        from market_data import SyntheticProvider
+
+        self.fault = fault
+        self.data = SyntheticProvider(seed=seed)
+
+    def install(self):
+        import pandas as pd
+        import yfinance
+
+        fake = self
+
+        class Ticker:
+            def __init__(self, ticker, session=None):
+                self.ticker = ticker
+
+            def history(self, period=None, interval="1d", start=None, **kwargs):
+                fake.fault.raise_if_failed()
+                return fake.data.history(self.ticker, period=period, interval=interval, start=start)
+
+            @property
+            def info(self):
+                fake.fault.raise_if_failed()
+                return {"marketCap": fake.data.market_cap(self.ticker)}
+
+        def download(tickers, period=None, interval="1d", **kwargs):
+            fake.fault.raise_if_failed()
+            frames = {ticker: fake.data.history(ticker, period=period, interval=interval) for ticker in tickers}
+            return pd.concat(frames, axis=1)
+
+        yfinance.Ticker = Ticker
+        yfinance.download = download
+
+
+def fake_summary(title):
+    return (f"{title} is a publicly traded company that designs, manufactures and sells products "
+            f"and services to consumers and businesses worldwide.")
+
+
+class FakeWikipedia(JSONServer):
+    """Canned pages behind ``fault``, either replacing ``wikipedia.summary`` / ``wikipedia.search``
+    (``install``) or as a MediaWiki API over HTTP for the async app (``start``, see WIKIPEDIA_API_URL)."""
+
+    def __init__(self, fault):
+        super().__init__("wikipedia")
+        self.fault = fault
+
+    def install(self):
+        import wikipedia
+
+        def summary(title, sentences=0, auto_suggest=True, **kwargs):
+            self.fault.raise_if_failed()
+            return fake_summary(title)
+
+        def search(query, results=10, **kwargs):
+            self.fault.raise_if_failed()
+            return [query, f"{query} (company)"][:results]
+
+        wikipedia.summary = summary
+        wikipedia.search = search
+
+    def start(self, path="/w/api.php"):
+        return super().start(path)
+
+    def handle(self, query):
+        if self.fault.apply():
+            return 503, {"error": "injected failure"}
+        if query.get("list") == "search":
+            term = query.get("srsearch", "")
+            return 200, {"query": {"search": [{"title": term}, {"title": f"{term} (company)"}]}}
+        title = query.get("titles", "")
+        return 200, {"query": {"pages": {"1": {"pageid": 1, "title": title, "extract": fake_summary(title)}}}}
+
+
+class FakeGemini(FakeLLMClient):
+    """FakeLLMClient with injected latency and failures."""
+
+    def __init__(self, fault):
+        super().__init__()
+        self.fault = fault
+
+    def generate(self, prompt):
+        self.fault.raise_if_failed()
+        return super().generate(prompt)
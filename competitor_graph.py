@@ -0,0 +1,272 @@
+import datetime
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+
+from extensions import db
+from market_data.symbols import normalize_name
+from rate_limit import BACKGROUND, upstream_priority
+
+# Profiles older than this are still served, but trigger a background refresh
+COMPETITOR_GRAPH_TTL = float(os.getenv("COMPETITOR_GRAPH_TTL", 24 * 3600))
+COMPETITOR_GRAPH_WORKERS = int(os.getenv("COMPETITOR_GRAPH_WORKERS", 2))
+# Always kept warm, in addition to the most requested companies
+POPULAR_COMPANIES = [name.strip() for name in os.getenv(
+    "POPULAR_COMPANIES", "Apple,Microsoft,Amazon,Alphabet,Tesla,Meta,Nvidia,Netflix"
+).split(",") if name.strip()]
+WARM_UP_LIMIT = int(os.getenv("COMPETITOR_GRAPH_WARM_UP_LIMIT", 25))
+# Each process adds its request counts to the database this often, or sooner once this many names are pending
+REQUEST_COUNT_FLUSH_SECONDS = float(os.getenv("COMPETITOR_GRAPH_COUNT_FLUSH_SECONDS", 60))
+REQUEST_COUNT_MAX_PENDING = int(os.getenv("COMPETITOR_GRAPH_COUNT_MAX_PENDING", 1000))
+NAME_KEY_LENGTH = 120
+
+
+def _utcnow():
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
+class CompanyNode(db.Model):
+    __tablename__ = "company_graph"
+
+    id = db.Column(db.Integer, primary_key=True)
+    name_key = db.Column(db.String(NAME_KEY_LENGTH), nullable=False, unique=True, index=True)
+    company_name = db.Column(db.String(120), nullable=False)
+    ticker = db.Column(db.String(16), index=True)
+    description = db.Column(db.Text)
+    refreshed_at = db.Column(db.DateTime, nullable=False, default=_utcnow, index=True)
+    edges = db.relationship("CompetitorEdge", backref="company", cascade="all, delete-orphan",
+                            order_by=lambda: [CompetitorEdge.sector_position, CompetitorEdge.position])
+
+
+class CompetitorEdge(db.Model):
+    __tablename__ = "competitor_edges"
+
+    id = db.Column(db.Integer, primary_key=True)
+    company_id = db.Column(db.Integer, db.ForeignKey("company_graph.id"), nullable=False, index=True)
+    sector = db.Column(db.String(200), nullable=False)
+    sector_position = db.Column(db.Integer, nullable=False)
+    position = db.Column(db.Integer, nullable=False)
+    competitor_name = db.Column(db.String(200), nullable=False)
+    competitor_ticker = db.Column(db.String(16))
+    market_cap = db.Column(db.BigInteger)
+    is_top = db.Column(db.Boolean, nullable=False, default=False)
+
+
+class CompanyRequests(db.Model):
+    """How often each company name was asked for, whether or not it has a stored profile yet."""
+    __tablename__ = "company_requests"
+
+    name_key = db.Column(db.String(NAME_KEY_LENGTH), primary_key=True)
+    company_name = db.Column(db.String(120), nullable=False)
+    request_count = db.Column(db.Integer, nullable=False, default=0, index=True)
+    last_requested = db.Column(db.DateTime, nullable=False, default=_utcnow)
+
+
+def record_requests(counts):
+    """Add ``{name_key: (company_name, count)}`` to the stored request counts (insert or increment)."""
+    now = _utcnow()
+    for attempt in range(2):
+        existing = {row.name_key for row in CompanyRequests.query.filter(
+            CompanyRequests.name_key.in_(list(counts))).with_entities(CompanyRequests.name_key)}
+        for key, (company_name, count) in counts.items():
+            if key in existing:
+                CompanyRequests.query.filter_by(name_key=key).update(
+                    {CompanyRequests.request_count: CompanyRequests.request_count + count,
+                     CompanyRequests.last_requested: now})
+            else:
+                db.session.add(CompanyRequests(name_key=key, company_name=company_name[:120],
+                                               request_count=count, last_requested=now))
+        try:
+            db.session.commit()
+            return
+        except IntegrityError:
+            # Another process inserted one of the names first; the retry increments it instead
+            db.session.rollback()
+            if attempt:
+                raise
+
+
+def load_profile(company_name):
+    """The stored profile for ``company_name`` as a dict (one indexed read), or None."""
+    node = (CompanyNode.query.options(joinedload(CompanyNode.edges))
+            .filter_by(name_key=normalize_name(company_name)).first())
+    if node is None:
+        return None
+    sectors = []
+    top_competitors = []
+    for edge in node.edges:
+        if not sectors or sectors[-1]["name"] != edge.sector:
+            sectors.append({"name": edge.sector, "competitors": []})
+        sectors[-1]["competitors"].append(edge.competitor_name)
+        if edge.is_top:
+            top_competitors.append({"name": edge.competitor_name, "ticker": edge.competitor_ticker,
+                                    "market_cap": edge.market_cap})
+    top_competitors.sort(key=lambda comp: comp["market_cap"] or 0, reverse=True)
+    age = (_utcnow() - node.refreshed_at).total_seconds()
+    return {
+        "company_name": node.company_name,
+        "ticker": node.ticker,
+        "description": node.description,
+        "sectors": sectors,
+        "top_competitors": top_competitors,
+        "age": age,
+        "stale": age > COMPETITOR_GRAPH_TTL,
+    }
+
+
+def save_profile(company_name, profile):
+    """Replace the stored profile (company, sectors, competitor edges) for ``company_name``."""
+    key = normalize_name(company_name)
+    node = CompanyNode.query.filter_by(name_key=key).first()
+    if node is None:
+        node = CompanyNode(name_key=key, company_name=company_name)
+        db.session.add(node)
+    node.ticker = profile["ticker"]
+    node.description = profile["description"]
+    node.refreshed_at = _utcnow()
+    node.edges = []
+
+    top_by_name = {comp["name"]: comp for comp in profile.get("top_competitors", [])}
+    for sector_position, sector in enumerate(profile["sectors"]):
+        for position, name in enumerate(sector["competitors"]):
+            top = top_by_name.pop(name, None) if sector_position == 0 else None
+            node.edges.append(CompetitorEdge(
+                sector=sector["name"], sector_position=sector_position, position=position,
+                competitor_name=name, competitor_ticker=top["ticker"] if top else None,
+                market_cap=top["market_cap"] if top else None, is_top=top is not None,
+            ))
+    db.session.commit()
+
+
+class GraphRefresher:
+    """Serves stored profiles and refreshes them in the background (stale-while-revalidate).
+
+    ``compute(company_name)`` rebuilds a profile from the upstream providers and
+    returns a dict with ticker, description, sectors and top_competitors, or
+    None when the result should not be stored.
+    """
+
+    def __init__(self, app, compute, workers=COMPETITOR_GRAPH_WORKERS):
+        self.app = app
+        self.compute = compute
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="graph")
+        self._inflight = set()
+        self._lock = threading.Lock()
+        self._requests = {}  # name_key -> (company_name, count), added to CompanyRequests by flush_request_counts
+        self._flushed_at = time.monotonic()
+        self._flushing = False
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self.saves = 0
+        self.stale_served = 0
+
+    def get(self, company_name):
+        """Stored profile (possibly stale, which schedules a refresh) or None if never computed.
+
+        Needs an app context; it also flushes this process's request counts when they are due.
+        """
+        self._count_request(company_name)
+        profile = load_profile(company_name)
+        if profile is not None and profile["stale"]:
+            self.stale_served += 1
+            self.refresh_async(company_name)
+        return profile
+
+    def refresh(self, company_name):
+        # Refreshes are background work: they queue behind interactive requests for rate-limited APIs
+        with self.app.app_context(), upstream_priority(BACKGROUND):
+            try:
+                profile = self.compute(company_name)
+                if profile is not None:
+                    save_profile(company_name, profile)
+                    self.refreshes += 1
+            except Exception as e:
+                db.session.rollback()
+                self.refresh_errors += 1
+                print(f"Error refreshing competitor graph for {company_name}: {e}")
+            finally:
+                with self._lock:
+                    self._inflight.discard(normalize_name(company_name))
+
+    def refresh_async(self, company_name):
+        key = normalize_name(company_name)
+        with self._lock:
+            if key in self._inflight:
+                return
+            self._inflight.add(key)
+        self._executor.submit(self.refresh, company_name)
+
+    def save(self, company_name, profile):
+        """Store a profile the caller just computed, so the upstream chain doesn't run a second time."""
+        with self.app.app_context():
+            try:
+                save_profile(company_name, profile)
+                self.saves += 1
+            except Exception as e:
+                db.session.rollback()
+                self.refresh_errors += 1
+                print(f"Error saving competitor graph for {company_name}: {e}")
+
+    def save_async(self, company_name, profile):
+        if profile is not None:
+            self._executor.submit(self.save, company_name, profile)
+
+    def _count_request(self, company_name):
+        key = normalize_name(company_name)
+        with self._lock:
+            if key and len(key) <= NAME_KEY_LENGTH and (key in self._requests
+                                                       or len(self._requests) < REQUEST_COUNT_MAX_PENDING):
+                name, count = self._requests.get(key, (company_name, 0))
+                self._requests[key] = (name, count + 1)
+            due = not self._flushing and (len(self._requests) >= REQUEST_COUNT_MAX_PENDING or
+                                          time.monotonic() - self._flushed_at >= REQUEST_COUNT_FLUSH_SECONDS)
+            if due:
+                self._flushing = True
+        if due:
+            self.flush_request_counts()
+
+    def flush_request_counts(self):
+        """Add this process's pending request counts to the database (needs an app context)."""
+        with self._lock:
+            counts, self._requests = self._requests, {}
+            self._flushed_at = time.monotonic()
+        try:
+            if counts:
+                record_requests(counts)
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error recording competitor graph request counts: {e}")
+        finally:
+            with self._lock:
+                self._flushing = False
+
+    def warm_up(self, limit=WARM_UP_LIMIT):
+        """Refresh missing or stale profiles for POPULAR_COMPANIES and the most requested companies."""
+        with self.app.app_context():
+            self.flush_request_counts()
+            most_requested = (CompanyRequests.query.order_by(CompanyRequests.request_count.desc())
+                              .limit(limit).all())
+            names = list(dict.fromkeys(POPULAR_COMPANIES + [row.company_name for row in most_requested]))
+            cutoff = _utcnow() - datetime.timedelta(seconds=COMPETITOR_GRAPH_TTL)
+            fresh = {node.name_key for node in CompanyNode.query.filter(
+                CompanyNode.name_key.in_([normalize_name(name) for name in names]),
+                CompanyNode.refreshed_at > cutoff)}
+        stale = [name for name in names if normalize_name(name) not in fresh]
+        if stale:
+            print(f"Warming competitor graph for: {stale}")
+        for name in stale:
+            self.refresh_async(name)
+
+    def stats(self):
+        return {
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+            "saves": self.saves,
+            "stale_served": self.stale_served,
+            "refreshing": len(self._inflight),
+            "request_counts_pending": len(self._requests),
+        }
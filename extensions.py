@@ -0,0 +1,5 @@
+from flask_sqlalchemy import SQLAlchemy
+
+# Shared SQLAlchemy handle so packages like alert_system can define models
+# without importing BACK.py; the app binds it with db.init_app(app).
+db = SQLAlchemy()
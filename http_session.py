@@ -0,0 +1,114 @@
+import importlib
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Hosts with a connection pool, and keep-alive connections kept per host (size to the busiest thread pool)
+HTTP_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", 10))
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", 32))
+# Retries for connection errors and 502/503/504 on idempotent requests, with exponential backoff.
+# Read timeouts are raised at once: each retry would wait the full read timeout again, past the
+# circuit breaker's adaptive deadline, so the breaker decides what a slow upstream costs
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", 2))
+HTTP_RETRY_BACKOFF = float(os.getenv("HTTP_RETRY_BACKOFF", 0.3))
+HTTP_RETRY_STATUSES = (502, 503, 504)
+# Default (connect, read) timeout for calls that don't pass one; the circuit breakers apply tighter ones
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", 3.05))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", 10))
+USER_AGENT = "StockMind (https://github.com/sharathchandra-patil/StockMind)"
+# wikipedia library release whose private _wiki_request install_wikipedia_session replaces
+WIKIPEDIA_LIBRARY_VERSION = (1, 4)
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter that applies ``timeout`` to requests sent without one (requests' own default is none)."""
+
+    def __init__(self, timeout, **kwargs):
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def send(self, request, timeout=None, **kwargs):
+        return super().send(request, timeout=self.timeout if timeout is None else timeout, **kwargs)
+
+
+def make_session(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE, retries=HTTP_RETRIES,
+                 backoff=HTTP_RETRY_BACKOFF, timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)):
+    """``requests.Session`` with pooled keep-alive connections, a retry policy and a default timeout.
+
+    Connection failures and 502/503/504 answers are retried; read timeouts are not.
+    """
+    retry = Retry(total=retries, connect=retries, read=False, status=retries, backoff_factor=backoff,
+                  status_forcelist=HTTP_RETRY_STATUSES, allowed_methods=frozenset({"GET", "HEAD"}),
+                  respect_retry_after_header=True,
+                  # Hand the last 5xx back to the caller like a plain request would
+                  raise_on_status=False)
+    adapter = TimeoutHTTPAdapter(timeout, pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                                 max_retries=retry, pool_block=False)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["User-Agent"] = USER_AGENT
+    return session
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def upstream_session():
+    """The process-wide session every outbound HTTP call shares, so connections are reused between requests."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = make_session()
+    return _session
+
+
+def install_wikipedia_session(session=None):
+    """Send the wikipedia library's API calls through ``session``; True if installed.
+
+    Replaces only ``wikipedia.wikipedia._wiki_request``, mirroring the pinned 1.4
+    release (see requirements.txt). Any other version keeps its own plain
+    requests calls, with a warning, rather than being patched blind.
+    """
+    library = importlib.import_module("wikipedia")
+    module = importlib.import_module("wikipedia.wikipedia")
+    version = tuple(getattr(library, "__version__", ()))
+    if version[:2] != WIKIPEDIA_LIBRARY_VERSION or not callable(getattr(module, "_wiki_request", None)):
+        print(f"wikipedia {version or 'unknown'} is not the {WIKIPEDIA_LIBRARY_VERSION} release this was written for; "
+              f"its requests stay off the shared session")
+        return False
+    if getattr(module._wiki_request, "shared_session", False):
+        return True
+    session = session or upstream_session()
+    original = module._wiki_request
+
+    def _wiki_request(params):
+        if module.RATE_LIMIT:
+            return original(params)  # the library paces its own calls
+        params["format"] = "json"
+        params.setdefault("action", "query")
+        return session.get(module.API_URL, params=params, headers={"User-Agent": module.USER_AGENT}).json()
+
+    _wiki_request.shared_session = True
+    module._wiki_request = _wiki_request
+    return True
+
+
+def pool_stats():
+    """Per-host connections opened and requests sent on the shared session; requests >> connections means keep-alive works."""
+    if _session is None:
+        return {}
+    stats = {}
+    for adapter in set(_session.adapters.values()):
+        pools = adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is not None:
+                stats[f"{key.key_scheme}://{key.key_host}:{key.key_port}"] = {
+                    "connections_opened": pool.num_connections, "requests": pool.num_requests}
+    return stats
@@ -0,0 +1,202 @@
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+
+from persistent_cache import PersistentTTLCache
+from resilience import CircuitOpenError, circuit_breaker
+
+LLM_MODEL = os.getenv("LLM_MODEL", "gemini-1.5-flash")
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 4))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 20))  # seconds, including time queued for a slot
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", 7 * 24 * 3600))
+
+
+class LLMTimeout(Exception):
+    """The model did not answer (or no concurrency slot freed up) within the deadline."""
+
+
+class LLMResult:
+    def __init__(self, text, input_tokens=0, output_tokens=0):
+        self.text = text
+        self.input_tokens = input_tokens
+        self.output_tokens = output_tokens
+
+
+class LLMClient:
+    """Interface for text-generation backends used by LLMService."""
+
+    model = "unknown"
+
+    def generate(self, prompt):
+        """Return an LLMResult for ``prompt``; may block and may raise."""
+        raise NotImplementedError
+
+
+class GeminiClient(LLMClient):
+    def __init__(self, api_key, model=LLM_MODEL):
+        self.model = model
+        self.api_key = api_key
+        self._client = None
+        self._lock = threading.Lock()
+
+    def client(self):
+        """The genai.Client, created on first use; importing google-genai alone takes most of a second."""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    from google import genai
+
+                    self._client = genai.Client(api_key=self.api_key)
+        return self._client
+
+    def generate(self, prompt):
+        response = self.client().models.generate_content(model=self.model, contents=prompt)
+        text = response.candidates[0].content.parts[0].text
+        usage = getattr(response, "usage_metadata", None)
+        return LLMResult(
+            text,
+            input_tokens=getattr(usage, "prompt_token_count", 0) or 0,
+            output_tokens=getattr(usage, "candidates_token_count", 0) or 0,
+        )
+
+
+class FakeLLMClient(LLMClient):
+    """Local stand-in model: answers with ``responder(prompt)`` (or fixed text) after ``latency`` seconds."""
+
+    model = "fake"
+
+    def __init__(self, responder=None, latency=0.0):
+        self.responder = responder
+        self.latency = latency
+        self.calls = 0
+
+    def generate(self, prompt):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if callable(self.responder):
+            text = self.responder(prompt)
+        elif self.responder is not None:
+            text = self.responder
+        else:
+            text = ("Technology Sector:\nMicrosoft\nApple\nAlphabet\n\n"
+                    "Consumer Electronics:\nSamsung\nSony\nDell")
+        return LLMResult(text, input_tokens=len(prompt.split()), output_tokens=len(text.split()))
+
+
+class LLMService:
+    """Cache, concurrency cap, deadline and usage counters around an LLMClient.
+
+    Parsed results are cached (memory + disk) under a hash of the model and
+    prompt, so repeated analyses of the same description skip the model.
+    At most ``max_concurrency`` calls are in flight; a call that cannot get a
+    slot or an answer within the breaker's adaptive timeout (at most ``timeout``
+    seconds) raises LLMTimeout. While the "gemini" circuit is open, cache
+    misses raise CircuitOpenError immediately.
+    """
+
+    def __init__(self, client, max_concurrency=LLM_MAX_CONCURRENCY, timeout=LLM_TIMEOUT, cache=None, breaker=None):
+        self.client = client
+        self.timeout = timeout
+        self.breaker = breaker or circuit_breaker("gemini", default_timeout=timeout, min_timeout=min(2.0, timeout),
+                                                  max_timeout=timeout)
+        self.cache = cache or PersistentTTLCache("llm", ttl=LLM_CACHE_TTL)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="llm")
+        self._lock = threading.Lock()
+        self.max_concurrency = max_concurrency
+        self.calls = 0
+        self.cache_hits = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def cache_key(self, prompt):
+        return hashlib.sha256(f"{self.client.model}\n{prompt}".encode("utf-8")).hexdigest()
+
+    def _generate(self, prompt):
+        # Runs on the pool; the slot is held until the model actually answers,
+        # even if the caller already gave up, so the cap is real.
+        started = time.perf_counter()
+        try:
+            return self.client.generate(prompt)
+        finally:
+            self._slots.release()
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.latency_total += elapsed
+                self.latency_max = max(self.latency_max, elapsed)
+
+    def query(self, prompt, parse):
+        """Return ``parse(text)`` for the model's answer to ``prompt``, served from cache when possible.
+
+        Empty parse results are returned but not cached.
+        """
+        key = self.cache_key(prompt)
+        found, cached = self.cache.get(key)
+        if found and cached:
+            with self._lock:
+                self.cache_hits += 1
+            return cached
+
+        if not self.breaker.allow():
+            raise CircuitOpenError("gemini circuit is open")
+        timeout = self.breaker.timeout()
+        started = time.monotonic()
+        deadline = started + timeout
+        if not self._slots.acquire(timeout=timeout):
+            self.breaker.record_failure(timed_out=True)
+            with self._lock:
+                self.timeouts += 1
+            raise LLMTimeout(f"No LLM slot free within {timeout:.1f}s")
+        with self._lock:
+            self.calls += 1
+        future = self._executor.submit(self._generate, prompt)
+        try:
+            result = future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FuturesTimeoutError:
+            self.breaker.record_failure(timed_out=True)
+            with self._lock:
+                self.timeouts += 1
+            raise LLMTimeout(f"LLM did not answer within {timeout:.1f}s")
+        except Exception:
+            self.breaker.record_failure()
+            with self._lock:
+                self.errors += 1
+            raise
+        self.breaker.record_success(time.monotonic() - started)
+
+        with self._lock:
+            self.input_tokens += result.input_tokens
+            self.output_tokens += result.output_tokens
+        parsed = parse(result.text)
+        if parsed:
+            self.cache.put(key, parsed)
+        return parsed
+
+    def stats(self):
+        with self._lock:
+            return {
+                "model": self.client.model,
+                "max_concurrency": self.max_concurrency,
+                "calls": self.calls,
+                "cache_hits": self.cache_hits,
+                "timeouts": self.timeouts,
+                "errors": self.errors,
+                "input_tokens": self.input_tokens,
+                "output_tokens": self.output_tokens,
+                "latency_avg": round(self.latency_total / self.calls, 4) if self.calls else 0.0,
+                "latency_max": round(self.latency_max, 4),
+            }
+
+
+def make_llm_client(api_key):
+    """Client selected by LLM_CLIENT: "gemini" (default) or "fake" for offline runs."""
+    if os.getenv("LLM_CLIENT", "gemini") == "fake":
+        return FakeLLMClient(latency=float(os.getenv("FAKE_LLM_LATENCY", 0)))
+    return GeminiClient(api_key)
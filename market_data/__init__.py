@@ -0,0 +1,5 @@
+from .providers import (MarketDataProvider, YFinanceProvider, LocalFileProvider, SyntheticProvider,
+                        make_provider, market_data_provider, fallback_provider)
+from .cache import PriceHistoryCache, price_cache, get_price_history
+from .store import OHLCVStore, ohlcv_store
+from .symbols import SymbolIndex, symbol_index
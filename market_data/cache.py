@@ -0,0 +1,167 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from .providers import market_data_provider
+from .store import STORE_PERIODS, ohlcv_store
+
+PRICE_CACHE_TTL = float(os.getenv("PRICE_CACHE_TTL", 60))  # seconds
+PRICE_CACHE_SIZE = int(os.getenv("PRICE_CACHE_SIZE", 512))  # entries
+# Expired entries are kept this much longer and served if the provider fails (e.g. circuit open)
+PRICE_CACHE_STALE_TTL = float(os.getenv("PRICE_CACHE_STALE_TTL", 3600))  # seconds
+
+
+class _InFlight:
+    """A fetch in progress that other callers for the same key can wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class PriceHistoryCache:
+    """Thread-safe TTL + LRU cache with single-flight loading.
+
+    Concurrent misses for the same key share one call to the loader; the
+    other callers block until it finishes and get the same result (or error).
+    If the loader fails, an entry that expired less than ``stale_ttl`` ago is
+    returned instead of the error.
+    Cached values are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, ttl=PRICE_CACHE_TTL, max_entries=PRICE_CACHE_SIZE, stale_ttl=PRICE_CACHE_STALE_TTL):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.stale_ttl = stale_ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.stale_served = 0
+
+    def _lookup(self, key, now):
+        # Caller must hold self._lock
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at <= now:
+            # Past the stale window it is gone; within it, kept only as a fallback for loader failures
+            if expires_at + self.stale_ttl <= now:
+                del self._entries[key]
+                self.expirations += 1
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def _store(self, key, value, now):
+        # Caller must hold self._lock
+        self._entries[key] = (now + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key):
+        """Return the cached value for ``key`` or None, without loading it."""
+        with self._lock:
+            found, value = self._lookup(key, time.monotonic())
+            if found:
+                self.hits += 1
+                return value
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._store(key, value, time.monotonic())
+
+    def get_or_load(self, key, loader):
+        """Return the cached value for ``key``, calling ``loader()`` at most once per miss."""
+        with self._lock:
+            found, value = self._lookup(key, time.monotonic())
+            if found:
+                self.hits += 1
+                return value
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _InFlight()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            call.value = loader()
+        except Exception as e:
+            with self._lock:
+                entry = self._entries.get(key)
+                stale = entry is not None and entry[0] + self.stale_ttl > time.monotonic()
+                if stale:
+                    self.stale_served += 1
+            if not stale:
+                call.error = e
+                raise
+            print(f"Serving stale price history for {key} after loader error: {e}")
+            call.value = entry[1]
+            return call.value
+        except BaseException as e:
+            call.error = e
+            raise
+        else:
+            with self._lock:
+                self._store(key, call.value, time.monotonic())
+            return call.value
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            call.done.set()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "stale_served": self.stale_served,
+                "hit_ratio": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+            }
+
+
+# Process-wide cache shared by BACK.py and alert_system
+price_cache = PriceHistoryCache()
+
+
+def _load_history(ticker, period, interval):
+    # Daily windows come from the on-disk store, which only fetches the missing tail
+    if ohlcv_store is not None and interval == "1d" and period in STORE_PERIODS:
+        return ohlcv_store.history(ticker, period)
+    return market_data_provider.history(ticker, period=period, interval=interval)
+
+
+def get_price_history(ticker, period="3mo", interval="1d"):
+    """Cached ``market_data_provider.history(ticker, period=period, interval=interval)``."""
+    key = (ticker.upper(), period, interval)
+    return price_cache.get_or_load(key, lambda: _load_history(ticker, period, interval))
@@ -0,0 +1,248 @@
+import csv
+import functools
+import os
+import zlib
+
+import numpy as np
+
+from rate_limit import RateLimited, rate_limiter
+from resilience import circuit_breaker
+
+MARKET_DATA_PROVIDER = os.getenv("MARKET_DATA_PROVIDER", "yfinance")
+# Directory of <TICKER>.csv daily bars (and an optional market_caps.csv) for the "local" provider
+MARKET_DATA_DIR = os.getenv("MARKET_DATA_DIR", os.path.join("data", "market"))
+# Degraded-mode source used when the primary provider has no data; "none" disables it
+MARKET_DATA_FALLBACK = os.getenv("MARKET_DATA_FALLBACK", "synthetic")
+SYNTHETIC_SEED = int(os.getenv("SYNTHETIC_SEED", 0))
+YAHOO_TIMEOUT = float(os.getenv("YAHOO_TIMEOUT", 10))  # used until enough latencies are seen
+# Yahoo has no published quota; bursts beyond this get answered with 429s
+YAHOO_CALLS_PER_MINUTE = float(os.getenv("YAHOO_CALLS_PER_MINUTE", 120))
+YAHOO_BURST = int(os.getenv("YAHOO_BURST", 10))
+# Set to 1 to send yfinance through the shared keep-alive session (http_session.py). Off by default:
+# newer yfinance releases need their own curl_cffi session, which Yahoo answers when a requests one is blocked
+YFINANCE_SHARED_SESSION = os.getenv("YFINANCE_SHARED_SESSION", "0") == "1"
+# Synthetic series start here so a given date always gets the same price, whenever it is asked for
+SYNTHETIC_EPOCH = np.datetime64("2015-01-02", "D")
+
+FRAME_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+# pd.DateOffset arguments; pandas itself is imported on first use to keep startup fast
+PERIOD_OFFSETS = {
+    "1mo": {"months": 1}, "3mo": {"months": 3}, "6mo": {"months": 6},
+    "1y": {"years": 1}, "2y": {"years": 2}, "5y": {"years": 5}, "10y": {"years": 10},
+}
+PERIOD_ROWS = {"1d": 1, "5d": 5}  # yfinance counts these in trading days
+
+
+def empty_frame():
+    import pandas as pd
+
+    return pd.DataFrame(columns=FRAME_COLUMNS, index=pd.DatetimeIndex([], name="Date"), dtype="f8")
+
+
+def slice_period(frame, period=None, start=None):
+    """Trailing ``period`` (yfinance period string) of a daily frame, or the rows from ``start`` on."""
+    import pandas as pd
+
+    if frame.empty:
+        return frame
+    if start is not None:
+        return frame[frame.index >= pd.Timestamp(start)]
+    if period in PERIOD_ROWS:
+        return frame.iloc[-PERIOD_ROWS[period]:]
+    if period == "ytd":
+        return frame[frame.index >= pd.Timestamp(frame.index[-1].year, 1, 1)]
+    if period in PERIOD_OFFSETS:
+        return frame[frame.index >= frame.index[-1] - pd.DateOffset(**PERIOD_OFFSETS[period])]
+    return frame
+
+
+class MarketDataProvider:
+    """Interface for daily price and market-cap backends.
+
+    Frames are shaped like ``yf.Ticker.history``: a DatetimeIndex named Date
+    and Open/High/Low/Close/Volume columns. ``remote`` providers are worth
+    caching on disk (see OHLCVStore); local ones are not.
+    """
+
+    name = "unknown"
+    remote = False
+
+    def history(self, ticker, period=None, interval="1d", start=None):
+        raise NotImplementedError
+
+    def download(self, tickers, period, interval="1d"):
+        """Histories for several tickers as ``{ticker: frame}``; tickers with no data are omitted."""
+        frames = {}
+        for ticker in tickers:
+            frame = self.history(ticker, period=period, interval=interval)
+            if not frame.empty:
+                frames[ticker] = frame
+        return frames
+
+    def market_cap(self, ticker):
+        return None
+
+
+class YFinanceProvider(MarketDataProvider):
+    """Yahoo Finance via yfinance; every call takes a "yahoo" rate-limit token and goes through its breaker."""
+
+    name = "yfinance"
+    remote = True
+
+    def __init__(self):
+        self.breaker = circuit_breaker("yahoo", default_timeout=YAHOO_TIMEOUT, min_timeout=1.0,
+                                       max_timeout=2 * YAHOO_TIMEOUT)
+        self.limiter = rate_limiter("yahoo", rate=YAHOO_CALLS_PER_MINUTE / 60, capacity=YAHOO_BURST)
+
+    @staticmethod
+    def session():
+        """The shared pooled session (see http_session.py), or None to let yfinance manage its own."""
+        if not YFINANCE_SHARED_SESSION:
+            return None
+        from http_session import upstream_session
+
+        return upstream_session()
+
+    def _call(self, func, *args, **kwargs):
+        # Don't spend a shared token on a call the open circuit would refuse anyway
+        self.breaker.check()
+        if not self.limiter.acquire():
+            raise RateLimited("yahoo rate limit reached")
+        return self.breaker.call(func, *args, **kwargs)
+
+    def history(self, ticker, period=None, interval="1d", start=None):
+        import yfinance as yf
+
+        if start is not None:
+            return self._call(yf.Ticker(ticker, session=self.session()).history, start=start, interval=interval)
+        return self._call(yf.Ticker(ticker, session=self.session()).history, period=period, interval=interval)
+
+    def download(self, tickers, period, interval="1d"):
+        """One multi-ticker ``yf.download`` call for all ``tickers``."""
+        import yfinance as yf
+
+        data = self._call(yf.download, list(tickers), period=period, interval=interval, group_by="ticker",
+                          threads=True, progress=False, auto_adjust=False, session=self.session())
+        frames = {}
+        for ticker in tickers:
+            try:
+                frame = data[ticker] if data.columns.nlevels > 1 else data
+                frame = frame.dropna(subset=["Close"])
+            except KeyError:
+                continue
+            if not frame.empty:
+                frames[ticker] = frame
+        return frames
+
+    def market_cap(self, ticker):
+        import yfinance as yf
+
+        return self._call(lambda: yf.Ticker(ticker, session=self.session()).info).get("marketCap", None)
+
+
+class LocalFileProvider(MarketDataProvider):
+    """Daily bars from ``<root>/<TICKER>.csv`` (Date,Open,High,Low,Close,Volume).
+
+    Market caps come from ``<root>/market_caps.csv`` (ticker,market_cap) when present.
+    Files are read once and kept in memory.
+    """
+
+    name = "local"
+
+    def __init__(self, root=MARKET_DATA_DIR):
+        self.root = root
+        self._market_caps = None
+
+    @functools.lru_cache(maxsize=1024)
+    def _frame(self, ticker):
+        import pandas as pd
+
+        path = os.path.join(self.root, f"{ticker.upper()}.csv")
+        if not os.path.exists(path):
+            return empty_frame()
+        frame = pd.read_csv(path, index_col="Date", parse_dates=True).sort_index()
+        frame.index.name = "Date"
+        return frame.reindex(columns=FRAME_COLUMNS).dropna(subset=["Close"])
+
+    def history(self, ticker, period=None, interval="1d", start=None):
+        if interval != "1d":
+            return empty_frame()
+        return slice_period(self._frame(ticker), period, start)
+
+    def market_cap(self, ticker):
+        if self._market_caps is None:
+            caps = {}
+            path = os.path.join(self.root, "market_caps.csv")
+            if os.path.exists(path):
+                with open(path, newline="", encoding="utf-8") as f:
+                    for row in csv.DictReader(f):
+                        caps[row["ticker"].strip().upper()] = int(float(row["market_cap"]))
+            self._market_caps = caps
+        return self._market_caps.get(ticker.upper())
+
+
+class SyntheticProvider(MarketDataProvider):
+    """Deterministic random-walk bars for any ticker; no network, same output on every run.
+
+    Each ticker gets its own seeded geometric random walk over business days
+    from SYNTHETIC_EPOCH, so prices for a date never change and responses built
+    from them stay cacheable.
+    """
+
+    name = "synthetic"
+
+    def __init__(self, seed=SYNTHETIC_SEED):
+        self.seed = seed
+
+    def _rng(self, ticker, stream=0):
+        # One independent stream per field, so extending the series never shifts earlier values
+        return np.random.default_rng([zlib.crc32(f"{self.seed}:{ticker.upper()}".encode("utf-8")), stream])
+
+    @functools.lru_cache(maxsize=1024)
+    def _frame(self, ticker, end):
+        import pandas as pd
+
+        days = np.arange(SYNTHETIC_EPOCH, end + 1, dtype="datetime64[D]")
+        days = days[np.is_busday(days)]
+        params = self._rng(ticker)
+        start_price = params.uniform(20, 400)
+        drift, volatility = params.uniform(-0.0002, 0.0006), params.uniform(0.01, 0.03)
+        returns = self._rng(ticker, 1).normal(drift, volatility, len(days))
+        close = start_price * np.exp(np.cumsum(returns))
+        open_ = np.concatenate([[start_price], close[:-1]])
+        spread = np.abs(self._rng(ticker, 2).normal(0, volatility / 2, len(days)))
+        frame = pd.DataFrame({
+            "Open": open_.round(2),
+            "High": (np.maximum(open_, close) * (1 + spread)).round(2),
+            "Low": (np.minimum(open_, close) * (1 - spread)).round(2),
+            "Close": close.round(2),
+            "Volume": self._rng(ticker, 3).integers(100_000, 50_000_000, len(days)).astype("f8"),
+        }, index=pd.DatetimeIndex(days, name="Date"))
+        return frame
+
+    def history(self, ticker, period=None, interval="1d", start=None):
+        if interval != "1d":
+            return empty_frame()
+        return slice_period(self._frame(ticker.upper(), np.datetime64("today", "D")), period, start)
+
+    def market_cap(self, ticker):
+        # A fixed share count per ticker times the latest synthetic close
+        shares = int(self._rng(ticker, 4).integers(50_000_000, 16_000_000_000))
+        last_close = self.history(ticker, period="5d")["Close"].iloc[-1]
+        return int(shares * last_close)
+
+
+PROVIDERS = {"yfinance": YFinanceProvider, "local": LocalFileProvider, "synthetic": SyntheticProvider}
+
+
+def make_provider(name):
+    """Provider by config name ("yfinance", "local" or "synthetic"); None for "" or "none"."""
+    if not name or name == "none":
+        return None
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown market data provider {name!r}; choose from {sorted(PROVIDERS)}")
+    return PROVIDERS[name]()
+
+
+market_data_provider = make_provider(MARKET_DATA_PROVIDER)
+fallback_provider = make_provider(MARKET_DATA_FALLBACK)
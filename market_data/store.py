@@ -0,0 +1,154 @@
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from .providers import market_data_provider
+
+OHLCV_STORE_DIR = os.getenv("OHLCV_STORE_DIR", os.path.join("data", "ohlcv"))
+# How long a stored series is trusted before its tail is re-fetched (seconds)
+OHLCV_REFRESH_INTERVAL = float(os.getenv("OHLCV_REFRESH_INTERVAL", 900))
+# History downloaded the first time a ticker is seen; longer windows are sliced from it
+OHLCV_BOOTSTRAP_PERIOD = os.getenv("OHLCV_BOOTSTRAP_PERIOD", "2y")
+
+BAR_DTYPE = np.dtype([
+    ("date", "datetime64[D]"),
+    ("open", "f8"),
+    ("high", "f8"),
+    ("low", "f8"),
+    ("close", "f8"),
+    ("volume", "f8"),
+])
+FRAME_COLUMNS = {"open": "Open", "high": "High", "low": "Low", "close": "Close", "volume": "Volume"}
+
+
+# Periods that are sliced out of the stored series; anything else goes straight to the provider
+STORE_PERIODS = {"1mo": {"months": 1}, "3mo": {"months": 3}, "6mo": {"months": 6}, "1y": {"years": 1}}
+
+
+class OHLCVStore:
+    """Daily OHLCV bars persisted as one memory-mapped NumPy file per ticker.
+
+    The first request for a ticker downloads OHLCV_BOOTSTRAP_PERIOD of history;
+    after that only the bars from the last stored date onwards are fetched,
+    and no more often than every OHLCV_REFRESH_INTERVAL seconds.
+    """
+
+    def __init__(self, root=OHLCV_STORE_DIR, refresh_interval=OHLCV_REFRESH_INTERVAL,
+                 bootstrap_period=OHLCV_BOOTSTRAP_PERIOD, provider=market_data_provider):
+        self.root = root
+        self.provider = provider
+        self.refresh_interval = refresh_interval
+        self.bootstrap_period = bootstrap_period
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self.appends = 0
+        self.bootstraps = 0
+
+    def _path(self, ticker):
+        return os.path.join(self.root, f"{ticker.upper()}.npy")
+
+    def _lock_for(self, ticker):
+        with self._locks_guard:
+            return self._locks.setdefault(ticker.upper(), threading.Lock())
+
+    def load(self, ticker):
+        """Return the stored bars for ``ticker`` (read-only memmap) or None."""
+        path = self._path(ticker)
+        if not os.path.exists(path):
+            return None
+        return np.load(path, mmap_mode="r")
+
+    def _write(self, ticker, bars):
+        os.makedirs(self.root, exist_ok=True)
+        path = self._path(ticker)
+        # A unique temp file per writer: the lock above only covers this process, not other workers
+        fd, tmp_path = tempfile.mkstemp(prefix=f"{os.path.basename(path)}.", suffix=".tmp", dir=self.root)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, bars)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def _is_fresh(self, ticker):
+        try:
+            return time.time() - os.path.getmtime(self._path(ticker)) < self.refresh_interval
+        except OSError:
+            return False
+
+    @staticmethod
+    def _to_bars(history):
+        if history is None or history.empty:
+            return np.empty(0, dtype=BAR_DTYPE)
+        index = history.index
+        if getattr(index, "tz", None) is not None:
+            index = index.tz_localize(None)
+        bars = np.empty(len(history), dtype=BAR_DTYPE)
+        bars["date"] = index.normalize().values.astype("datetime64[D]")
+        for field, column in FRAME_COLUMNS.items():
+            bars[field] = history[column].to_numpy(dtype="f8") if column in history else np.nan
+        return bars[~np.isnan(bars["close"])]
+
+    def refresh(self, ticker, force=False):
+        """Bring the stored series for ``ticker`` up to date and return it."""
+        with self._lock_for(ticker):
+            stored = self.load(ticker)
+            if stored is not None and not force and self._is_fresh(ticker):
+                return stored
+
+            if stored is None or len(stored) == 0:
+                print(f"Bootstrapping OHLCV store for {ticker} ({self.bootstrap_period})")
+                fresh = self._to_bars(self.provider.history(ticker, period=self.bootstrap_period))
+                if len(fresh) == 0:
+                    return stored
+                self._write(ticker, fresh)
+                self.bootstraps += 1
+                return self.load(ticker)
+
+            # Re-fetch from the last stored bar so a partial (intraday) bar gets replaced
+            last_date = stored["date"][-1]
+            try:
+                tail = self._to_bars(self.provider.history(ticker, start=str(last_date)))
+            except Exception as e:
+                print(f"Error refreshing OHLCV store for {ticker}, serving stored bars: {e}")
+                return stored
+            if len(tail) == 0:
+                os.utime(self._path(ticker))  # nothing new; don't ask again until the next interval
+                return stored
+            keep = stored[stored["date"] < tail["date"][0]]
+            merged = np.concatenate([keep, tail])
+            del stored  # release the memmap before replacing the file
+            self._write(ticker, merged)
+            self.appends += 1
+            print(f"Appended {len(tail)} bar(s) to OHLCV store for {ticker}")
+            return self.load(ticker)
+
+    def history(self, ticker, period="3mo"):
+        """DataFrame shaped like ``yf.Ticker.history`` for the trailing ``period`` of daily bars."""
+        import pandas as pd
+
+        bars = self.refresh(ticker)
+        if bars is None or len(bars) == 0:
+            return pd.DataFrame(columns=list(FRAME_COLUMNS.values()))
+        start = pd.Timestamp(bars["date"][-1]) - pd.DateOffset(**STORE_PERIODS[period])
+        window = bars[bars["date"] >= np.datetime64(start.date(), "D")]
+        return pd.DataFrame({column: np.array(window[field]) for field, column in FRAME_COLUMNS.items()},
+                            index=pd.DatetimeIndex(np.array(window["date"]), name="Date"))
+
+    def stats(self):
+        tickers = os.listdir(self.root) if os.path.isdir(self.root) else []
+        return {
+            "root": self.root,
+            "tickers": sum(1 for name in tickers if name.endswith(".npy")),
+            "bootstraps": self.bootstraps,
+            "appends": self.appends,
+        }
+
+
+# Shared store; set OHLCV_STORE_DIR to an empty string to disable it.
+# Local and synthetic providers are already on disk / in memory, so they skip it.
+ohlcv_store = OHLCVStore() if OHLCV_STORE_DIR and market_data_provider.remote else None
@@ -0,0 +1,188 @@
+import bisect
+import csv
+import itertools
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+
+BUNDLED_LISTINGS = os.path.join(os.path.dirname(__file__), "listings.csv")
+# Names resolved at runtime (e.g. via Alpha Vantage) are appended here and reloaded on start
+LEARNED_LISTINGS = os.getenv("SYMBOL_INDEX_LEARNED", os.path.join("data", "symbols_learned.csv"))
+FUZZY_THRESHOLD = float(os.getenv("SYMBOL_FUZZY_THRESHOLD", 0.7))
+# One changed letter moves a short name a long way less, so short keys need a closer match ("sonya" vs "sony")
+SHORT_KEY_LENGTH = int(os.getenv("SYMBOL_SHORT_KEY_LENGTH", 12))
+SHORT_FUZZY_THRESHOLD = float(os.getenv("SYMBOL_SHORT_FUZZY_THRESHOLD", 0.85))
+# A prefix must cover at least this share of the listed name: "goldman" -> "goldman sachs", not "bank" -> "bank of america"
+PREFIX_MIN_COVERAGE = float(os.getenv("SYMBOL_PREFIX_MIN_COVERAGE", 0.5))
+
+# Corporate suffixes and filler words that don't help tell companies apart
+_NOISE_WORDS = {
+    "the", "inc", "incorporated", "corp", "corporation", "co", "company", "companies",
+    "ltd", "limited", "llc", "plc", "sa", "se", "ag", "nv", "as", "holdings", "holding",
+    "group", "class", "common", "stock",
+}
+
+
+def normalize_name(name):
+    """Lower-case, drop punctuation and corporate suffixes: "The Coca-Cola Co." -> "coca cola"."""
+    name = name.lower().replace("&", " and ")
+    words = re.sub(r"[^a-z0-9]+", " ", name).split()
+    kept = [word for word in words if word not in _NOISE_WORDS]
+    return " ".join(kept or words)
+
+
+def _trigrams(key):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SymbolIndex:
+    """In-memory company name -> ticker index with exact, prefix and fuzzy lookup.
+
+    Exact matches are a dict lookup on the normalized name, prefix matches use
+    a sorted key list with bisect, and fuzzy matches score candidates from a
+    character-trigram inverted index by Dice similarity.
+    """
+
+    def __init__(self, fuzzy_threshold=FUZZY_THRESHOLD, short_fuzzy_threshold=SHORT_FUZZY_THRESHOLD):
+        self.fuzzy_threshold = fuzzy_threshold
+        self.short_fuzzy_threshold = short_fuzzy_threshold
+        self._exact = {}
+        self._sorted_keys = []
+        self._grams = {}
+        self._postings = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._exact)
+
+    def add(self, name, ticker):
+        key = normalize_name(name)
+        if not key:
+            return
+        with self._lock:
+            if key in self._exact:
+                self._exact[key] = ticker
+                return
+            self._exact[key] = ticker
+            bisect.insort(self._sorted_keys, key)
+            grams = _trigrams(key)
+            self._grams[key] = grams
+            for gram in grams:
+                self._postings[gram].add(key)
+
+    def load_csv(self, path):
+        """Load ``ticker,name,aliases`` rows (aliases separated by ``|``)."""
+        if not os.path.exists(path):
+            return 0
+        count = 0
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                ticker = (row.get("ticker") or "").strip()
+                if not ticker:
+                    continue
+                names = [row.get("name") or ""] + (row.get("aliases") or "").split("|")
+                for name in names:
+                    if name.strip():
+                        self.add(name, ticker)
+                        count += 1
+        return count
+
+    def exact(self, key):
+        return self._exact.get(key)
+
+    def prefix(self, key):
+        """Tickers of all names starting with the whole words of ``key`` (stops early once it is ambiguous).
+
+        "target" does not prefix "targeted", and a prefix covering less than
+        PREFIX_MIN_COVERAGE of a name ("bank" of "bank of america") is ignored.
+        """
+        tickers = set()
+        if len(key) < 3:
+            return tickers
+        # add() may insert concurrently (learned names), so scan under the lock
+        with self._lock:
+            start = bisect.bisect_left(self._sorted_keys, key + " ")
+            for candidate in itertools.islice(self._sorted_keys, start, None):
+                if not candidate.startswith(key + " "):
+                    break
+                if len(key) < PREFIX_MIN_COVERAGE * len(candidate):
+                    continue
+                tickers.add(self._exact[candidate])
+                if len(tickers) > 1:
+                    break
+        return tickers
+
+    def fuzzy(self, key):
+        """Best (ticker, score) by trigram Dice similarity, or (None, 0.0) below the threshold.
+
+        Keys shorter than SHORT_KEY_LENGTH must reach the stricter short-key threshold.
+        """
+        grams = _trigrams(key)
+        shared = Counter()
+        best, best_score = None, 0.0
+        # The posting sets grow under add(); iterating them unlocked can fail with "Set changed size"
+        with self._lock:
+            for gram in grams:
+                shared.update(self._postings.get(gram, ()))
+            for candidate, overlap in shared.items():
+                score = 2 * overlap / (len(grams) + len(self._grams[candidate]))
+                if score > best_score:
+                    best, best_score = candidate, score
+            ticker = self._exact.get(best)
+        threshold = self.short_fuzzy_threshold if len(key) < SHORT_KEY_LENGTH else self.fuzzy_threshold
+        if best is None or best_score < threshold:
+            return None, 0.0
+        return ticker, best_score
+
+    def resolve(self, name):
+        """Ticker for a company name via exact, then prefix, then fuzzy match.
+
+        None if unknown or only weakly matched, so the caller asks Alpha Vantage instead of guessing.
+        """
+        key = normalize_name(name)
+        if not key:
+            return None
+        ticker = self.exact(key)
+        if ticker:
+            return ticker
+        prefixed = self.prefix(key)
+        if prefixed:
+            # "general" starts several names; guessing one of them would be a wrong hit
+            return prefixed.pop() if len(prefixed) == 1 else None
+        ticker, _ = self.fuzzy(key)
+        return ticker
+
+
+class PersistentSymbolIndex(SymbolIndex):
+    """SymbolIndex backed by the bundled listing plus a learned-names file it appends to."""
+
+    def __init__(self, listings=BUNDLED_LISTINGS, learned=LEARNED_LISTINGS, **kwargs):
+        super().__init__(**kwargs)
+        self.learned = learned
+        self._write_lock = threading.Lock()
+        self.load_csv(listings)
+        if learned:
+            self.load_csv(learned)
+
+    def learn(self, name, ticker):
+        """Add ``name`` to the index and persist it so future processes know it too."""
+        if self.exact(normalize_name(name)) == ticker:
+            return
+        self.add(name, ticker)
+        if not self.learned:
+            return
+        with self._write_lock:
+            directory = os.path.dirname(self.learned)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            new_file = not os.path.exists(self.learned)
+            with open(self.learned, "a", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                if new_file:
+                    writer.writerow(["ticker", "name", "aliases"])
+                writer.writerow([ticker, name, ""])
+
+
+symbol_index = PersistentSymbolIndex()
@@ -0,0 +1,272 @@
+import os
+import queue
+import smtplib as smt
+import threading
+import time
+import traceback
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+from dotenv import load_dotenv
+
+from metrics import upstream_latency, upstream_requests
+
+load_dotenv()
+
+EMAIL_ADDRESS = os.getenv("EMAIL_ADDRESS")
+EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD")
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", 587))
+# Set SMTP_USE_TLS=0 to talk to a plain local stand-in such as aiosmtpd
+SMTP_USE_TLS = os.getenv("SMTP_USE_TLS", "1") not in ("0", "false", "False")
+# Set SMTP_AUTH=0 for relays that accept mail without a login (local MTA, aiosmtpd); EMAIL_PASSWORD is then unused
+SMTP_AUTH = os.getenv("SMTP_AUTH", "1") not in ("0", "false", "False")
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", 2))
+SMTP_MAX_IDLE = float(os.getenv("SMTP_MAX_IDLE", 60))  # seconds before a pooled connection is recycled
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", 10))
+NOTIFY_BATCH_SIZE = int(os.getenv("NOTIFY_BATCH_SIZE", 20))
+NOTIFY_MAX_RETRIES = int(os.getenv("NOTIFY_MAX_RETRIES", 4))
+NOTIFY_BACKOFF = float(os.getenv("NOTIFY_BACKOFF", 2))  # seconds, doubled per retry
+
+
+class SMTPConnectionPool:
+    """Keeps up to ``size`` SMTP connections (logged in when ``auth``) for reuse.
+
+    A connection that has been idle longer than ``max_idle`` (servers drop
+    them) or fails a NOOP check is replaced with a fresh one.
+    """
+
+    def __init__(self, host=SMTP_HOST, port=SMTP_PORT, username=EMAIL_ADDRESS, password=EMAIL_PASSWORD,
+                 use_tls=SMTP_USE_TLS, auth=SMTP_AUTH, size=SMTP_POOL_SIZE, max_idle=SMTP_MAX_IDLE,
+                 timeout=SMTP_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.auth = auth
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self._idle = queue.LifoQueue(maxsize=size)
+        self.opened = 0
+
+    def _connect(self):
+        conn = smt.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.use_tls:
+                conn.starttls()
+            if self.auth:
+                if not (self.username and self.password):
+                    raise smt.SMTPException("SMTP_AUTH is on but EMAIL_ADDRESS/EMAIL_PASSWORD are not set")
+                conn.login(self.username, self.password)
+        except Exception:
+            self._close(conn)
+            raise
+        self.opened += 1
+        print(f"Opened SMTP connection to {self.host}:{self.port}")
+        return conn
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.quit()
+        except Exception:
+            conn.close()
+
+    def acquire(self):
+        while True:
+            try:
+                conn, released_at = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+            if time.monotonic() - released_at > self.max_idle:
+                self._close(conn)
+                continue
+            try:
+                if conn.noop()[0] == 250:
+                    return conn
+            except (smt.SMTPException, OSError):
+                pass
+            self._close(conn)
+
+    def release(self, conn, broken=False):
+        if broken:
+            self._close(conn)
+            return
+        try:
+            self._idle.put_nowait((conn, time.monotonic()))
+        except queue.Full:
+            self._close(conn)
+
+    def close_all(self):
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._close(conn)
+
+
+class NotificationDispatcher:
+    """Background email sender: callers enqueue and return immediately.
+
+    Each worker drains up to ``batch_size`` queued messages and sends them
+    over one pooled connection. Failed messages are re-queued after an
+    exponential backoff, up to ``max_retries`` attempts.
+    """
+
+    def __init__(self, pool=None, workers=None, batch_size=NOTIFY_BATCH_SIZE,
+                 max_retries=NOTIFY_MAX_RETRIES, backoff=NOTIFY_BACKOFF):
+        self.pool = pool or SMTPConnectionPool()
+        self.workers = workers or SMTP_POOL_SIZE
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._queue = queue.Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._idle = threading.Condition(self._lock)
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f"notifier-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def send(self, msg, sender, recipients):
+        """Queue ``msg`` (an email.message object) for delivery."""
+        if isinstance(recipients, str):
+            recipients = [recipients]
+        self.start()
+        with self._lock:
+            self._pending += 1
+        self._queue.put({"msg": msg, "sender": sender, "recipients": recipients, "attempt": 0})
+
+    def join(self, timeout=None):
+        """Block until every queued message is sent or has given up (for tests and shutdown)."""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending == 0, timeout)
+
+    def _done(self, sent):
+        with self._idle:
+            self._pending -= 1
+            if sent:
+                self.sent += 1
+            else:
+                self.failed += 1
+            self._idle.notify_all()
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                conn = self.pool.acquire()
+            except Exception as e:
+                print(f"Could not open SMTP connection: {e}")
+                upstream_requests.inc(upstream="smtp", outcome="error")
+                for item in batch:
+                    self._retry(item)
+                continue
+
+            broken = False
+            for item in batch:
+                if broken:
+                    self._retry(item)
+                    continue
+                started = time.perf_counter()
+                try:
+                    conn.sendmail(item["sender"], item["recipients"], item["msg"].as_string())
+                    upstream_requests.inc(upstream="smtp", outcome="ok")
+                    upstream_latency.observe(time.perf_counter() - started, upstream="smtp")
+                    self._done(sent=True)
+                except smt.SMTPRecipientsRefused as e:
+                    print(f"Recipient refused, dropping email to {item['recipients']}: {e}")
+                    upstream_requests.inc(upstream="smtp", outcome="ok")
+                    self._done(sent=False)
+                except Exception as e:
+                    print(f"Error sending email to {item['recipients']}: {e}")
+                    upstream_requests.inc(upstream="smtp", outcome="error")
+                    broken = isinstance(e, (smt.SMTPServerDisconnected, OSError))
+                    self._retry(item)
+            self.pool.release(conn, broken=broken)
+
+    def _retry(self, item):
+        item["attempt"] += 1
+        if item["attempt"] > self.max_retries:
+            print(f"Giving up on email to {item['recipients']} after {self.max_retries} retries")
+            self._done(sent=False)
+            return
+        delay = self.backoff * 2 ** (item["attempt"] - 1)
+        self.retried += 1
+        timer = threading.Timer(delay, self._queue.put, args=[item])
+        timer.daemon = True
+        timer.start()
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize(),
+            "pending": self._pending,
+            "sent": self.sent,
+            "failed": self.failed,
+            "retried": self.retried,
+            "connections_opened": self.pool.opened,
+        }
+
+
+def build_html_email(to_address, subject, html):
+    msg = MIMEMultipart()
+    msg['From'] = EMAIL_ADDRESS
+    msg['To'] = to_address
+    msg['Subject'] = subject
+    msg['Reply-To'] = EMAIL_ADDRESS
+    msg['X-Mailer'] = 'Python-Mail'
+    msg.attach(MIMEText(html, 'html'))
+    return msg
+
+
+dispatcher = NotificationDispatcher()
+
+
+def send_email(to_address, subject, html):
+    """Queue an HTML email from EMAIL_ADDRESS; delivery happens on a background thread."""
+    try:
+        dispatcher.send(build_html_email(to_address, subject, html), EMAIL_ADDRESS, to_address)
+    except Exception as e:
+        print(f"Error queueing email to {to_address}: {e}")
+        traceback.print_exc()
+        raise
+
+
+def send_alert_notification(alert):
+    """Email the owner of a triggered price/RSI alert."""
+    if not alert.get("email"):
+        return
+    if alert["type"] == "price":
+        detail = f"price {alert.get('price')} is {alert.get('direction')} your target of {alert.get('target')}"
+    else:
+        detail = f"RSI {alert.get('rsi')} crossed {alert.get('direction')} your threshold of {alert.get('threshold')}"
+    html = f"""
+    <html>
+    <body style="font-family: Arial, sans-serif;">
+        <h3>StockMind alert for {alert['ticker']}</h3>
+        <p>{alert['ticker']} {detail}.</p>
+    </body>
+    </html>
+    """
+    send_email(alert["email"], f"StockMind alert: {alert['ticker']}", html)
@@ -0,0 +1,152 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+CACHE_DB_PATH = os.getenv("CACHE_DB_PATH", os.path.join("data", "cache.sqlite3"))
+# Entries each cache keeps in memory; the least recently used are evicted (they stay in SQLite)
+CACHE_MEMORY_MAX_ENTRIES = int(os.getenv("CACHE_MEMORY_MAX_ENTRIES", 2048))
+
+# Stored in place of a value to remember that a lookup found nothing
+_MISS = {"__miss__": True}
+
+# Every live cache, so a scheduled job can purge them all
+_caches = weakref.WeakSet()
+
+
+class PersistentTTLCache:
+    """Two-level (memory + SQLite) cache of JSON-serialisable values with TTL.
+
+    Each instance uses its own ``namespace`` within a shared database file.
+    ``put(key, None)`` records a negative result that expires after
+    ``negative_ttl`` instead of ``ttl``, so known misses skip the upstream too.
+    The memory tier holds at most ``max_entries`` (least recently used first
+    out). With ``memory=False`` every lookup reads SQLite, for callers that
+    keep their own bounded in-memory tier.
+    """
+
+    def __init__(self, namespace, ttl, negative_ttl=None, path=CACHE_DB_PATH, memory=True,
+                 max_entries=CACHE_MEMORY_MAX_ENTRIES):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.negative_ttl = ttl if negative_ttl is None else negative_ttl
+        self.path = path
+        self.memory = memory
+        self.max_entries = max_entries
+        self._memory = OrderedDict()  # key -> (expires_at, value), least recently used first
+        self._lock = threading.Lock()
+        self._conn = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        _caches.add(self)
+
+    def _db(self):
+        # Caller must hold self._lock
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=5)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_entries ("
+                " namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, expires_at REAL NOT NULL,"
+                " PRIMARY KEY (namespace, key))"
+            )
+        return self._conn
+
+    def _remember(self, key, entry):
+        # Caller must hold self._lock
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key):
+        """Return ``(found, value)``; a cached negative result is ``(True, None)``."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                row = self._db().execute(
+                    "SELECT value, expires_at FROM cache_entries WHERE namespace = ? AND key = ?",
+                    (self.namespace, key),
+                ).fetchone()
+                if row is not None:
+                    entry = (row[1], json.loads(row[0]))
+                    if self.memory and entry[0] > now:
+                        self._remember(key, entry)
+            else:
+                self._memory.move_to_end(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    self._memory.pop(key, None)
+                self.misses += 1
+                return False, None
+            self.hits += 1
+            value = entry[1]
+            return True, (None if value == _MISS else value)
+
+    def put(self, key, value, ttl=None):
+        """Store ``value``; ``ttl`` overrides the instance default for this entry."""
+        if ttl is None:
+            ttl = self.negative_ttl if value is None else self.ttl
+        stored = _MISS if value is None else value
+        expires_at = time.time() + ttl
+        with self._lock:
+            if self.memory:
+                self._remember(key, (expires_at, stored))
+            self._db().execute(
+                "INSERT OR REPLACE INTO cache_entries (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                (self.namespace, key, json.dumps(stored), expires_at),
+            )
+            self._db().commit()
+
+    def delete(self, prefix=""):
+        """Drop every entry whose key starts with ``prefix`` (all of them by default)."""
+        with self._lock:
+            self._memory = OrderedDict((k, v) for k, v in self._memory.items() if not k.startswith(prefix))
+            self._db().execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND substr(key, 1, ?) = ?",
+                (self.namespace, len(prefix), prefix),
+            )
+            self._db().commit()
+
+    def purge_expired(self):
+        """Drop expired entries from memory and SQLite; returns the number of SQLite rows removed."""
+        with self._lock:
+            now = time.time()
+            self._memory = OrderedDict((k, v) for k, v in self._memory.items() if v[0] > now)
+            removed = self._db().execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND expires_at <= ?", (self.namespace, now)
+            ).rowcount
+            self._db().commit()
+            return removed
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "namespace": self.namespace,
+                "memory_entries": len(self._memory),
+                "evictions": self.evictions,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+def purge_all_expired():
+    """Run ``purge_expired`` on every live cache; returns SQLite rows removed per namespace."""
+    removed = {}
+    for cache in list(_caches):
+        try:
+            removed[cache.namespace] = removed.get(cache.namespace, 0) + cache.purge_expired()
+        except sqlite3.Error as e:
+            print(f"Error purging cache {cache.namespace}: {e}")
+    return removed
@@ -0,0 +1,266 @@
+import contextlib
+import contextvars
+import heapq
+import itertools
+import os
+import sqlite3
+import threading
+import time
+
+from metrics import upstream_requests
+
+# Lower value = served first when callers are queued for a token
+INTERACTIVE = 0
+BATCH = 1
+BACKGROUND = 2
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BATCH: "batch", BACKGROUND: "background"}
+
+# How long a caller may queue for a token before giving up, by priority (seconds)
+RATE_LIMIT_WAIT = {
+    INTERACTIVE: float(os.getenv("RATE_LIMIT_WAIT_INTERACTIVE", 2)),
+    BATCH: float(os.getenv("RATE_LIMIT_WAIT_BATCH", 15)),
+    BACKGROUND: float(os.getenv("RATE_LIMIT_WAIT_BACKGROUND", 60)),
+}
+
+# Token balances live in this SQLite file so every worker process on the host shares one quota;
+# set it to an empty string to keep them per process
+RATE_LIMIT_DB_PATH = os.getenv("RATE_LIMIT_DB_PATH", os.path.join("data", "rate_limits.sqlite3"))
+
+_priority = contextvars.ContextVar("upstream_priority", default=INTERACTIVE)
+# time.monotonic() by which the current caller must be done; token waits never run past it
+_deadline = contextvars.ContextVar("upstream_deadline", default=None)
+
+
+class RateLimited(Exception):
+    """No token became available within the caller's wait budget."""
+
+
+@contextlib.contextmanager
+def upstream_priority(priority):
+    """Run the block's upstream calls at ``priority`` (e.g. BACKGROUND for scheduled jobs)."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+@contextlib.contextmanager
+def upstream_deadline(seconds):
+    """Cap token waits in the block (and in work submitted with its context) at ``seconds`` from now."""
+    expires = time.monotonic() + seconds
+    outer = _deadline.get()
+    token = _deadline.set(expires if outer is None else min(outer, expires))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def current_priority():
+    return _priority.get()
+
+
+def run_at_priority(priority, func, *args, **kwargs):
+    with upstream_priority(priority):
+        return func(*args, **kwargs)
+
+
+def submit_in_context(executor, func, *args, **kwargs):
+    """``executor.submit`` that carries the caller's upstream priority into the worker thread."""
+    return executor.submit(contextvars.copy_context().run, func, *args, **kwargs)
+
+
+class LocalTokens:
+    """Token balances for this process only."""
+
+    def __init__(self):
+        self._buckets = {}  # name -> [tokens, updated_at]
+        self._lock = threading.Lock()
+
+    def _refilled(self, name, rate, capacity, now):
+        # Caller must hold self._lock
+        bucket = self._buckets.setdefault(name, [float(capacity), now])
+        bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+        bucket[1] = now
+        return bucket
+
+    def take(self, name, rate, capacity):
+        """Refill, then take one token if there is one; returns (granted, balance after)."""
+        with self._lock:
+            bucket = self._refilled(name, rate, capacity, time.monotonic())
+            if bucket[0] < 1:
+                return False, bucket[0]
+            bucket[0] -= 1
+            return True, bucket[0]
+
+    def balance(self, name, rate, capacity):
+        with self._lock:
+            return self._refilled(name, rate, capacity, time.monotonic())[0]
+
+    def drain(self, name):
+        with self._lock:
+            self._buckets[name] = [0.0, time.monotonic()]
+
+
+class SharedTokens:
+    """Token balances in a SQLite file, updated in one write transaction per call.
+
+    Every process pointing at the same file draws from the same buckets, so N
+    gunicorn workers together stay within the upstream's quota.
+    """
+
+    def __init__(self, path=RATE_LIMIT_DB_PATH):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _db(self):
+        # Caller must hold self._lock
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=5, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS token_buckets ("
+                               " name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)")
+        return self._conn
+
+    def _update(self, name, rate, capacity, take):
+        with self._lock:
+            conn = self._db()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()  # wall clock: monotonic time is not comparable across processes
+                row = conn.execute("SELECT tokens, updated_at FROM token_buckets WHERE name = ?", (name,)).fetchone()
+                tokens = float(capacity) if row is None else min(capacity, row[0] + max(0.0, now - row[1]) * rate)
+                granted = take and tokens >= 1
+                tokens -= granted
+                conn.execute("INSERT OR REPLACE INTO token_buckets (name, tokens, updated_at) VALUES (?, ?, ?)",
+                             (name, tokens, now))
+                conn.execute("COMMIT")
+            except Exception:
+                # A failed COMMIT may already have rolled back; don't hide the original error
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+        return granted, tokens
+
+    def take(self, name, rate, capacity):
+        """Refill, then take one token if there is one; returns (granted, balance after)."""
+        return self._update(name, rate, capacity, take=True)
+
+    def balance(self, name, rate, capacity):
+        return self._update(name, rate, capacity, take=False)[1]
+
+    def drain(self, name):
+        with self._lock:
+            self._db().execute("INSERT OR REPLACE INTO token_buckets (name, tokens, updated_at) VALUES (?, 0, ?)",
+                               (name, time.time()))
+
+
+class TokenBucket:
+    """Token bucket shared by all callers of one upstream, with a priority queue for waiters.
+
+    Tokens refill at ``rate`` per second up to ``capacity``. Queued callers are
+    served strictly by (priority, arrival), so interactive requests overtake
+    queued background work. The balance itself lives in ``tokens`` (a
+    LocalTokens or SharedTokens); the wait queue is per process.
+    """
+
+    def __init__(self, name, rate, capacity, tokens=None):
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = tokens or LocalTokens()
+        self._waiters = []  # heap of (priority, sequence)
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+        self.granted = {name: 0 for name in PRIORITY_NAMES.values()}
+        self.rejected = {name: 0 for name in PRIORITY_NAMES.values()}
+        self.wait_total = 0.0
+        self.throttled = 0
+
+    def acquire(self, priority=None, timeout=None):
+        """Take one token, queueing up to ``timeout`` seconds (default by priority); False if none came.
+
+        The wait never runs past an enclosing ``upstream_deadline``. Errors
+        from ``tokens`` (e.g. a locked SQLite file) are raised after leaving
+        the queue, so they never block the callers behind this one.
+        """
+        priority = current_priority() if priority is None else priority
+        timeout = RATE_LIMIT_WAIT[priority] if timeout is None else timeout
+        expires = _deadline.get()
+        if expires is not None:
+            timeout = min(timeout, max(0.0, expires - time.monotonic()))
+        started = time.monotonic()
+        deadline = started + timeout
+        with self._cond:
+            ticket = (priority, next(self._sequence))
+            heapq.heappush(self._waiters, ticket)
+            while True:
+                now = time.monotonic()
+                balance = 0.0
+                if self._waiters[0] == ticket:
+                    try:
+                        granted, balance = self.tokens.take(self.name, self.rate, self.capacity)
+                    except Exception:
+                        heapq.heappop(self._waiters)
+                        self._cond.notify_all()
+                        raise
+                    if granted:
+                        heapq.heappop(self._waiters)
+                        self.granted[PRIORITY_NAMES[priority]] += 1
+                        self.wait_total += now - started
+                        self._cond.notify_all()
+                        return True
+                if now >= deadline:
+                    self._waiters.remove(ticket)
+                    heapq.heapify(self._waiters)
+                    self.rejected[PRIORITY_NAMES[priority]] += 1
+                    self._cond.notify_all()
+                    upstream_requests.inc(upstream=self.name, outcome="rate_limited")
+                    return False
+                next_token = max(0.0, (1 - balance) / self.rate)
+                self._cond.wait(min(deadline - now, next_token or deadline - now))
+
+    def penalize(self):
+        """Drop all tokens, e.g. after the upstream answered with a throttling notice."""
+        self.tokens.drain(self.name)
+        with self._cond:
+            self.throttled += 1
+
+    def stats(self):
+        balance = self.tokens.balance(self.name, self.rate, self.capacity)
+        with self._cond:
+            granted = sum(self.granted.values())
+            return {
+                "rate_per_second": self.rate,
+                "capacity": self.capacity,
+                "tokens": round(balance, 2),
+                "queued": len(self._waiters),
+                "granted": dict(self.granted),
+                "rejected": dict(self.rejected),
+                "throttled_responses": self.throttled,
+                "avg_wait": round(self.wait_total / granted, 4) if granted else 0.0,
+            }
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+_shared_tokens = SharedTokens() if RATE_LIMIT_DB_PATH else None
+
+
+def rate_limiter(name, rate, capacity):
+    """The process-wide TokenBucket for upstream ``name``, created on first use."""
+    with _limiters_lock:
+        if name not in _limiters:
+            _limiters[name] = TokenBucket(name, rate, capacity, tokens=_shared_tokens)
+        return _limiters[name]
+
+
+def limiter_stats():
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return {limiter.name: limiter.stats() for limiter in limiters}
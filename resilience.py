@@ -0,0 +1,254 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+
+import numpy as np
+
+from metrics import upstream_latency, upstream_requests
+
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", 5))  # consecutive failures before opening
+CIRCUIT_RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", 30))  # seconds open before a trial call
+# Adaptive timeout = multiplier x this percentile of recent successful latencies, clamped to [min, max]
+ADAPTIVE_TIMEOUT_PERCENTILE = float(os.getenv("ADAPTIVE_TIMEOUT_PERCENTILE", 95))
+ADAPTIVE_TIMEOUT_MULTIPLIER = float(os.getenv("ADAPTIVE_TIMEOUT_MULTIPLIER", 2))
+LATENCY_WINDOW = int(os.getenv("LATENCY_WINDOW", 200))
+# Below this many samples the provider's default timeout is used
+ADAPTIVE_TIMEOUT_MIN_SAMPLES = int(os.getenv("ADAPTIVE_TIMEOUT_MIN_SAMPLES", 20))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """The provider's circuit is open; callers should fall back without waiting."""
+
+
+class UpstreamTimeout(Exception):
+    """The provider did not answer within its adaptive timeout."""
+
+
+class UpstreamBusy(Exception):
+    """Every worker of the breaker's pool stayed busy; the call never reached the provider."""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a latency-percentile timeout for one upstream.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and calls
+    fail fast with CircuitOpenError. After ``reset_timeout`` seconds a single
+    trial call is let through (half-open); its outcome closes or re-opens it.
+    """
+
+    def __init__(self, name, default_timeout, min_timeout, max_timeout, failure_threshold=CIRCUIT_FAILURE_THRESHOLD,
+                 reset_timeout=CIRCUIT_RESET_TIMEOUT, max_concurrency=8):
+        self.name = name
+        self.default_timeout = default_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_concurrency = max_concurrency
+        self._executor = None
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.consecutive_failures = 0
+        self._probing = False
+        self.calls = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self.busy = 0
+        self.trips = 0
+
+    def timeout(self):
+        """Seconds to wait for the next call, from recent successful latencies."""
+        with self._lock:
+            if len(self._latencies) < ADAPTIVE_TIMEOUT_MIN_SAMPLES:
+                return self.default_timeout
+            observed = np.percentile(self._latencies, ADAPTIVE_TIMEOUT_PERCENTILE)
+        return float(min(self.max_timeout, max(self.min_timeout, observed * ADAPTIVE_TIMEOUT_MULTIPLIER)))
+
+    def is_open(self):
+        """True while calls would be rejected; unlike ``allow`` this changes nothing.
+
+        An open circuit whose ``reset_timeout`` has passed counts as closed here,
+        so callers go on to ``call``, whose ``allow`` lets the trial call through.
+        """
+        with self._lock:
+            if self.state == OPEN:
+                return time.monotonic() - self.opened_at < self.reset_timeout
+            return self.state == HALF_OPEN and self._probing
+
+    def check(self):
+        """Raise CircuitOpenError (counted as rejected) while ``is_open``.
+
+        For callers that spend something before ``call``, such as a rate-limit token.
+        """
+        if self.is_open():
+            with self._lock:
+                self.rejected += 1
+            upstream_requests.inc(upstream=self.name, outcome="circuit_open")
+            raise CircuitOpenError(f"{self.name} circuit is open")
+
+    def allow(self):
+        """Whether a call may go to the upstream now; callers that get True must record the outcome."""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            self.rejected += 1
+        upstream_requests.inc(upstream=self.name, outcome="circuit_open")
+        return False
+
+    def record_success(self, latency):
+        upstream_requests.inc(upstream=self.name, outcome="ok")
+        upstream_latency.observe(latency, upstream=self.name)
+        with self._lock:
+            self.calls += 1
+            self._latencies.append(latency)
+            self.consecutive_failures = 0
+            self._probing = False
+            if self.state != CLOSED:
+                print(f"Circuit for {self.name} closed")
+            self.state = CLOSED
+
+    def _release_probe(self):
+        """Forget a half-open trial call that never reached the provider, so the next caller can make it."""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self, timed_out=False):
+        upstream_requests.inc(upstream=self.name, outcome="timeout" if timed_out else "error")
+        with self._lock:
+            self.calls += 1
+            self.failures += 1
+            self.timeouts += timed_out
+            self.consecutive_failures += 1
+            self._probing = False
+            if self.state == HALF_OPEN or (self.state == CLOSED
+                                           and self.consecutive_failures >= self.failure_threshold):
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self.trips += 1
+                print(f"Circuit for {self.name} opened after {self.consecutive_failures} consecutive failures")
+
+    def call(self, func, *args, ignore=(), **kwargs):
+        """Run ``func`` under the breaker and the adaptive timeout.
+
+        Exceptions listed in ``ignore`` are answers from a healthy upstream (e.g.
+        "page not found") and are re-raised without counting as failures. The
+        call runs on the breaker's own pool so libraries without a timeout
+        option can't hold the caller past the deadline.
+
+        The timeout starts when a worker picks the call up. A call still queued
+        after ``timeout`` seconds is withdrawn with UpstreamBusy and does not
+        count as a provider failure, since the congestion is local.
+        """
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency,
+                                                        thread_name_prefix=f"upstream-{self.name}")
+        timeout = self.timeout()
+        started = []
+        running = threading.Event()
+
+        def run():
+            started.append(time.monotonic())
+            running.set()
+            return func(*args, **kwargs)
+
+        future = self._executor.submit(run)
+        if not running.wait(timeout):
+            if future.cancel():
+                self._release_probe()
+                with self._lock:
+                    self.busy += 1
+                upstream_requests.inc(upstream=self.name, outcome="busy")
+                raise UpstreamBusy(f"no free {self.name} worker within {timeout:.2f}s")
+            running.wait()  # picked up just as the wait ran out
+        try:
+            result = future.result(timeout=max(0.0, started[0] + timeout - time.monotonic()))
+        except FuturesTimeoutError:
+            self.record_failure(timed_out=True)
+            raise UpstreamTimeout(f"{self.name} did not answer within {timeout:.2f}s")
+        except ignore:
+            self.record_success(time.monotonic() - started[0])
+            raise
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success(time.monotonic() - started[0])
+        return result
+
+    async def call_async(self, func, *args, ignore=(), **kwargs):
+        """``call`` for coroutine functions: awaits ``func(*args, **kwargs)`` on the running loop."""
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        timeout = self.timeout()
+        started = time.monotonic()
+        try:
+            result = await asyncio.wait_for(func(*args, **kwargs), timeout)
+        except asyncio.TimeoutError:
+            self.record_failure(timed_out=True)
+            raise UpstreamTimeout(f"{self.name} did not answer within {timeout:.2f}s")
+        except asyncio.CancelledError:
+            # The caller gave up (e.g. a deadline); says nothing about the upstream, but frees a half-open probe
+            self._release_probe()
+            raise
+        except ignore:
+            self.record_success(time.monotonic() - started)
+            raise
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success(time.monotonic() - started)
+        return result
+
+    def stats(self):
+        timeout = self.timeout()
+        with self._lock:
+            latencies = np.array(self._latencies) if self._latencies else None
+            return {
+                "state": self.state,
+                "trips": self.trips,
+                "calls": self.calls,
+                "failures": self.failures,
+                "timeouts": self.timeouts,
+                "rejected": self.rejected,
+                "busy": self.busy,
+                "consecutive_failures": self.consecutive_failures,
+                "timeout": round(timeout, 3),
+                "latency_p50": round(float(np.percentile(latencies, 50)), 4) if latencies is not None else None,
+                "latency_p95": round(float(np.percentile(latencies, 95)), 4) if latencies is not None else None,
+            }
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def circuit_breaker(name, **kwargs):
+    """The process-wide breaker for upstream ``name``, created with ``kwargs`` on first use."""
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name, **kwargs)
+        return _breakers[name]
+
+
+def breaker_stats():
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.stats() for breaker in breakers}
@@ -0,0 +1,189 @@
+import datetime
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from zoneinfo import ZoneInfo
+
+from market_data.symbols import normalize_name
+from persistent_cache import PersistentTTLCache
+
+# While the market is open prices move, so responses are only reused briefly
+RESPONSE_CACHE_OPEN_TTL = float(os.getenv("RESPONSE_CACHE_OPEN_TTL", 300))
+# Outside trading hours a response stays valid until the next open, up to this cap
+RESPONSE_CACHE_CLOSED_TTL = float(os.getenv("RESPONSE_CACHE_CLOSED_TTL", 12 * 3600))
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", 256))
+# Responses built from fallback data are kept only briefly, so real prices replace them once upstreams recover
+RESPONSE_CACHE_DEGRADED_TTL = float(os.getenv("RESPONSE_CACHE_DEGRADED_TTL", 60))
+# Second tier in the SQLite cache file, so workers behind one load balancer serve the same bodies and ETags
+RESPONSE_CACHE_SHARED = os.getenv("RESPONSE_CACHE_SHARED", "1") == "1"
+
+MARKET_TZ = ZoneInfo(os.getenv("MARKET_TIMEZONE", "America/New_York"))
+MARKET_OPEN = datetime.time(9, 30)
+MARKET_CLOSE = datetime.time(16, 0)
+
+
+def _next_open(now):
+    day = now.date()
+    if now.time() >= MARKET_OPEN:
+        day += datetime.timedelta(days=1)
+    while day.weekday() >= 5:
+        day += datetime.timedelta(days=1)
+    return datetime.datetime.combine(day, MARKET_OPEN, tzinfo=MARKET_TZ)
+
+
+def market_aligned_ttl(now=None, open_ttl=RESPONSE_CACHE_OPEN_TTL, closed_ttl=RESPONSE_CACHE_CLOSED_TTL):
+    """Seconds a response built at ``now`` stays fresh (exchange holidays are treated as trading days).
+
+    During the session this is ``open_ttl``, cut short at the close so the closing
+    prices are picked up; otherwise it lasts until the next open, capped at ``closed_ttl``.
+    """
+    now = (now or datetime.datetime.now(MARKET_TZ)).astimezone(MARKET_TZ)
+    if now.weekday() < 5 and MARKET_OPEN <= now.time() < MARKET_CLOSE:
+        close = datetime.datetime.combine(now.date(), MARKET_CLOSE, tzinfo=MARKET_TZ)
+        return max(1.0, min(open_ttl, (close - now).total_seconds()))
+    return max(1.0, min(closed_ttl, (_next_open(now) - now).total_seconds()))
+
+
+class CachedResponse:
+    def __init__(self, body, etag, expires_at):
+        self.body = body
+        self.etag = etag
+        self.expires_at = expires_at
+        self._encoded = {}  # content coding -> compressed body, built on first use
+
+    def encoded(self, encoding, compress):
+        """The body compressed with ``compress(body, encoding)``, computed once per entry."""
+        if encoding not in self._encoded:
+            self._encoded[encoding] = compress(self.body, encoding)
+        return self._encoded[encoding]
+
+    def max_age(self):
+        return max(0, int(self.expires_at - time.time()))
+
+
+class ResponseCache:
+    """LRU cache of finished JSON response bodies keyed by normalized company name and variant.
+
+    Each entry carries a strong ETag (hash of the body) so clients holding the
+    same body can be answered with 304 Not Modified instead of the payload.
+    Memory misses fall through to ``shared`` (a PersistentTTLCache), if any.
+    """
+
+    def __init__(self, max_entries=RESPONSE_CACHE_SIZE, ttl=market_aligned_ttl, shared=None,
+                 degraded_ttl=RESPONSE_CACHE_DEGRADED_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.degraded_ttl = degraded_ttl
+        self.shared = shared
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.bytes_served = 0
+        self.bytes_saved = 0
+
+    @staticmethod
+    def key(company_name, variant):
+        return normalize_name(company_name), variant
+
+    @staticmethod
+    def shared_key(key):
+        return f"{key[0]}|{key[1]}"
+
+    def _remember(self, key, entry):
+        # Caller must hold self._lock
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _load_shared(self, key):
+        if self.shared is None:
+            return None
+        try:
+            found, value = self.shared.get(self.shared_key(key))
+        except Exception as e:
+            print(f"Error reading shared response cache: {e}")
+            return None
+        if not found or value is None or value["expires_at"] <= time.time():
+            return None
+        return CachedResponse(value["body"].encode("utf-8"), value["etag"], value["expires_at"])
+
+    def get(self, company_name, variant="json"):
+        """The fresh CachedResponse for ``company_name`` in wire format ``variant``, or None."""
+        key = self.key(company_name, variant)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= time.time():
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+        entry = self._load_shared(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self._remember(key, entry)
+            self.hits += 1
+            return entry
+
+    def put(self, company_name, body, variant="json", degraded=False):
+        """Cache ``body``; a ``degraded`` one (built from fallback data) expires after at most ``degraded_ttl``."""
+        etag = hashlib.sha256(body).hexdigest()[:32]
+        ttl = min(self.ttl(), self.degraded_ttl) if degraded else self.ttl()
+        entry = CachedResponse(body, etag, time.time() + ttl)
+        key = self.key(company_name, variant)
+        with self._lock:
+            self._remember(key, entry)
+        if self.shared is not None:
+            try:
+                self.shared.put(self.shared_key(key), {"body": body.decode("utf-8"), "etag": etag,
+                                                       "expires_at": entry.expires_at}, ttl=ttl)
+            except Exception as e:
+                print(f"Error writing shared response cache: {e}")
+        return entry
+
+    def record(self, entry, not_modified, sent_bytes):
+        """Count the bytes sent for ``entry`` and those saved by a 304 or by compression."""
+        with self._lock:
+            if not_modified:
+                self.not_modified += 1
+                self.bytes_saved += len(entry.body)
+            else:
+                self.bytes_served += sent_bytes
+                self.bytes_saved += len(entry.body) - sent_bytes
+
+    def invalidate(self, company_name=None):
+        name_key = None if company_name is None else normalize_name(company_name)
+        with self._lock:
+            if name_key is None:
+                self._entries.clear()
+            for key in [key for key in self._entries if key[0] == name_key]:
+                del self._entries[key]
+        if self.shared is not None:
+            self.shared.delete("" if name_key is None else f"{name_key}|")
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "not_modified": self.not_modified,
+                "bytes_served": self.bytes_served,
+                "bytes_saved": self.bytes_saved,
+                "ttl_now": round(self.ttl(), 1),
+            }
+
+
+response_cache = ResponseCache(
+    shared=PersistentTTLCache("analyze_responses", ttl=RESPONSE_CACHE_CLOSED_TTL, memory=False)
+    if RESPONSE_CACHE_SHARED else None)
@@ -0,0 +1,15 @@
+# Runs only the background jobs (alert checks, competitor-graph warm-up), without serving HTTP.
+# Start web workers with RUN_SCHEDULER=0 and run this once (or more, for failover:
+# the scheduler lease lets only one of them run the jobs at a time).
+import time
+
+from BACK import create_app
+
+if __name__ == "__main__":
+    create_app(run_scheduler=True)
+    print("Scheduler worker running; press Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
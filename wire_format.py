@@ -0,0 +1,112 @@
+import base64
+import gzip
+import os
+
+import numpy as np
+
+try:
+    import brotli
+except ImportError:  # optional: gzip is used when brotli isn't installed
+    brotli = None
+
+COMPACT_FORMAT = "compact-v1"
+# Responses smaller than this are sent uncompressed; the headers would eat the gain
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", 1024))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", 6))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", 5))
+
+
+def encode_axis(labels):
+    """Sorted ``YYYY-MM-DD`` labels as a start date plus step counts between consecutive dates.
+
+    Steps count trading (business) days, so a normal week is all 1s; if any
+    label falls on a weekend the steps count calendar days instead.
+    """
+    if not labels:
+        return {"start": None, "unit": "B", "steps": []}
+    days = np.array(labels, dtype="datetime64[D]")
+    if np.is_busday(days).all():
+        unit = "B"
+        steps = np.diff(np.busday_count(days[0], days))
+    else:
+        unit = "D"
+        steps = np.diff(days).astype(np.int64)
+    return {"start": labels[0], "unit": unit, "steps": steps.tolist()}
+
+
+def encode_series(prices, labels, axis_index, price_encoding="delta"):
+    """Encode one price series against the shared axis (``axis_index`` maps label -> position).
+
+    "delta": prices in integer cents, first value absolute then differences, with
+    null where the series has no point on the axis. "f32": base64 little-endian
+    float32 array with NaN for gaps.
+    """
+    positions = [axis_index[label] for label in labels]
+    offset = positions[0] if positions else 0
+    length = positions[-1] - offset + 1 if positions else 0
+    if price_encoding == "f32":
+        values = np.full(length, np.nan, dtype="<f4")
+        values[np.array(positions, dtype=np.int64) - offset] = prices
+        return {"offset": offset, "encoding": "f32", "data": base64.b64encode(values.tobytes()).decode("ascii")}
+
+    data = [None] * length
+    previous = 0
+    for position, price in zip(positions, prices):
+        cents = int(round(price * 100))
+        data[position - offset] = cents - previous
+        previous = cents
+    return {"offset": offset, "encoding": "delta-cents", "data": data}
+
+
+def encode_analysis(payload, price_encoding="delta"):
+    """Compact form of an /analyze_company payload: every series shares one date axis.
+
+    Top competitors lose their own ``time_labels``; ``templates/FRONT.html``
+    (decodeCompactPayload) rebuilds the plain form on the client.
+    """
+    series = [(payload["stock_prices"], payload["time_labels"])]
+    series += [(comp["stock_prices"], comp["time_labels"]) for comp in payload.get("top_competitors", [])]
+    labels = sorted({label for _, series_labels in series for label in series_labels})
+    axis_index = {label: i for i, label in enumerate(labels)}
+
+    compact = {key: value for key, value in payload.items() if key not in ("stock_prices", "time_labels")}
+    compact["format"] = COMPACT_FORMAT
+    compact["axis"] = encode_axis(labels)
+    compact["stock_prices"] = encode_series(payload["stock_prices"], payload["time_labels"], axis_index,
+                                            price_encoding)
+    compact["top_competitors"] = [
+        dict({key: value for key, value in comp.items() if key not in ("stock_prices", "time_labels")},
+             stock_prices=encode_series(comp["stock_prices"], comp["time_labels"], axis_index, price_encoding))
+        for comp in payload.get("top_competitors", [])
+    ]
+    return compact
+
+
+def decode_axis(axis):
+    """Inverse of encode_axis, for Python clients of the compact format."""
+    if axis["start"] is None:
+        return []
+    start = np.datetime64(axis["start"], "D")
+    offsets = np.concatenate([[0], np.cumsum(axis["steps"], dtype=np.int64)])
+    if axis["unit"] == "B":
+        days = np.busday_offset(start, offsets, roll="forward")
+    else:
+        days = start + offsets
+    return [str(day) for day in days]
+
+
+def pick_encoding(accept_encodings):
+    """Best supported content coding from a werkzeug Accept-Encoding header, or None."""
+    if brotli is not None and accept_encodings["br"]:
+        return "br"
+    if accept_encodings["gzip"]:
+        return "gzip"
+    return None
+
+
+def compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    return body
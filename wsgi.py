@@ -0,0 +1,5 @@
+# Production entry point, e.g.: gunicorn -w 4 -b 0.0.0.0:12001 wsgi:app
+# Set SECRET_KEY and JWT_SECRET_KEY so all workers share sessions and tokens.
+from BACK import create_app
+
+app = create_app()